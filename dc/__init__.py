@@ -4,15 +4,28 @@
 """
 Main module of the DC
 """
-from .parts import Register, RAM
-from .errors import (NoInputValue, ScriptError, AssembleError, Overflow,
-                     InvalidAddress, DCError, Breakpoint)
+from .parts import Register, RAM, ALU, cell_table
+from .engines import AUTO, get_engine, choose_engine, required_features
+from .loops import LoopDetector
+from .accelerate import LoopAccelerator
+from .memo import Memoizer
+from .journal import Journal
+from .snapshot import Snapshot
+from .program import Program
+from . import assembler
+from .errors import (NoInputValue, ScriptError, Overflow, InvalidAddress,
+                     DCError, Breakpoint, CycleLimitExceeded, SessionError)
 from collections import namedtuple
+import array
+import logging
+import sys
+import time
+
+
+logger = logging.getLogger(__name__)
 
 
 Token = namedtuple("Token", ["token", "line_number"])
-Instruction = namedtuple("Instruction", ["number", "opcode", "arg",
-                                         "source_line"])
 
 
 class DCConfig():
@@ -23,6 +36,20 @@ class DCConfig():
     def __init__(self):
         self.address_width = 7
         self.control_bits = 6
+        # Execution engine used by DC.run(), see dc.engines. "auto" picks
+        # the fastest engine that supports the features in use.
+        self.engine = AUTO
+        # Raise InfiniteLoop as soon as a program provably never ends
+        self.detect_loops = False
+        # Let run_fast() skip counted loops in closed form, see
+        # dc.accelerate
+        self.accelerate_loops = True
+        # Replay subroutine calls that read the same values as an earlier
+        # call, see dc.memo
+        self.memoize = False
+        # Memory in bytes for the journal of DC.cycle() that allows
+        # stepping backwards, 0 disables it
+        self.journal_budget = 0
 
 
 class DC():
@@ -37,6 +64,17 @@ class DC():
     even without the GUI as long as you provide a mock interface with
     get_input and show_output functions.
     """
+    # Number of instructions between two checks of the time limit of run()
+    RUN_BATCH = 10000
+
+    __slots__ = (
+        "conf", "cellwidth", "max_address", "max_int", "min_int", "tables",
+        "ram", "ir", "dr", "pc", "ac", "ar", "sp", "bp", "alu",
+        "return_addresses", "breakpoints", "interface", "is_running",
+        "trace", "cycles", "loop_detector", "accelerator", "memoizer",
+        "journal", "_decoded", "_runners", "_last_engine",
+    )
+
     # Mapping NAME - CODE
     # DEF is ------
     opcodes = {
@@ -98,7 +136,11 @@ class DC():
         self.max_address = 2 ** config.address_width - 1
         self.max_int = 2 ** (self.cellwidth - 1) - 1
         self.min_int = 2 ** (self.cellwidth - 1) * -1
-        self.ram = RAM(2 ** config.address_width)
+        # Lookup tables for decoding cells, shared by all DCs with the
+        # same configuration
+        self.tables = cell_table(config.address_width, config.control_bits,
+                                 self.mnemo)
+        self.ram = RAM(2 ** config.address_width, cellwidth=self.cellwidth)
 
         self.ir = Register("IR", config.address_width + config.control_bits)
         self.dr = Register("DR", config.address_width + config.control_bits)
@@ -107,6 +149,7 @@ class DC():
         self.ar = Register("AR", config.address_width)
         self.sp = Register("SP", config.address_width, self.max_address)
         self.bp = Register("BP", config.address_width, self.max_address)
+        self.alu = ALU(self.ac)
 
         # A collection of addresses pushed onto the stack by JSR so we
         # can color them differently.
@@ -116,6 +159,34 @@ class DC():
 
         self.interface = None
         self.is_running = False
+        # Number of executed instructions since the last reset
+        self.cycles = 0
+        # Optional LoopDetector, used by run_reference()
+        self.loop_detector = (LoopDetector(self) if config.detect_loops
+                              else None)
+        # Optional LoopAccelerator, used by run_fast()
+        self.accelerator = (LoopAccelerator(self) if config.accelerate_loops
+                            else None)
+        # Optional Memoizer, used as engine by run() if set
+        self.memoizer = Memoizer(self) if config.memoize else None
+        # Optional Journal of the instructions executed by cycle()
+        self.journal = (Journal(self, config.journal_budget)
+                        if config.journal_budget else None)
+        # Optional callable that gets called with the DC after every
+        # instruction executed by run()
+        self.trace = None
+
+        # Decoded instructions, one (handler, operand) entry per RAM cell.
+        # Entries are built lazily by cycle() and dropped whenever the
+        # cell gets overwritten.
+        self._decoded = [None] * len(self.ram)
+        self.ram.watch(self._invalidate_decoded)
+
+        if config.engine != AUTO:
+            get_engine(config.engine)
+        # Engine name -> callable that runs the program with that engine
+        self._runners = {}
+        self._last_engine = None
 
     def reset(self):
         """
@@ -131,15 +202,117 @@ class DC():
         self.return_addresses = set()
         self.breakpoints = set()
         self.is_running = False
+        self.cycles = 0
         self.ram.clear()
 
+    def memory_footprint(self):
+        """
+        Return the number of bytes used by this DC instance, including the
+        RAM, the registers and the internal caches. Objects shared between
+        instances (like the configuration) are not counted.
+        """
+        objects = [self, self.ram, self.ram.watchers, self.ram.watched,
+                   self.alu, self.return_addresses, self.breakpoints,
+                   self._decoded]
+        objects.extend(self.registers)
+        objects.extend(entry for entry in self._decoded if entry is not None)
+        seen = set()
+        total = 0
+        for obj in objects:
+            if id(obj) not in seen:
+                seen.add(id(obj))
+                total += sys.getsizeof(obj)
+        return total
+
+    def snapshot(self):
+        """
+        Return a Snapshot of the complete machine state, see
+        dc.snapshot
+        """
+        conf = self.conf
+        return Snapshot(
+            conf.address_width, conf.control_bits, self.ram.tobytes(),
+            tuple(r.value for r in self.registers),
+            frozenset(self.breakpoints), frozenset(self.return_addresses),
+            self.cycles, self.is_running)
+
+    def restore(self, snapshot):
+        """
+        Restore the machine state from a Snapshot. Raises a SessionError
+        if the snapshot was taken from a DC with another configuration.
+        """
+        conf = self.conf
+        if (snapshot.address_width != conf.address_width or
+                snapshot.control_bits != conf.control_bits):
+            raise SessionError(
+                "Snapshot of a DC with {} address bits and {} control bits"
+                .format(snapshot.address_width, snapshot.control_bits))
+        self.ram.load_buffer(snapshot.ram)
+        self.set_registers(*snapshot.registers)
+        self.breakpoints.clear()
+        self.breakpoints.update(snapshot.breakpoints)
+        self.return_addresses.clear()
+        self.return_addresses.update(snapshot.return_addresses)
+        self.cycles = snapshot.cycles
+        self.is_running = snapshot.is_running
+
+    def step_back(self, count=1):
+        """
+        Undo the last count instructions executed by cycle(). Returns the
+        number of undone instructions, which is smaller if the journal
+        doesn't reach back far enough (or 0 if there is no journal).
+        """
+        if self.journal is None:
+            return 0
+        return self.journal.step_back(count)
+
+    def reverse_continue(self):
+        """
+        Step back to the last time the execution was at a breakpoint.
+        Returns the number of undone instructions.
+        """
+        if self.journal is None:
+            return 0
+        return self.journal.reverse_continue()
+
+    @property
+    def registers(self):
+        """
+        Tuple of all registers
+        """
+        return (self.ir, self.dr, self.pc, self.ac, self.ar, self.sp,
+                self.bp)
+
     def command_name(self, value):
         """
         Return the name of the command for the given cell value
         """
-        opc = value >> self.conf.address_width
-        mn = self.mnemo.get(opc, "DEF")
-        return mn
+        return self.tables.name(value)
+
+    def _decode(self, address):
+        """
+        Decode the cell at the given address into a (handler, operand)
+        tuple and cache it. handler is the opcode function or None for
+        DEF cells.
+        """
+        cell = self.ram[address]
+        name = self.mnemo.get(cell >> self.conf.address_width)
+        # The plain function is shared by all instances, a bound method
+        # would cost memory for every decoded cell
+        handler = getattr(DC, name) if name is not None else None
+        decoded = (handler, cell & self.max_address)
+        self._decoded[address] = decoded
+        self.ram.watched.add(address)
+        return decoded
+
+    def _invalidate_decoded(self, address, value_):
+        """
+        RAM watcher that drops the cached decoding of overwritten cells
+        """
+        if address is None:
+            self._decoded[:] = [None] * len(self._decoded)
+        else:
+            self._decoded[address] = None
 
     def parse_command(self, line):
         """
@@ -207,121 +380,104 @@ class DC():
         Token(token='The', line_number=2),
         Token(token='Air', line_number=2)]
         """
-        # We start counting the lines with 1 as humans would do
-        for line_number, line in enumerate(lines, 1):
-            line = DC.strip_comment(line)
-            line = line.strip()
-            tokens = line.split()
-            tokens = (token.strip(":") for token in tokens)
-            yield from (Token(token, line_number) for token in tokens if token)
+        return (Token(token, line_number)
+                for token, line_number in assembler.scan(lines))
 
     @classmethod
     def assemble(cls, lines):
-        # pylint: disable=too-many-branches
         """
         Assemble a DCL file to a DC file so that it can be loaded.
-        The file is given as a list of its lines and the DC file is
-        returned as a list of lines.
+        The file is given as an iterable of its lines (e.g. a file object)
+        and the DC file is returned as a list of lines.
 
         >>> assemble(["INM 20", "OUT 20"])
         ["0 INM 20", "1 OUT 20"]
         """
-        labels = {}
-        # Needed to keep track of all possible labels since this is permitted:
-        # ALPHA
-        # BETA
-        # GAMMA DEF 20
-        # now ALPHA BETA and GAMMA will all point to DEF 20
-        future_labels = []
-        instruction_number = 0
-        tokens = cls.tokenize(lines)
-        program = []
-        for token_obj in tokens:
-            token = token_obj.token.upper()
-            if token == "EQUAL":
-                if not future_labels:
-                    # line_number is the "human readable" line number, but the
-                    # error expects 0-based indexes
-                    raise AssembleError("Expected label (line {})"
-                                        .format(token_obj.line_number),
-                                        token_obj.line_number - 1)
-                # EQUAL only takes the label directly in front of it
-                label = future_labels.pop()
-                try:
-                    value = next(tokens).token
-                except StopIteration:
-                    raise AssembleError("Expected value (line {})"
-                                        .format(token_obj.line_number),
-                                        token_obj.line_number - 1)
-                if label in labels:
-                    raise AssembleError("Label {} already defined (line {})"
-                                        .format(label, token_obj.line_number),
-                                        token_obj.line_number - 1)
-                labels[label] = value
-            elif token in cls.opcodes or token == "DEF":
-                if token in cls.opcodes_without_arg:
-                    arg = None
-                else:
-                    try:
-                        arg = next(tokens).token.upper()
-                    except StopIteration:
-                        raise AssembleError("Expected argument (line {})"
-                                            .format(token_obj.line_number),
-                                            token_obj.line_number - 1)
-                program.append(Instruction(instruction_number, token, arg,
-                                           token_obj.line_number))
-                # Every label that came before this instruction will now point
-                # at this instruction
-                for label in future_labels:
-                    if label in labels:
-                        raise AssembleError("Label {} already defined "
-                                            "(line {})".format(
-                                                label, token_obj.line_number),
-                                            token_obj.line_number - 1)
-                    labels[label] = instruction_number
-                future_labels.clear()
-                instruction_number += 1
-            # Everything that is not a valid instruction is treated as a
-            # potential label
-            else:
-                future_labels.append(token)
-
-        result = []
-        for instruction in program:
-            if instruction.arg is None:
-                result.append("{} {}".format(instruction.number,
-                                             instruction.opcode))
-                continue
-            arg = labels.get(instruction.arg)
+        def encode(number, opcode, arg, line_number_):
             if arg is None:
-                try:
-                    # We need this for stuff like DEF 20, otherwise we'd get
-                    # the error "Invalid label" for 20. Note that this allows
-                    # the following program to work even though it doesn't work
-                    # in the original DC:
-                    # INM 20
-                    # LDA 20
-                    # The way we do it is probably easier than keeping track of
-                    # every instruction that takes a numeric argument instead
-                    # of a label.
-                    arg = int(instruction.arg)
-                except ValueError:
-                    raise AssembleError("Invalid label (line {})"
-                                        .format(instruction.source_line),
-                                        instruction.source_line - 1)
-            result.append("{} {} {}".format(instruction.number,
-                                            instruction.opcode, arg))
+                return "{} {}".format(number, opcode)
+            return "{} {} {}".format(number, opcode, arg)
+
+        result, _, _ = assembler.assemble(lines, cls.opcodes,
+                                          cls.opcodes_without_arg, encode)
         return result
 
+    def word_encoder(self):
+        """
+        Return the function that encodes the instructions for
+        assemble_program(), see assembler.assemble()
+        """
+        opcodes = self.opcodes
+        address_width = self.conf.address_width
+        max_address = self.max_address
+        min_int = self.min_int
+        max_int = self.max_int
+        mask = 2 ** self.cellwidth - 1
+
+        def encode(number, opcode, arg, line_number):
+            if number > max_address:
+                raise InvalidAddress("{} is outside of the available memory "
+                                     "(line {})".format(number, line_number),
+                                     line_number - 1)
+            if arg is None:
+                return opcodes[opcode] << address_width
+            if arg.__class__ is int:
+                if opcode == "DEF":
+                    if min_int <= arg <= max_int:
+                        return arg & mask
+                elif arg <= max_address:
+                    return (opcodes[opcode] << address_width | arg) & mask
+            # Values given with EQUAL are strings, parse_command()
+            # converts them or raises the right error
+            try:
+                return self.parse_command([opcode, arg])
+            except DCError as error:
+                error.msg += " (line {})".format(line_number)
+                error.line_number = line_number - 1
+                raise error
+
+        return encode
+
+    def assemble_program(self, lines, linkage=None):
+        """
+        Assemble a DCL file (given as an iterable of its lines) straight
+        to a Program for the configuration of this DC, which .load()
+        copies into the RAM without parsing any text. Errors refer to the
+        lines of the DCL file. Program.to_lines() returns the DC file.
+        A module that is linked later is assembled with an
+        assembler.Linkage, see dc.linker.
+        """
+        words, labels, source_lines = assembler.assemble(
+            lines, self.opcodes, self.opcodes_without_arg,
+            self.word_encoder(), linkage)
+        symbols = assembler.symbols(labels)
+        return Program(self.conf.address_width, self.conf.control_bits,
+                       self.tables, list(enumerate(words)), symbols,
+                       dict(enumerate(source_lines)))
+
     def load(self, lines, clear=True):
         """
         Load a file. The file is given as a list of its lines (like the
-        return value of .assemble()). If clear is True, the DC will be
+        return value of .assemble()) or as a Program returned by
+        .assemble_program(). If clear is True, the DC will be
         resetted to its initial state before loading the file.
         Otherwise the file just updates the current content of the RAM.
         """
+        if isinstance(lines, Program):
+            self.load_program(lines, clear)
+            return
         if clear:
             self.reset()
+        for address, word, _ in self._parse_lines(lines):
+            self.ram[address] = word
+        if self.journal is not None:
+            self.journal.clear()
+
+    def _parse_lines(self, lines):
+        """
+        Parse the lines of a DC file, yields an (address, word,
+        line_number) tuple for every line with a command
+        """
         lines = map(self.strip_comment, lines)
         # line_number is the "human indexed" line number, this is good for
         # showing but means that we need to use (line_number - 1) when passing
@@ -357,7 +513,42 @@ class DC():
                 error.msg += " (line {})".format(line_number)
                 error.line_number = line_number - 1
                 raise error
-            self.ram[address] = full
+            yield address, full, line_number
+
+    def parse_program(self, lines):
+        """
+        Parse the lines of a DC file into a Program without touching the
+        RAM. The Program has no symbols, its source lines are the lines of
+        the DC file.
+        """
+        words = []
+        source_lines = {}
+        for address, word, line_number in self._parse_lines(lines):
+            words.append((address, word))
+            source_lines[address] = line_number
+        return Program(self.conf.address_width, self.conf.control_bits,
+                       self.tables, words, {}, source_lines)
+
+    def load_program(self, program, clear=True):
+        """
+        Copy the words of a Program into the RAM, see .load(). Raises a
+        ScriptError if the program was assembled for another
+        configuration.
+        """
+        conf = self.conf
+        if (program.address_width != conf.address_width or
+                program.control_bits != conf.control_bits):
+            raise ScriptError(
+                "Program assembled for {} address bits and {} control bits"
+                .format(program.address_width, program.control_bits))
+        if clear:
+            self.reset()
+        # Fill a copy and write it back at once instead of notifying the
+        # RAM watchers for every word
+        image = array.array(self.ram.typecode, self.ram.tobytes())
+        for address, word in program.words:
+            image[address] = word
+        self.ram.load_buffer(image)
 
     def get_memory(self):
         """
@@ -374,39 +565,323 @@ class DC():
         """
         self.ram[self.ar.value] = self.dr.value
 
-    def run(self):
+    def engine(self):
+        """
+        Return the engine that DC.run() would use right now. That's the
+        configured engine, or a slower one if the configured engine does
+        not support the features in use (e.g. breakpoints).
+        """
+        return choose_engine(self.conf.engine, required_features(self))
+
+    def run(self, max_cycles=None, max_seconds=None):
         """
         Execute the whole program until an END is reached or an error
-        occurs
+        occurs, using the engine returned by .engine()
+
+        If max_cycles instructions have been executed or max_seconds have
+        passed before that, CycleLimitExceeded is raised. The time limit
+        is checked after every batch of RUN_BATCH instructions. Returns
+        the number of executed instructions.
+        """
+        engine = self.engine()
+        if engine is not self._last_engine:
+            logger.debug("Running with the %s engine", engine.name)
+            self._last_engine = engine
+        try:
+            runner = self._runners[engine.name]
+        except KeyError:
+            runner = self._runners[engine.name] = engine.factory(self)
+        if max_seconds is None:
+            executed = runner(max_cycles)
+        else:
+            deadline = time.monotonic() + max_seconds
+            executed = 0
+            while True:
+                batch = self.RUN_BATCH
+                if max_cycles is not None:
+                    batch = min(batch, max_cycles - executed)
+                executed += runner(batch)
+                if (not self.is_running or executed == max_cycles or
+                        time.monotonic() >= deadline):
+                    break
+        if self.is_running:
+            self.is_running = False
+            registers = dict((r.name, r.value) for r in self.registers)
+            raise CycleLimitExceeded(
+                "Stopped after {} instructions".format(executed),
+                executed, self.pc.value, registers)
+        return executed
+
+    def run_reference(self, max_cycles=None):
+        """
+        Execute the program with DC.cycle() until an END is reached, an
+        error occurs or max_cycles instructions have been executed.
+        Returns the number of executed instructions.
         """
         self.is_running = True
-        while self.is_running:
+        executed = 0
+        while self.is_running and executed != max_cycles:
+            executed += 1
             self.cycle()
+            if self.trace is not None:
+                self.trace(self)
+            if self.loop_detector is not None:
+                self.loop_detector.step()
+        return executed
+
+    def run_fast(self, max_cycles=None):
+        # pylint: disable=too-many-locals,too-many-branches
+        # pylint: disable=too-many-statements
+        """
+        Headless version of run(). The registers are loaded into plain
+        ints and the whole program is executed by a single dispatch loop,
+        the Register objects are only updated when the loop is left (END,
+        an error, an interface call or when max_cycles instructions have
+        been executed). The results and errors are exactly the same as
+        with run().
+
+        Returns the number of executed instructions. If the cycle budget
+        is exhausted, is_running is still True afterwards.
+        """
+        opcodes = self.opcodes
+        (LDA, STA, ADD, SUB, JMP, JMS, JPL, JZE, JNM, JNP, JNZ, JSR, RTN,
+         PSH, POP, PSHM, POPM, LDAS, STAS, ADDS, SUBS, SPBP, BPSP, POPB,
+         PSHB, LDAB, STAB, ADDB, SUBB, NOP, NEG, INC, DEC, OUT, OUTS, OUTB,
+         INM, INS, INB, END) = (opcodes[name] for name in (
+             "LDA", "STA", "ADD", "SUB", "JMP", "JMS", "JPL", "JZE", "JNM",
+             "JNP", "JNZ", "JSR", "RTN", "PSH", "POP", "PSHM", "POPM",
+             "LDAS", "STAS", "ADDS", "SUBS", "SPBP", "BPSP", "POPB", "PSHB",
+             "LDAB", "STAB", "ADDB", "SUBB", "NOP", "NEG", "INC", "DEC",
+             "OUT", "OUTS", "OUTB", "INM", "INS", "INB", "END"))
+        address_width = self.conf.address_width
+        amask = self.max_address
+        mask = 2 ** self.cellwidth - 1
+        sign = 2 ** (self.cellwidth - 1)
+        max_int = self.max_int
+        min_int = self.min_int
+        ram = self.ram
+        breakpoints = self.breakpoints
+        return_addresses = self.return_addresses
+        interface = self.interface
+        limit = max_cycles if max_cycles is not None else float("inf")
+        accelerator = self.accelerator
+        loops = accelerator.loops if accelerator is not None else {}
+        jumps = {JMP, JMS, JPL, JZE, JNM, JNP, JNZ}
+
+        self.is_running = running = True
+        # ac is kept as signed value. dr is None if it still holds the
+        # value fetched from ram[ar] in the operand fetch step.
+        pc, ac, sp, bp = (self.pc.value, self.ac.signed_value, self.sp.value,
+                          self.bp.value)
+        ir, dr, ar = self.ir.value, self.dr.value, self.ar.value
+        executed = 0
+        try:
+            while running and executed < limit:
+                ir = ram[pc]
+                pc = (pc + 1) & amask
+                op = ir >> address_width
+                ar = ir & amask
+                dr = None
+                executed += 1
+                if op == LDA:
+                    dr = ram[ar]
+                    ac = dr - ((dr & sign) << 1)
+                elif op == STA:
+                    dr = ac & mask
+                    ram[ar] = dr
+                elif op == ADD or op == SUB:
+                    dr = ram[ar]
+                    if op == ADD:
+                        result = ac + dr - ((dr & sign) << 1)
+                    else:
+                        result = ac - dr + ((dr & sign) << 1)
+                    if result > max_int or result < min_int:
+                        raise Overflow
+                    ac = result
+                elif op == JMP:
+                    pc = ar
+                elif op == JZE:
+                    if ac == 0:
+                        pc = ar
+                elif op == JNZ:
+                    if ac != 0:
+                        pc = ar
+                elif op == JMS:
+                    if ac < 0:
+                        pc = ar
+                elif op == JNM:
+                    if ac >= 0:
+                        pc = ar
+                elif op == JPL:
+                    if ac > 0:
+                        pc = ar
+                elif op == JNP:
+                    if ac <= 0:
+                        pc = ar
+                elif op == INC:
+                    if ac == max_int:
+                        raise Overflow
+                    ac += 1
+                elif op == DEC:
+                    if ac == min_int:
+                        raise Overflow
+                    ac -= 1
+                elif op == PSH:
+                    dr = ac & mask
+                    ar = sp
+                    ram[sp] = dr
+                    sp = (sp - 1) & amask
+                elif op == POP:
+                    sp = ar = (sp + 1) & amask
+                    dr = ram[sp]
+                    ac = dr - ((dr & sign) << 1)
+                elif op == JSR:
+                    dr = pc
+                    ar = sp
+                    ram[sp] = dr
+                    return_addresses.add(sp)
+                    sp = (sp - 1) & amask
+                    pc = ir & amask
+                elif op == RTN:
+                    sp = ar = (sp + 1) & amask
+                    dr = ram[sp]
+                    return_addresses.discard(sp)
+                    pc = dr & amask
+                elif op in (LDAS, STAS, ADDS, SUBS, LDAB, STAB, ADDB, SUBB,
+                            OUTS, OUTB, INS, INB):
+                    address = ar + (sp if op in (LDAS, STAS, ADDS, SUBS, OUTS,
+                                                 INS) else bp)
+                    if address > amask:
+                        raise InvalidAddress
+                    ar = address
+                    if op == STAS or op == STAB:
+                        dr = ac & mask
+                        ram[ar] = dr
+                    elif op == INS or op == INB:
+                        dr = ram[ir & amask]
+                        self.set_registers(ir, dr, pc, ac, ar, sp, bp)
+                        dr = interface.get_input() & mask
+                        ram[ar] = dr
+                    else:
+                        dr = ram[ar]
+                        value = dr - ((dr & sign) << 1)
+                        if op == LDAS or op == LDAB:
+                            ac = value
+                        elif op == OUTS or op == OUTB:
+                            self.set_registers(ir, dr, pc, ac, ar, sp, bp)
+                            interface.show_output(value)
+                        else:
+                            if op == ADDS or op == ADDB:
+                                result = ac + value
+                            else:
+                                result = ac - value
+                            if result > max_int or result < min_int:
+                                raise Overflow
+                            ac = result
+                elif op == PSHM:
+                    dr = ram[ar]
+                    ar = sp
+                    ram[sp] = dr
+                    sp = (sp - 1) & amask
+                elif op == POPM:
+                    sp = (sp + 1) & amask
+                    dr = ram[sp]
+                    ar = ir & amask
+                    ram[ar] = dr
+                elif op == PSHB:
+                    dr = bp
+                    ar = sp
+                    ram[sp] = dr
+                    sp = (sp - 1) & amask
+                elif op == POPB:
+                    sp = ar = (sp + 1) & amask
+                    dr = ram[sp]
+                    bp = dr & amask
+                elif op == SPBP:
+                    bp = sp
+                elif op == BPSP:
+                    sp = bp
+                elif op == NEG:
+                    if ac != min_int:
+                        ac = -ac
+                elif op == OUT:
+                    dr = ram[ar]
+                    self.set_registers(ir, dr, pc, ac, ar, sp, bp)
+                    interface.show_output(dr - ((dr & sign) << 1))
+                elif op == INM:
+                    dr = ram[ar]
+                    self.set_registers(ir, dr, pc, ac, ar, sp, bp)
+                    try:
+                        value = interface.get_input()
+                    except NoInputValue:
+                        running = False
+                        continue
+                    dr = value & mask
+                    ram[ar] = dr
+                elif op == END:
+                    running = False
+                elif op != NOP:
+                    # DEF, the breakpoint check is skipped
+                    continue
+                if (pc == ar and accelerator is not None and op in jumps and
+                        loops.get(pc) is not False):
+                    # Jumped to a possible loop header
+                    skipped = accelerator.fast_forward(
+                        pc, ac, None if max_cycles is None
+                        else max_cycles - executed)
+                    if skipped is not None:
+                        (ac, ir, dr, ar), count = skipped
+                        executed += count
+                if running and pc in breakpoints:
+                    running = False
+                    raise Breakpoint("Breakpoint for {} set".format(pc))
+        finally:
+            if dr is None:
+                dr = ram[ar]
+            self.set_registers(ir, dr, pc, ac, ar, sp, bp)
+            self.is_running = running
+            self.cycles += executed
+        return executed
+
+    def set_registers(self, ir, dr, pc, ac, ar, sp, bp):
+        # pylint: disable=too-many-arguments
+        """
+        Set all registers at once. Values are truncated to the register
+        widths, so ac may be given as signed value.
+        """
+        self.ir.set(ir)
+        self.dr.set(dr)
+        self.pc.set(pc)
+        self.ac.set(ac)
+        self.ar.set(ar)
+        self.sp.set(sp)
+        self.bp.set(bp)
 
     def cycle(self):
         """
         Execute a single instruction. This is done in the von Neumann
         style
         """
+        if self.journal is not None:
+            self.journal.record()
+        self.cycles += 1
         # Step 1: Fetch
+        address = self.pc.value
         self.pc.to(self.ar)
         self.get_memory()
         self.dr.to(self.ir)
-        # Step 2: Decode
+        # Step 2: Decode (the cache always matches the IR, since writing
+        # to a cell invalidates its entry)
         self.pc.inc()
-        cmd = self.ir.value >> (self.conf.address_width)
-        adr = self.ir.value & self.max_address
+        f, adr = self._decoded[address] or self._decode(address)
         # Step 3: Fetch operands
         self.ar.set(adr)
         self.get_memory()
-        try:
-            f = self.mnemo[cmd]
-        except KeyError:
+        if f is None:
             # DEF
             return
         # Step 4: Execute
-        f = getattr(self, f)
-        f()
+        f(self)
         # Step 5 (write back) is done in f
 
         # We detect the breakpoint the command BEFORE reaching the
@@ -426,14 +901,10 @@ class DC():
         self.save_memory()
 
     def ADD(self):
-        if self.ac.will_overflow(self.ac.signed_value + self.dr.signed_value):
-            raise Overflow
-        self.ac += self.dr
+        self.alu.add(self.dr)
 
     def SUB(self):
-        if self.ac.will_overflow(self.ac.signed_value - self.dr.signed_value):
-            raise Overflow
-        self.ac -= self.dr
+        self.alu.sub(self.dr)
 
     def JMP(self):
         self.ar.to(self.pc)
@@ -500,17 +971,13 @@ class DC():
         pass
 
     def NEG(self):
-        self.ac.neg()
+        self.alu.neg()
 
     def INC(self):
-        if self.ac.will_overflow(self.ac.signed_value + 1):
-            raise Overflow
-        self.ac.inc()
+        self.alu.inc()
 
     def DEC(self):
-        if self.ac.will_overflow(self.ac.signed_value - 1):
-            raise Overflow
-        self.ac.dec()
+        self.alu.dec()
 
     def OUT(self):
         self.interface.show_output(self.dr.signed_value)
@@ -561,9 +1028,7 @@ class DC():
             raise InvalidAddress
         self.ar.set(address)
         self.get_memory()
-        if self.ac.will_overflow(self.ac.signed_value + self.dr.signed_value):
-            raise Overflow
-        self.ac += self.dr
+        self.alu.add(self.dr)
 
     def SUBS(self):
         address = self.sp.value + (self.ir.value & self.max_address)
@@ -571,9 +1036,7 @@ class DC():
             raise InvalidAddress
         self.ar.set(address)
         self.get_memory()
-        if self.ac.will_overflow(self.ac.signed_value - self.dr.signed_value):
-            raise Overflow
-        self.ac -= self.dr
+        self.alu.sub(self.dr)
 
     def SPBP(self):
         self.sp.to(self.bp)
@@ -615,9 +1078,7 @@ class DC():
             raise InvalidAddress
         self.ar.set(address)
         self.get_memory()
-        if self.ac.will_overflow(self.ac.signed_value + self.dr.signed_value):
-            raise Overflow
-        self.ac += self.dr
+        self.alu.add(self.dr)
 
     def SUBB(self):
         address = self.bp.value + (self.ir.value & self.max_address)
@@ -625,9 +1086,7 @@ class DC():
             raise InvalidAddress
         self.ar.set(address)
         self.get_memory()
-        if self.ac.will_overflow(self.ac.signed_value - self.dr.signed_value):
-            raise Overflow
-        self.ac -= self.dr
+        self.alu.sub(self.dr)
 
     def OUTS(self):
         address = self.sp.value + (self.ir.value & self.max_address)
@@ -0,0 +1,315 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Analytical fast-forward of counted loops. A loop that only loads, stores,
+adds and subtracts, and whose memory cells change by the same amount in
+every iteration, can be advanced by many iterations at once.
+"""
+
+# Conditions of the conditional jumps on the signed accumulator
+CONDITIONS = {
+    "JMS": "<", "JPL": ">", "JZE": "==", "JNM": ">=", "JNP": "<=",
+    "JNZ": "!=",
+}
+
+NEGATED = {"<": ">=", ">": "<=", "==": "!=", ">=": "<", "<=": ">",
+           "!=": "=="}
+
+# Instructions that may appear inside a loop body besides the jumps
+BODY_INSTRUCTIONS = {"LDA", "STA", "ADD", "SUB", "INC", "DEC", "NOP"}
+
+MAX_BODY = 64
+
+
+def first_iteration(condition, start, step):
+    """
+    Return the smallest k >= 0 for which start + k * step satisfies the
+    condition (compared to 0), or None if there is no such k
+    """
+    # pylint: disable=too-many-return-statements
+    if step == 0:
+        return 0 if holds(condition, start) else None
+    if condition == "!=":
+        return 0 if start != 0 else 1
+    if condition == "==":
+        if start % step == 0 and -start // step >= 0:
+            return -start // step
+        return None
+    if holds(condition, start):
+        return 0
+    if condition in {"<", "<="}:
+        if step > 0:
+            return None
+        step = -step
+    else:
+        if step < 0:
+            return None
+        start = -start
+    # Now start + k * step has to reach the condition from above 0
+    if condition in {"<", ">"}:
+        return start // step + 1
+    return (start + step - 1) // step
+
+
+def holds(condition, value):
+    """
+    Evaluate value <condition> 0
+    """
+    return {
+        "<": value < 0, ">": value > 0, "==": value == 0,
+        ">=": value >= 0, "<=": value <= 0, "!=": value != 0,
+    }[condition]
+
+
+class Affine():
+    """
+    An affine expression const + sum(coefficient * variable). The
+    variables are the accumulator ("ac") and the memory cells (by
+    address) at the beginning of a loop iteration.
+    """
+    __slots__ = ("const", "terms")
+
+    def __init__(self, const=0, terms=None):
+        self.const = const
+        self.terms = terms or {}
+
+    @classmethod
+    def variable(cls, name):
+        return cls(0, {name: 1})
+
+    def add(self, other, sign=1):
+        """
+        Return self + sign * other
+        """
+        terms = dict(self.terms)
+        for name, coefficient in other.terms.items():
+            terms[name] = terms.get(name, 0) + sign * coefficient
+            if not terms[name]:
+                del terms[name]
+        return Affine(self.const + sign * other.const, terms)
+
+    def evaluate(self, values):
+        """
+        Return the value for the given variable values
+        """
+        return self.const + sum(coefficient * values[name]
+                                for name, coefficient in self.terms.items())
+
+
+class Loop():
+    """
+    The symbolic effect of one iteration of a loop
+    """
+    # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    def __init__(self, header, end, word):
+        self.header = header
+        # Address and cell value of the jump that closes the loop
+        self.end = end
+        self.word = word
+        self.length = end - header + 1
+        # Expressions for the accumulator and written cells at the end of
+        # an iteration
+        self.ac = None
+        self.cells = {}
+        # Values that have to stay in range (results of the arithmetic)
+        self.checks = []
+        # (condition, expression) for every way out of the loop
+        self.exits = []
+        # Every variable the loop reads
+        self.variables = set()
+        # Whether the accumulator is carried from one iteration to the next
+        self.uses_ac = False
+
+
+class LoopAccelerator():
+    """
+    Fast-forwards loops whose cells are induction variables: every
+    written cell changes by an amount that doesn't change from iteration
+    to iteration. Loops are recognized at the jump back to their first
+    instruction, the header. The loop body has to be straight code from
+    the header up to the closing jump (JMP header or a conditional jump
+    to the header), conditional jumps out of the loop are allowed.
+
+    The loop analysis only depends on the code and is cached until the
+    code is overwritten. Whether the loop can be skipped is decided with
+    the current values every time: the number of iterations until an
+    exit is computed exactly and no arithmetic in these iterations may
+    overflow. Otherwise the loop is executed normally.
+    """
+    def __init__(self, d):
+        self.d = d
+        # header -> Loop, or False if the loop can't be accelerated
+        self.loops = {}
+        # address -> set of headers whose analysis depends on it
+        self.owners = {}
+        self.skipped_cycles = 0
+        d.ram.watch(self._invalidate)
+
+    def _invalidate(self, address, value_):
+        """
+        RAM watcher that drops the analysis of overwritten loops
+        """
+        if address is None:
+            self.loops.clear()
+            self.owners.clear()
+            return
+        for header in self.owners.pop(address % len(self.d.ram), ()):
+            self.loops.pop(header, None)
+
+    def loop(self, header):
+        """
+        Return the analyzed loop starting at header or False
+        """
+        try:
+            return self.loops[header]
+        except KeyError:
+            pass
+        loop, end = self.analyze(header)
+        cells = range(header, end + 1)
+        for address in cells:
+            self.owners.setdefault(address, set()).add(header)
+        self.d.ram.watched.update(cells)
+        self.loops[header] = loop
+        return loop
+
+    def analyze(self, header):
+        """
+        Symbolically execute one iteration of the loop at header. Returns
+        a (Loop or False, last examined address) tuple.
+        """
+        # pylint: disable=too-many-branches
+        d = self.d
+        amask = d.max_address
+        ac = Affine.variable("ac")
+        cells = {}
+        checks = []
+        exits = []
+        variables = set()
+
+        def read(address):
+            if address not in cells:
+                variables.add(address)
+                return Affine.variable(address)
+            return cells[address]
+
+        address = header
+        while address <= amask and address - header < MAX_BODY:
+            word = d.ram[address]
+            name = d.tables.name(word)
+            adr = word & amask
+            if name == "LDA":
+                ac = read(adr)
+            elif name == "STA":
+                cells[adr] = ac
+            elif name in {"ADD", "SUB"}:
+                ac = ac.add(read(adr), 1 if name == "ADD" else -1)
+                checks.append(ac)
+            elif name in {"INC", "DEC"}:
+                ac = ac.add(Affine(1), 1 if name == "INC" else -1)
+                checks.append(ac)
+            elif name in CONDITIONS and adr != header:
+                if header <= adr <= address:
+                    return False, address
+                exits.append((CONDITIONS[name], ac))
+            elif (name == "JMP" or name in CONDITIONS) and adr == header:
+                if name != "JMP":
+                    exits.append((NEGATED[CONDITIONS[name]], ac))
+                return self.finish(header, address, word, ac, cells, checks,
+                                   exits, variables), address
+            elif name not in BODY_INSTRUCTIONS:
+                return False, address
+            address += 1
+        return False, min(address, amask)
+
+    def finish(self, header, end, word, ac, cells, checks, exits, variables):
+        # pylint: disable=too-many-arguments
+        """
+        Check that the loop variables change by constant amounts and
+        build the Loop
+        """
+        if any(header <= address <= end for address in cells):
+            # Self-modifying loop
+            return False
+        uses_ac = any(
+            "ac" in expression.terms
+            for expression in [ac] + list(cells.values()) + checks +
+            [expression for _, expression in exits])
+        inductions = dict(cells)
+        if uses_ac:
+            inductions["ac"] = ac
+        for name, expression in inductions.items():
+            delta = expression.add(Affine.variable(name), -1)
+            # The change may only depend on cells the loop doesn't write
+            if any(other in inductions for other in delta.terms):
+                return False
+        loop = Loop(header, end, word)
+        loop.ac = ac
+        loop.cells = cells
+        loop.checks = checks
+        loop.exits = exits
+        loop.variables = variables | set(cells) | {"ac"}
+        loop.uses_ac = uses_ac
+        return loop
+
+    def fast_forward(self, header, ac, budget=None):
+        """
+        Try to skip whole iterations of the loop at header, where ac is
+        the signed accumulator at the beginning of the iteration. At most
+        budget instructions are skipped. Returns None if nothing could be
+        skipped, otherwise the new (ac, ir, dr, ar) values and the number
+        of skipped instructions. The RAM is updated in place, the program
+        counter stays at header.
+        """
+        # pylint: disable=too-many-locals
+        loop = self.loop(header)
+        if not loop:
+            return None
+        d = self.d
+        if d.breakpoints and not d.breakpoints.isdisjoint(
+                range(loop.header, loop.end + 1)):
+            return None
+        ram = d.ram
+        sign = 2 ** (d.cellwidth - 1)
+        values = {"ac": ac}
+        for address in loop.variables:
+            if address != "ac":
+                value = ram[address]
+                values[address] = value - ((value & sign) << 1)
+        steps = dict((name, expression.evaluate(values) - values[name])
+                     for name, expression in loop.cells.items())
+        if loop.uses_ac:
+            steps["ac"] = loop.ac.evaluate(values) - ac
+
+        def slope(expression):
+            return sum(coefficient * steps.get(name, 0)
+                       for name, coefficient in expression.terms.items())
+
+        # Number of complete iterations before the loop is left
+        iterations = None
+        for condition, expression in loop.exits:
+            k = first_iteration(condition, expression.evaluate(values),
+                                slope(expression))
+            if k is not None and (iterations is None or k < iterations):
+                iterations = k
+        if budget is not None:
+            limit = budget // loop.length
+            if iterations is None or limit < iterations:
+                iterations = limit
+        if not iterations:
+            return None
+        last = iterations - 1
+        for expression in loop.checks:
+            start = expression.evaluate(values)
+            end = start + last * slope(expression)
+            if not (d.min_int <= min(start, end) and
+                    max(start, end) <= d.max_int):
+                return None
+        # Write the state after the last skipped iteration
+        mask = 2 ** d.cellwidth - 1
+        for address, expression in loop.cells.items():
+            value = values[address] + iterations * steps[address]
+            ram[address] = value & mask
+        ac = loop.ac.evaluate(values) + last * slope(loop.ac)
+        skipped = iterations * loop.length
+        self.skipped_cycles += skipped
+        return (ac, loop.word, ram[header], header), skipped
@@ -0,0 +1,213 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Cache of assembled programs, shared by the GUI, the editor and dc-batch.
+
+Programs are found by the SHA-256 of their source text and the widths of
+the DC. The most recently used ones are kept in memory, optionally they
+are also stored as JSON files in a directory. A .dc file written next to
+its .dcl source starts with a comment that records the hash of the
+source, so it can be reused as long as it is newer than the source and
+the hash matches.
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from .program import Program
+from .util import splitlines
+
+DEFAULT_MAX_ENTRIES = 64
+
+# First line of a generated .dc file, followed by the hash of the source
+HASH_COMMENT = "; assembled from sha256 "
+
+# A line of a .dc file once the comment is stripped: address, command and
+# an optional number, or nothing at all
+DC_LINE = re.compile(r"\s*(?:\d+\s+[A-Za-z]+(?:\s+[-+]?\d+)?\s*|\x1a)?$")
+
+
+def sniff(lines):
+    """
+    Return "dc" if the lines look like a DC file, otherwise "dcl"
+    """
+    match = DC_LINE.match
+    for line in lines:
+        index = line.find(";")
+        if index != -1:
+            line = line[:index]
+        if match(line) is None:
+            return "dcl"
+    return "dc"
+
+
+def source_hash(text):
+    """
+    Return the hex SHA-256 of the source text
+    """
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def recorded_hash(name):
+    """
+    Return the source hash recorded in the generated .dc file name, None
+    if it has none or can't be read
+    """
+    try:
+        with open(name) as dc_file:
+            first = dc_file.readline().strip()
+    except (IOError, UnicodeDecodeError):
+        return None
+    if first.startswith(HASH_COMMENT):
+        return first[len(HASH_COMMENT):]
+    return None
+
+
+def is_up_to_date(dc_name, source_name, digest):
+    """
+    Return True if the .dc file dc_name was assembled from the current
+    content (with the hash digest) of source_name
+    """
+    try:
+        if os.path.getmtime(dc_name) < os.path.getmtime(source_name):
+            return False
+    except OSError:
+        return False
+    return recorded_hash(dc_name) == digest
+
+
+def dc_text(program, digest):
+    """
+    Return the text of the .dc file for the program, starting with the
+    comment that records the source hash digest
+    """
+    return "\r\n".join([HASH_COMMENT + digest] + program.to_lines())
+
+
+class AssemblyCache():
+    """
+    LRU cache of Programs with at most max_entries in memory and an
+    optional store in directory. hits counts the programs found in
+    memory, disk_hits the ones found in the directory and misses the
+    ones that had to be assembled or parsed.
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, directory=None):
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries
+        self.directory = directory
+        self.programs = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def program(self, d, text, kind=None):
+        """
+        Return the Program of the source text (a string) for the DC d.
+        kind is "dc" or "dcl", or None to look at the text to find out.
+        Raises the DCError of the assembler or of the DC file parser.
+        """
+        conf = d.conf
+        key = "{}-{}-{}-{}".format(source_hash(text), conf.address_width,
+                                   conf.control_bits, kind or "any")
+        program = self._lookup(d, key)
+        if program is None:
+            lines = splitlines(text)
+            if kind is None:
+                kind = sniff(lines)
+            if kind == "dcl":
+                program = d.assemble_program(lines)
+            else:
+                program = d.parse_program(lines)
+            self._store(key, program)
+        return program
+
+    def program_for_file(self, d, text, source_name, dc_name):
+        """
+        Return the Program of the .dcl file source_name with the content
+        text and whether dc_name is an up to date .dc file of it, in
+        which case the .dc file is used if the program isn't cached.
+        """
+        digest = source_hash(text)
+        up_to_date = is_up_to_date(dc_name, source_name, digest)
+        conf = d.conf
+        key = "{}-{}-{}-dcl".format(digest, conf.address_width,
+                                    conf.control_bits)
+        program = self._lookup(d, key)
+        if program is None:
+            if up_to_date:
+                with open(dc_name) as dc_file:
+                    program = d.parse_program(dc_file)
+            else:
+                program = d.assemble_program(splitlines(text))
+                self._store(key, program)
+        return program, up_to_date
+
+    def _lookup(self, d, key):
+        """
+        Return the cached Program for the key or None
+        """
+        program = self.programs.get(key)
+        if program is not None:
+            self.programs.move_to_end(key)
+            self.hits += 1
+            return program
+        program = self._read(d, key)
+        if program is not None:
+            self.disk_hits += 1
+            self._remember(key, program)
+            return program
+        self.misses += 1
+        return None
+
+    def _remember(self, key, program):
+        self.programs[key] = program
+        while len(self.programs) > self.max_entries:
+            self.programs.popitem(last=False)
+
+    def _store(self, key, program):
+        self._remember(key, program)
+        if self.directory is None:
+            return
+        data = {
+            "words": program.words,
+            "symbols": program.symbols,
+            "source_lines": sorted(program.source_lines.items()),
+        }
+        # Write to a temporary file first, other processes must never see
+        # half a file
+        handle, temporary = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(handle, "w") as output_file:
+                json.dump(data, output_file)
+            os.replace(temporary, self._path(key))
+        except OSError:
+            os.unlink(temporary)
+
+    def _read(self, d, key):
+        """
+        Return the Program for the key from the directory or None
+        """
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key)) as input_file:
+                data = json.load(input_file)
+        except (IOError, ValueError):
+            return None
+        conf = d.conf
+        return Program(conf.address_width, conf.control_bits, d.tables,
+                       [tuple(pair) for pair in data["words"]],
+                       data["symbols"], dict(data["source_lines"]))
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def clear(self):
+        """
+        Forget the programs in memory
+        """
+        self.programs.clear()
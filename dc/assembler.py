@@ -0,0 +1,257 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+One pass assembler for DCL files.
+
+The lines are scanned with a single regular expression and every
+instruction is encoded as soon as its argument is known. Arguments that
+refer to labels defined later are remembered and backpatched when the
+label gets defined, so the source is read exactly once and never has to
+be kept in memory as a whole.
+
+Modules that are linked later (see dc.linker) are assembled with a
+Linkage, which makes EXPORT and IMPORT known and records the instructions
+that have to be relocated.
+"""
+import re
+
+from .errors import AssembleError
+
+# A token is everything between whitespace, without leading and trailing
+# colons ("LOOP:" is the label LOOP). A ; starts a comment, which matches
+# as an empty token.
+SCANNER = re.compile(r";.*|:*([^\s;:]+(?::+[^\s;:]+)*):*")
+
+# Instructions whose argument is an offset to the SP or BP instead of an
+# address, the linker doesn't relocate them
+RELATIVE = {"LDAS", "STAS", "ADDS", "SUBS", "OUTS", "INS",
+            "LDAB", "STAB", "ADDB", "SUBB", "OUTB", "INB"}
+
+
+def scan(lines):
+    """
+    Yield a (token, line_number) tuple for every token in the lines,
+    line numbers start at 1
+    """
+    findall = SCANNER.findall
+    for line_number, line in enumerate(lines, 1):
+        for token in findall(line):
+            if token:
+                yield token, line_number
+
+
+def _expect(tokens, what, line_number):
+    """
+    Return the next token or raise an AssembleError that expected what
+    """
+    try:
+        return next(tokens)[0]
+    except StopIteration:
+        # line_number is the "human readable" line number, but the
+        # error expects 0-based indexes
+        raise AssembleError("Expected {} (line {})".format(what, line_number),
+                            line_number - 1)
+
+
+class Linkage():
+    # pylint: disable=too-few-public-methods
+    """
+    What the linker needs to know about an assembled module. exports maps
+    the exported labels to the line of their EXPORT, imports is the set
+    of imported labels and relocations the list of (number, label) of
+    every instruction whose argument is an address: label is None for
+    addresses in the module itself, which are relative to its start, or
+    the imported label, in which case the argument is 0. The arguments
+    of the instructions are addresses (numbers too) unless they are
+    relative to the SP or BP, the ones of DEF only if they are labels of
+    instructions.
+    addresses maps the labels of instructions to their numbers once the
+    module is assembled.
+    """
+    def __init__(self):
+        self.exports = {}
+        self.imports = set()
+        self.relocations = []
+        self.addresses = {}
+
+
+def _define(labels, label, value, line_number, imports=()):
+    """
+    Define the label, raise an AssembleError if it is already defined
+    (or imported)
+    """
+    if label in labels or label in imports:
+        raise AssembleError("Label {} already defined (line {})"
+                            .format(label, line_number), line_number - 1)
+    labels[label] = value
+
+
+def _is_address(opcode, value):
+    """
+    Return True if value, the argument of the opcode as label value or
+    number, is an address in the module that the linker relocates
+    """
+    if opcode == "DEF":
+        return value.__class__ is int
+    return opcode not in RELATIVE
+
+
+def _check_exports(labels, linkage):
+    """
+    Raise an AssembleError for the first exported label that is not the
+    address of an instruction
+    """
+    for label, line_number in sorted(linkage.exports.items(),
+                                     key=lambda item: item[1]):
+        value = labels.get(label)
+        if value is None:
+            raise AssembleError("Exported label {} not defined (line {})"
+                                .format(label, line_number), line_number - 1)
+        if value.__class__ is not int:
+            raise AssembleError("Only addresses can be exported (line {})"
+                                .format(line_number), line_number - 1)
+
+
+def symbols(labels):
+    """
+    Return the labels of assemble() with the values given with EQUAL
+    converted to int if they are numbers
+    """
+    result = {}
+    for label, value in labels.items():
+        try:
+            result[label] = int(value)
+        except ValueError:
+            result[label] = value
+    return result
+
+
+def assemble(lines, opcodes, opcodes_without_arg, encode, linkage=None):
+    # pylint: disable=too-many-branches,too-many-locals,too-many-statements
+    """
+    Assemble the lines of a DCL file, which may be any iterable (like a
+    file object). opcodes are the names of the instructions (DEF is
+    always known), the ones in opcodes_without_arg take no argument.
+
+    encode(number, opcode, arg, line_number) is called once for every
+    instruction and returns its output, arg is None for instructions
+    without argument, otherwise an int or the string given with EQUAL.
+    Returns the list of the outputs, the labels (which map to an
+    instruction number or the value given with EQUAL) and the list of
+    the source line numbers of the instructions.
+
+    If a Linkage is given, "EXPORT LABEL" and "IMPORT LABEL" are
+    directives and the linkage is filled for the module. Imported labels
+    are encoded as 0.
+    """
+    labels = {}
+    # Needed to keep track of all possible labels since this is permitted:
+    # ALPHA
+    # BETA
+    # GAMMA DEF 20
+    # now ALPHA BETA and GAMMA will all point to DEF 20
+    future_labels = []
+    # label -> list of (number, opcode, line_number) of the instructions
+    # that use the label before it is defined
+    pending = {}
+    outputs = []
+    source_lines = []
+    tokens = scan(lines)
+    imports = ()
+    relocate = None
+    if linkage is not None:
+        imports = linkage.imports
+        relocate = linkage.relocations.append
+
+    def backpatch(label):
+        value = labels[label]
+        for number, opcode, line_number in pending.pop(label, ()):
+            outputs[number] = encode(number, opcode, value, line_number)
+            if linkage is not None and _is_address(opcode, value):
+                relocate((number, None))
+
+    append_output = outputs.append
+    append_line = source_lines.append
+    for token, line_number in tokens:
+        token = token.upper()
+        if token in opcodes or token == "DEF":
+            arg = None
+            if token not in opcodes_without_arg:
+                arg = _expect(tokens, "argument", line_number).upper()
+            number = len(outputs)
+            append_line(line_number)
+            # Every label that came before this instruction will now point
+            # at this instruction
+            for label in future_labels:
+                _define(labels, label, number, line_number, imports)
+                backpatch(label)
+            future_labels.clear()
+            if arg is None:
+                append_output(encode(number, token, None, line_number))
+                continue
+            value = labels.get(arg)
+            if value is not None:
+                append_output(encode(number, token, value, line_number))
+                if linkage is not None and _is_address(token, value):
+                    relocate((number, None))
+                continue
+            append_output(None)
+            uses = pending.get(arg)
+            if uses is None:
+                pending[arg] = [(number, token, line_number)]
+            else:
+                uses.append((number, token, line_number))
+        elif token == "EQUAL":
+            if not future_labels:
+                raise AssembleError("Expected label (line {})"
+                                    .format(line_number), line_number - 1)
+            # EQUAL only takes the label directly in front of it
+            label = future_labels.pop()
+            value = _expect(tokens, "value", line_number)
+            _define(labels, label, value, line_number, imports)
+            backpatch(label)
+        elif linkage is not None and token in ("EXPORT", "IMPORT"):
+            label = _expect(tokens, "label", line_number).upper()
+            if token == "EXPORT":
+                linkage.exports.setdefault(label, line_number)
+            elif label in labels:
+                raise AssembleError("Label {} already defined (line {})"
+                                    .format(label, line_number),
+                                    line_number - 1)
+            else:
+                imports.add(label)
+        # Everything that is not a valid instruction is treated as a
+        # potential label
+        else:
+            future_labels.append(token)
+
+    # The remaining arguments are no labels, so they have to be numbers.
+    # We need this for stuff like DEF 20, otherwise we'd get the error
+    # "Invalid label" for 20. Note that this allows the following program
+    # to work even though it doesn't work in the original DC:
+    # INM 20
+    # LDA 20
+    # The way we do it is probably easier than keeping track of every
+    # instruction that takes a numeric argument instead of a label.
+    references = sorted((number, opcode, line_number, arg)
+                        for arg, uses in pending.items()
+                        for number, opcode, line_number in uses)
+    for number, opcode, line_number, arg in references:
+        if arg in imports:
+            outputs[number] = encode(number, opcode, 0, line_number)
+            relocate((number, arg))
+            continue
+        try:
+            value = int(arg)
+        except ValueError:
+            raise AssembleError("Invalid label (line {})".format(line_number),
+                                line_number - 1)
+        outputs[number] = encode(number, opcode, value, line_number)
+        if linkage is not None and _is_address(opcode, arg):
+            relocate((number, None))
+    if linkage is not None:
+        _check_exports(labels, linkage)
+        linkage.relocations.sort(key=lambda relocation: relocation[0])
+        linkage.addresses = {label: value for label, value in labels.items()
+                             if value.__class__ is int}
+    return outputs, labels, source_lines
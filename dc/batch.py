@@ -0,0 +1,251 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Headless batch runner for grading many programs against the same test
+cases. Every .dc/.dcl/.dco file of a directory is loaded (and assembled)
+once and run with the inputs of every test case in a process pool, the
+results are written as JSON lines as soon as a file is done.
+
+Run with dc-batch DIRECTORY SPEC, see dc-batch --help. The SPEC file is a
+JSON list of test cases like
+
+    [{"name": "small", "inputs": [3, 4], "outputs": [12]}, ...]
+
+where the name is optional.
+"""
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+import os
+import sys
+
+from . import DC, DCConfig, objfile, util
+from .asmcache import AssemblyCache
+from .cache import (DEFAULT_MAX_BYTES, ResultCache, make_result,
+                    result_key)
+from .errors import DCError, NoInputValue
+
+EXTENSIONS = (".dc", ".dcl", objfile.EXTENSION)
+
+DEFAULT_MAX_CYCLES = 10 ** 6
+DEFAULT_MAX_SECONDS = 5.0
+
+# The DC and caches of a worker process, created once by init_worker()
+# and reused for every job of the process
+_worker_dc = None
+_worker_cache = None
+_worker_assemblies = AssemblyCache()
+
+
+class BatchInterface():
+    """
+    Interface that feeds the inputs of a test case and collects the
+    outputs
+    """
+    def __init__(self, inputs=()):
+        self.inputs = deque(inputs)
+        self.output = []
+
+    def get_input(self):
+        if not self.inputs:
+            raise NoInputValue
+        return self.inputs.popleft()
+
+    def show_output(self, value):
+        self.output.append(value)
+
+
+def find_programs(directory):
+    """
+    Return the sorted paths of all .dc, .dcl and .dco files in the
+    directory
+    """
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(EXTENSIONS) and
+        os.path.isfile(os.path.join(directory, name)))
+
+
+def read_spec(name):
+    """
+    Read the test cases from a spec file. Returns a list of dicts with the
+    keys name, inputs and outputs.
+    """
+    with open(name) as spec_file:
+        cases = json.load(spec_file)
+    return [{"name": case.get("name", str(number)),
+             "inputs": list(case.get("inputs", [])),
+             "outputs": list(case["outputs"])}
+            for number, case in enumerate(cases)]
+
+
+def read_program(d, name, assemblies):
+    """
+    Return the Program in the given file for d, .dcl files are assembled.
+    Identical files are only assembled once thanks to the AssemblyCache
+    assemblies.
+    """
+    content, _ = util.get_file_content(name)
+    kind = "dcl" if name.lower().endswith(".dcl") else "dc"
+    return assemblies.program(d, content, kind)
+
+
+def init_worker(config, cache, assemblies):
+    """
+    Process pool initializer: create the DC and the caches of this worker
+    """
+    # pylint: disable=global-statement
+    global _worker_dc, _worker_cache, _worker_assemblies
+    _worker_dc = DC(config or DCConfig())
+    _worker_cache = cache
+    if assemblies is not None:
+        _worker_assemblies = assemblies
+
+
+def run_case(d, template, case, max_cycles, max_seconds, cache=None):
+    # pylint: disable=too-many-arguments
+    """
+    Run a single test case on d, starting from the template snapshot.
+    Returns the result dict. If a ResultCache is given, a cached result
+    is used if there is one, otherwise the result is stored in it.
+    """
+    d.restore(template)
+    result = None
+    if cache is not None:
+        key = result_key(d, case["inputs"], max_cycles)
+        result = cache.get(key)
+    cached = result is not None
+    if not cached:
+        d.interface = BatchInterface(case["inputs"])
+        error = None
+        try:
+            d.run(max_cycles, max_seconds)
+        except DCError as exc:
+            error = type(exc).__name__
+        result = make_result(d, d.interface.output, error)
+        # A run stopped by the time limit may finish next time
+        timed_out = (error == "CycleLimitExceeded" and
+                     d.cycles != max_cycles)
+        if cache is not None and not timed_out:
+            cache.put(key, result)
+    return {
+        "case": case["name"],
+        "passed": (result["error"] is None and
+                   result["output"] == case["outputs"]),
+        "output": result["output"],
+        "error": result["error"],
+        "cycles": result["cycles"],
+        "cached": cached,
+    }
+
+
+def grade(name, cases, max_cycles, max_seconds, config=None, cache=None,
+          assemblies=None):
+    # pylint: disable=too-many-arguments
+    """
+    Process pool task: assemble the program in the file name and run it
+    with every test case. Returns a list of result dicts.
+    """
+    d = _worker_dc
+    if d is None:
+        d = DC(config or DCConfig())
+    if cache is None:
+        cache = _worker_cache
+    if assemblies is None:
+        assemblies = _worker_assemblies
+    try:
+        if name.lower().endswith(objfile.EXTENSION):
+            objfile.load_file(d, name)
+        else:
+            d.load(read_program(d, name, assemblies))
+    except (DCError, IOError) as exc:
+        return [{"file": name, "case": None, "passed": False,
+                 "error": type(exc).__name__, "message": str(exc)}]
+    # Loading (and parsing) the program once, every case starts from this
+    # snapshot
+    template = d.snapshot()
+    results = []
+    for case in cases:
+        result = run_case(d, template, case, max_cycles, max_seconds,
+                          cache)
+        result["file"] = name
+        results.append(result)
+    return results
+
+
+def run_batch(names, cases, max_cycles=DEFAULT_MAX_CYCLES,
+              max_seconds=DEFAULT_MAX_SECONDS, processes=None, config=None,
+              cache=None, assemblies=None):
+    # pylint: disable=too-many-arguments
+    """
+    Grade every program file in names with the test cases in a process
+    pool with the given number of processes (None for one per CPU, 0 to
+    run in this process). Yields the list of results of each file as
+    soon as it is done, so the order is not the order of names. cache is
+    an optional ResultCache and assemblies an optional AssemblyCache
+    (e.g. one with a directory) shared by all processes.
+    """
+    if processes == 0:
+        for name in names:
+            yield grade(name, cases, max_cycles, max_seconds, config, cache,
+                        assemblies)
+        return
+    with ProcessPoolExecutor(processes, initializer=init_worker,
+                             initargs=(config, cache, assemblies)) as pool:
+        futures = [pool.submit(grade, name, cases, max_cycles, max_seconds)
+                   for name in names]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def main(argv=None):
+    """
+    Entry point of dc-batch
+    """
+    parser = argparse.ArgumentParser(
+        description="Run every .dc/.dcl/.dco file in a directory against "
+                    "test cases and print the results as JSON lines.")
+    parser.add_argument("directory", help="directory with the programs")
+    parser.add_argument("spec", help="JSON file with the test cases")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of worker processes (default: one "
+                             "per CPU, 0 runs everything in this process)")
+    parser.add_argument("--max-cycles", type=int, default=DEFAULT_MAX_CYCLES,
+                        help="instruction limit per test case")
+    parser.add_argument("--max-seconds", type=float,
+                        default=DEFAULT_MAX_SECONDS,
+                        help="time limit per test case")
+    parser.add_argument("--cache", metavar="DIRECTORY",
+                        help="reuse the results of earlier runs stored in "
+                             "this directory")
+    parser.add_argument("--cache-size", type=int,
+                        default=DEFAULT_MAX_BYTES // 2 ** 20,
+                        help="size limit of the cache in MiB")
+    parser.add_argument("--assembly-cache", metavar="DIRECTORY",
+                        help="keep the assembled programs in this "
+                             "directory")
+    args = parser.parse_args(argv)
+
+    cases = read_spec(args.spec)
+    names = find_programs(args.directory)
+    cache = None
+    if args.cache:
+        cache = ResultCache(args.cache, args.cache_size * 2 ** 20)
+    assemblies = None
+    if args.assembly_cache:
+        assemblies = AssemblyCache(directory=args.assembly_cache)
+    failed = False
+    hits = lookups = 0
+    for results in run_batch(names, cases, args.max_cycles, args.max_seconds,
+                             args.jobs, cache=cache, assemblies=assemblies):
+        for result in results:
+            failed = failed or not result["passed"]
+            hits += result.get("cached", False)
+            lookups += "cached" in result
+            print(json.dumps(result, sort_keys=True))
+        sys.stdout.flush()
+    if cache is not None:
+        print("Cache: {} of {} results reused".format(hits, lookups),
+              file=sys.stderr)
+    return 1 if failed else 0
@@ -0,0 +1,209 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Measure the speed of the different execution engines
+
+Run with python3 -m dc.benchmark
+"""
+import os
+import tempfile
+import time
+
+from . import DC, DCConfig
+from .fusion import Fuser
+from .incremental import AssemblySession
+from .translate import Translator
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), "..", "doc", "source",
+                        "examples")
+
+WORKLOADS = [
+    ("multiply.dcl", [4000, 1]),
+    ("fibonacci.dcl", [15]),
+    ("count_to_ten.dcl", []),
+]
+
+
+class BenchInterface:
+    """
+    Minimal interface that feeds the given inputs and drops the output
+    """
+    def __init__(self, inputs):
+        self.inputs = list(inputs)
+
+    def get_input(self):
+        return self.inputs.pop(0)
+
+    def show_output(self, value_):
+        pass
+
+
+def engine_reference(d):
+    d.run_reference()
+
+
+def engine_run_fast(d):
+    d.accelerator = None
+    d.run_fast()
+
+
+def engine_accelerated(d):
+    d.run_fast()
+
+
+def engine_translate(d):
+    Translator(d).run()
+
+
+def engine_fusion(d):
+    Fuser(d).run()
+
+
+ENGINES = [
+    ("reference", engine_reference),
+    ("run_fast", engine_run_fast),
+    ("accelerated", engine_accelerated),
+    ("translate", engine_translate),
+    ("fusion", engine_fusion),
+]
+
+
+def prepare(program, inputs):
+    d = DC(DCConfig())
+    d.interface = BenchInterface(inputs)
+    d.load(program)
+    return d
+
+
+def measure(program, inputs, engine, repeat=5):
+    """
+    Return the best cycles per second of engine on the given program
+    """
+    # All engines execute the same instructions, run_fast counts them
+    cycles = prepare(program, inputs).run_fast()
+    best = None
+    for _ in range(repeat):
+        d = prepare(program, inputs)
+        start = time.perf_counter()
+        engine(d)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return cycles, cycles / best
+
+
+def fusion_hit_rate(program, inputs):
+    """
+    Return the fraction of instructions executed by fused handlers
+    """
+    fuser = Fuser(prepare(program, inputs))
+    fuser.run()
+    return fuser.hit_rate
+
+
+def generate_source(count):
+    """
+    Return the lines of a generated DCL file with count instructions,
+    which needs a DC with at least count + 1 cells
+    """
+    lines = ["START: LDA VALUE"]
+    body = ["ADD VALUE", "STA VALUE", "JMS START", "PSH", "POP", "OUT VALUE"]
+    lines.extend(body[i % len(body)] for i in range(count - 2))
+    lines.append("VALUE: DEF -1")
+    return lines
+
+
+def measure_loading(count=60000, address_width=16, repeat=3):
+    """
+    Return the best seconds for assembling and loading a generated
+    program, once through the text of a DC file and once as a Program
+    """
+    config = DCConfig()
+    config.address_width = address_width
+    d = DC(config)
+    source = generate_source(count)
+    ways = [
+        ("text", lambda: d.load(DC.assemble(source))),
+        ("program", lambda: d.load(d.assemble_program(source))),
+    ]
+    results = []
+    for way, load in ways:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            load()
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        results.append((way, best))
+    return results
+
+
+def measure_assembler(count=10 ** 6, address_width=20):
+    """
+    Return the lines per second for assembling a generated DCL file with
+    count lines, read straight from the file, into a Program for a DC with
+    the given (wide) address width
+    """
+    config = DCConfig()
+    config.address_width = address_width
+    d = DC(config)
+    with tempfile.TemporaryDirectory() as directory:
+        name = os.path.join(directory, "generated.dcl")
+        with open(name, "w") as source:
+            for line in generate_source(count):
+                source.write(line + "\n")
+        with open(name) as source:
+            start = time.perf_counter()
+            d.load(d.assemble_program(source))
+            elapsed = time.perf_counter() - start
+    return count / elapsed
+
+
+def measure_incremental(count=10 ** 6, address_width=20):
+    """
+    Return the seconds for assembling a generated DCL file with count
+    lines once as a whole, for changing the argument of the instruction in
+    its middle in an AssemblySession and for getting the Program of the
+    session after that edit
+    """
+    config = DCConfig()
+    config.address_width = address_width
+    d = DC(config)
+    source = generate_source(count)
+    session = AssemblySession(d, "\n".join(source))
+    # Kept, so freeing the old Program isn't counted as part of the edit
+    program_ = session.program()
+    start = time.perf_counter()
+    d.assemble_program(source)
+    full = time.perf_counter() - start
+    start = time.perf_counter()
+    session.replace(count // 2, 1, ["ADD START"])
+    edit = time.perf_counter() - start
+    start = time.perf_counter()
+    session.program()
+    build = time.perf_counter() - start
+    return full, edit, build
+
+
+def main():
+    print("assemble+load      {:,} lines {:>12,.0f} lines/s".format(
+        10 ** 6, measure_assembler()))
+    full, edit, build = measure_incremental()
+    print("assemble           whole file {:>9.3f} s, one line edit {:.4f} s, "
+          "program after it {:.3f} s".format(full, edit, build))
+    for way, seconds in measure_loading():
+        print("assemble+load      {:<11} {:>9.3f} s".format(way, seconds))
+    for name, inputs in WORKLOADS:
+        with open(os.path.join(EXAMPLES, name)) as source:
+            program = DC.assemble(source.read().split("\n"))
+        for engine_name, engine in ENGINES:
+            cycles, speed = measure(program, inputs, engine)
+            print("{:<18} {:<11} {:>9} cycles {:>12,.0f} cycles/s".format(
+                name, engine_name, cycles, speed))
+        print("{:<18} fusion hit rate {:.1%}".format(
+            name, fusion_hit_rate(program, inputs)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Persistent cache for the results of whole runs, stored in an SQLite
+database so it can be shared by several processes (e.g. the workers of
+dc-batch). A result is found by a hash of the loaded machine state, the
+inputs and the cycle limit, the least recently used results are evicted
+when the database grows larger than its size limit.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+
+from .snapshot import pack
+
+DATABASE_NAME = "results.sqlite3"
+DEFAULT_MAX_BYTES = 64 * 2 ** 20
+# Seconds to wait for another process that holds the database lock
+LOCK_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key BLOB PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    used INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+"""
+# The use counter of the most recently used result, so the order of the
+# uses doesn't depend on the clocks of the processes
+NEXT_USE = "(SELECT COALESCE(MAX(used), 0) + 1 FROM results)"
+
+
+def result_key(d, inputs, max_cycles=None):
+    """
+    Return the cache key for running d from its current state (usually
+    right after DC.load()) with the given inputs and cycle limit. The key
+    covers the RAM, the registers and the widths of the DC.
+    """
+    digest = hashlib.sha256(pack(d.snapshot(), d.ram.itemsize))
+    digest.update(json.dumps([list(inputs), max_cycles]).encode("ascii"))
+    return digest.digest()
+
+
+def make_result(d, output, error):
+    """
+    Return the result dict of a finished run of d, which printed output
+    and ended with the error (the name of the error class, or None)
+    """
+    return {
+        "output": list(output),
+        "registers": dict((r.name, r.value) for r in d.registers),
+        "cycles": d.cycles,
+        "error": error,
+    }
+
+
+class ResultCache():
+    """
+    Cache of result dicts (see make_result()) in the directory. The
+    counters hits, misses, stores and evictions count the operations of
+    this object, the database may be used by other processes as well.
+    """
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        self.name = os.path.join(directory, DATABASE_NAME)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._connection = None
+        self._pid = None
+
+    @property
+    def connection(self):
+        """
+        The connection to the database. A connection must not be shared
+        with a forked process, so every process opens its own.
+        """
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(
+                self.name, timeout=LOCK_TIMEOUT, isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(SCHEMA)
+            self._pid = os.getpid()
+        return self._connection
+
+    def __getstate__(self):
+        # Worker processes open their own connection
+        state = self.__dict__.copy()
+        state["_connection"] = state["_pid"] = None
+        return state
+
+    def close(self):
+        """
+        Close the connection to the database
+        """
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+    def get(self, key):
+        """
+        Return the result for the key or None if it isn't cached
+        """
+        connection = self.connection
+        row = connection.execute("SELECT value FROM results WHERE key = ?",
+                                 (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        connection.execute("UPDATE results SET used = {} WHERE key = ?"
+                           .format(NEXT_USE), (key,))
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        """
+        Store the result for the key and evict the least recently used
+        results if the cache grew too large
+        """
+        value = json.dumps(result, sort_keys=True)
+        size = len(key) + len(value)
+        connection = self.connection
+        # IMMEDIATE takes the write lock right away, so concurrent
+        # evictions can't interleave
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, {})"
+                .format(NEXT_USE), (key, value, size))
+            self.stores += 1
+            self._evict(connection)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def _evict(self, connection):
+        """
+        Delete the least recently used results until the total size is
+        below max_bytes
+        """
+        total, = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results").fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = connection.execute(
+            "SELECT key, size FROM results ORDER BY used")
+        victims = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        connection.executemany("DELETE FROM results WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def clear(self):
+        """
+        Delete all cached results
+        """
+        self.connection.execute("DELETE FROM results")
+
+    def __len__(self):
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def size(self):
+        """
+        Return the total size of the cached results in bytes
+        """
+        return self.connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    @property
+    def hit_rate(self):
+        """
+        Fraction of the lookups that were hits
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """
+        Return a dict with the counters of this object and the number of
+        entries and bytes in the database
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": len(self),
+            "bytes": self.size(),
+        }
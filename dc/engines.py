@@ -0,0 +1,109 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Registry of the execution engines that can run a DC program. Every
+engine declares the features it supports, so the DC can pick the
+fastest engine that is able to handle the features currently in use.
+"""
+from collections import namedtuple
+
+from .fusion import Fuser
+from .memo import Memoizer
+from .translate import Translator
+
+# Features an engine may support
+BREAKPOINTS = "breakpoints"
+TRACING = "tracing"
+LOOP_DETECTION = "loop detection"
+MEMOIZATION = "memoization"
+JOURNAL = "journal"
+
+# factory is called with the DC and returns a callable that runs the
+# program until an END is reached, an error occurs or the given number of
+# instructions (None for no limit) has been executed. It returns the
+# number of executed instructions and keeps DC.cycles up to date. speed is
+# only used to rank the engines, higher is faster.
+Engine = namedtuple("Engine", ["name", "speed", "capabilities", "factory"])
+
+ENGINES = {}
+
+# Name of the pseudo engine that always picks the fastest engine
+AUTO = "auto"
+
+
+def register_engine(name, speed, capabilities, factory):
+    """
+    Add an engine to the registry and return it
+    """
+    engine = Engine(name, speed, frozenset(capabilities), factory)
+    ENGINES[name] = engine
+    return engine
+
+
+def get_engine(name):
+    """
+    Return the engine with the given name, raises a ValueError if there is
+    no such engine
+    """
+    try:
+        return ENGINES[name]
+    except KeyError:
+        raise ValueError("Unknown engine: {}".format(name))
+
+
+def required_features(d):
+    """
+    Return the set of features the given DC currently uses
+    """
+    features = set()
+    if d.breakpoints:
+        features.add(BREAKPOINTS)
+    if d.trace is not None:
+        features.add(TRACING)
+    if d.loop_detector is not None:
+        features.add(LOOP_DETECTION)
+    if d.memoizer is not None:
+        features.add(MEMOIZATION)
+    if d.journal is not None:
+        features.add(JOURNAL)
+    return features
+
+
+def choose_engine(name, features):
+    """
+    Return the fastest engine that supports all the given features. If
+    name is not AUTO, engines faster than the named one are not
+    considered, so the named engine is used if it supports the features
+    and otherwise it's downgraded.
+    """
+    candidates = ENGINES.values()
+    if name != AUTO:
+        limit = get_engine(name).speed
+        candidates = [engine for engine in candidates if engine.speed <= limit]
+    for engine in sorted(candidates, key=lambda e: e.speed, reverse=True):
+        if engine.capabilities.issuperset(features):
+            return engine
+    raise ValueError("No engine supports {}".format(", ".join(features)))
+
+
+def memoized(d):
+    """
+    Return the runner of the memoizing engine, creating the Memoizer of
+    the DC if it has none
+    """
+    if d.memoizer is None:
+        d.memoizer = Memoizer(d)
+    return d.memoizer.run
+
+
+register_engine(
+    "memoized", -1,
+    {BREAKPOINTS, TRACING, LOOP_DETECTION, MEMOIZATION},
+    memoized)
+register_engine(
+    "reference", 0,
+    {BREAKPOINTS, TRACING, LOOP_DETECTION, JOURNAL},
+    lambda d: d.run_reference)
+register_engine("fusion", 1, {BREAKPOINTS}, lambda d: Fuser(d).run)
+register_engine("fast", 2, {BREAKPOINTS}, lambda d: d.run_fast)
+register_engine("translated", 3, (), lambda d: Translator(d).run)
@@ -59,3 +59,49 @@ class Breakpoint(DCError):
     """
     Raised when a breakpoint is reached. To be handled by the interface.
     """
+
+
+class CycleLimitExceeded(DCError):
+    """
+    Raised when DC.run() reaches its cycle or time limit. cycles is the
+    number of instructions executed by that run, pc the program counter
+    and registers a dict with the values of all registers.
+    """
+    def __init__(self, msg="", cycles=0, pc=0, registers=None):
+        super().__init__(msg)
+        self.cycles = cycles
+        self.pc = pc
+        self.registers = registers or {}
+
+
+class InfiniteLoop(DCError):
+    """
+    Raised when the loop detection proved that the program never ends.
+    start and end are the lowest and highest address of the loop, period
+    is the number of instructions of one iteration.
+    """
+    def __init__(self, msg="", start=0, end=0, period=0):
+        super().__init__(msg)
+        self.start = start
+        self.end = end
+        self.period = period
+
+
+class SessionError(DCError):
+    """
+    Raised when a session file or snapshot can't be restored
+    """
+
+
+class ObjectFileError(DCError):
+    """
+    Raised when an object file (.dco) is invalid or was made for another
+    configuration
+    """
+
+
+class LinkError(DCError):
+    """
+    Raised when the modules of a program can't be linked, like an
+    imported label that no module exports
+    """
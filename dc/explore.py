@@ -0,0 +1,198 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Exhaustive exploration of the inputs of a program. The program runs once
+up to every input instruction and the state is forked there, once for
+every candidate input, so the common prefixes are executed only once.
+The interface stops the DC at an input instruction by raising
+InputRequired when it has no input for it yet.
+"""
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from . import DC, DCConfig
+from .errors import DCError
+
+DEFAULT_MAX_CYCLES = 10 ** 6
+
+# A node of the exploration tree. inputs are the inputs given so far,
+# outputs all outputs so far and cycles the executed instructions. If the
+# program asks for another input, children maps every candidate input to
+# the Branch that continues with it. Otherwise the program ended, error is
+# the name of the error that ended it or None after an END.
+Branch = namedtuple("Branch", ["inputs", "outputs", "cycles", "error",
+                               "children"])
+
+
+class InputRequired(Exception):
+    """
+    Raised by the ExplorerInterface when an input instruction is executed
+    before the input of the branch is known
+    """
+
+
+class ExplorerInterface():
+    """
+    Interface that hands out the inputs of the current branch and
+    collects the outputs
+    """
+    def __init__(self):
+        self.pending = []
+        self.output = []
+
+    def get_input(self):
+        if not self.pending:
+            raise InputRequired
+        return self.pending.pop()
+
+    def show_output(self, value):
+        self.output.append(value)
+
+    def take_output(self):
+        """
+        Return and forget the collected outputs
+        """
+        output = tuple(self.output)
+        del self.output[:]
+        return output
+
+
+def advance(d, max_cycles):
+    """
+    Run d until it executes an input instruction without a pending input.
+    Returns None if the program is waiting for an input there, otherwise
+    the name of the error that ended it, or "" after an END.
+    """
+    if d.cycles >= max_cycles:
+        return "CycleLimitExceeded"
+    try:
+        d.run_fast(max_cycles - d.cycles)
+    except InputRequired:
+        # Undo the fetch of the input instruction, it is executed again
+        # once the input is known
+        d.pc.set((d.pc.value - 1) & d.max_address)
+        d.cycles -= 1
+        return None
+    except DCError as error:
+        return type(error).__name__
+    if d.is_running:
+        return "CycleLimitExceeded"
+    return ""
+
+
+def stop_at_input(d, inputs, path, outputs, max_cycles):
+    # pylint: disable=too-many-arguments
+    """
+    Run d, which has got the inputs path and output outputs so far, up to
+    its next input. Returns the Branch and a snapshot of d if the program
+    waits for one of the candidates of that input (the caller adds the
+    children of the Branch then), otherwise None.
+    """
+    status = advance(d, max_cycles)
+    outputs = outputs + d.interface.take_output()
+    if status is None:
+        if len(path) < len(inputs):
+            return Branch(path, outputs, d.cycles, None, {}), d.snapshot()
+        status = "NoInputValue"
+    return Branch(path, outputs, d.cycles, status or None, {}), None
+
+
+def explore_branch(d, inputs, path, outputs, max_cycles):
+    # pylint: disable=too-many-arguments
+    """
+    Explore everything that follows the current state of d, which has
+    got the inputs path and output outputs so far
+    """
+    branch, snapshot = stop_at_input(d, inputs, path, outputs, max_cycles)
+    if snapshot is not None:
+        for value in inputs[len(path)]:
+            d.restore(snapshot)
+            d.interface.pending = [value]
+            branch.children[value] = explore_branch(
+                d, inputs, path + (value,), branch.outputs, max_cycles)
+    return branch
+
+
+def make_dc(snapshot):
+    """
+    Return a DC in the state of the snapshot
+    """
+    config = DCConfig()
+    config.address_width = snapshot.address_width
+    config.control_bits = snapshot.control_bits
+    d = DC(config)
+    d.interface = ExplorerInterface()
+    d.restore(snapshot)
+    return d
+
+
+def explore_fork(snapshot, value, inputs, path, outputs, max_cycles):
+    # pylint: disable=too-many-arguments
+    """
+    Process pool task: continue the snapshot with the given input up to
+    the next input, see stop_at_input()
+    """
+    d = make_dc(snapshot)
+    d.interface.pending = [value]
+    return stop_at_input(d, inputs, path + (value,), outputs, max_cycles)
+
+
+def explore(program, inputs, config=None, max_cycles=DEFAULT_MAX_CYCLES,
+            processes=None):
+    # pylint: disable=too-many-arguments
+    """
+    Explore a program (a list of lines like for DC.load()) with every
+    combination of inputs. inputs[i] are the candidate values for the
+    i-th input the program asks for, a program asking for more inputs
+    ends with a NoInputValue error. Every branch ends after max_cycles
+    instructions at the latest.
+
+    Every fork is a task of a process pool with the given number of
+    processes (None for one per CPU), the forks of a finished task are
+    queued again, so deep trees are spread over all processes too. If
+    processes is 0, everything is explored in this process. Returns the
+    root Branch.
+    """
+    d = DC(config or DCConfig())
+    d.interface = ExplorerInterface()
+    d.load(program)
+    inputs = [tuple(candidates) for candidates in inputs]
+    if processes == 0:
+        return explore_branch(d, inputs, (), (), max_cycles)
+    root, snapshot = stop_at_input(d, inputs, (), (), max_cycles)
+    if snapshot is None:
+        return root
+    with ProcessPoolExecutor(processes) as pool:
+        # future -> the Branch it is a child of and its input
+        pending = {}
+
+        def submit(branch, snapshot):
+            for value in inputs[len(branch.inputs)]:
+                # Keep the children in the order of the candidates
+                branch.children[value] = None
+                future = pool.submit(explore_fork, snapshot, value, inputs,
+                                     branch.inputs, branch.outputs,
+                                     max_cycles)
+                pending[future] = (branch, value)
+
+        submit(root, snapshot)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                branch, value = pending.pop(future)
+                child, snapshot = future.result()
+                branch.children[value] = child
+                if snapshot is not None:
+                    submit(child, snapshot)
+    return root
+
+
+def outcomes(branch):
+    """
+    Yield every finished Branch of the tree, i.e. the ones without
+    children
+    """
+    if not branch.children:
+        yield branch
+    for child in branch.children.values():
+        yield from outcomes(child)
@@ -0,0 +1,191 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Superinstruction fusion for the DC. Common instruction sequences are
+recognized in the RAM image and executed as a single fused handler,
+everything else runs through DC.cycle(). The architectural effects are
+exactly the same as executing the instructions one by one.
+"""
+import re
+
+from .errors import Breakpoint, DCError
+from .translate import BlockCompiler
+
+# Fusable sequences, as regular expressions over the space separated
+# command names starting at an address
+FUSION_PATTERNS = [
+    # LDA x / ADD y / STA z / JMP loop
+    re.compile(r"LDA (ADD|SUB) STA( JMP)?\b"),
+    # LDA x / DEC / STA x / JNZ loop
+    re.compile(r"(LDA )?(INC|DEC) STA( (JMP|JMS|JPL|JZE|JNM|JNP|JNZ))?\b"),
+    # PSH ... JSR
+    re.compile(r"((PSH|PSHM|PSHB) )+JSR\b"),
+    # POP ... POP
+    re.compile(r"(POP|POPM|POPB)( (POP|POPM|POPB))+\b"),
+]
+
+# Maximal number of instructions in a fused sequence
+MAX_FUSION = 16
+
+
+class Fuser():
+    """
+    Execution engine that fuses common instruction sequences. The fused
+    handlers are compiled with the BlockCompiler of the translator, only
+    for the recognized sequence. A sequence is split again, i.e. executed
+    through DC.cycle(), while a breakpoint lands inside it, and thrown
+    away as soon as one of its cells is overwritten.
+
+    cycles counts the executed instructions, fused_cycles the ones that
+    were executed by a fused handler.
+    """
+    def __init__(self, d):
+        self.d = d
+        # Per address: None if not matched yet, False if no sequence
+        # starts there, otherwise a (handler, length) tuple
+        self.entries = [None] * len(d.ram)
+        # address -> set of start addresses of the sequences covering it
+        self.owners = {}
+        self.cycles = 0
+        self.fused_cycles = 0
+        d.ram.watch(self._invalidate)
+
+    @property
+    def hit_rate(self):
+        """
+        Fraction of the executed instructions that ran fused
+        """
+        if not self.cycles:
+            return 0.0
+        return self.fused_cycles / self.cycles
+
+    def _invalidate(self, address, value_):
+        """
+        RAM watcher that forgets every sequence covering the address
+        """
+        if address is None:
+            self.entries[:] = [None] * len(self.entries)
+            self.owners.clear()
+            return
+        for start in self.owners.pop(address % len(self.entries), ()):
+            self.entries[start] = None
+
+    def match(self, start):
+        """
+        Return the length of the fusable sequence starting at the given
+        address, or 0 if there is none
+        """
+        d = self.d
+        end = min(start + MAX_FUSION, len(d.ram))
+        names = " ".join(d.tables.name(d.ram[address])
+                         for address in range(start, end))
+        for pattern in FUSION_PATTERNS:
+            found = pattern.match(names)
+            if not found:
+                continue
+            return found.group().count(" ") + 1
+        return 0
+
+    def fuse(self, start):
+        """
+        Match and compile the sequence starting at the given address and
+        return its entry
+        """
+        d = self.d
+        length = self.match(start)
+        if length:
+            handler, _ = BlockCompiler(d, start, length).compile()
+            entry = (handler, length)
+        else:
+            entry = False
+        # Only the fused cells matter. A change behind the sequence could
+        # make it longer, but missing that never changes the results.
+        cells = range(start, start + (length or 1))
+        for address in cells:
+            self.owners.setdefault(address, set()).add(start)
+        d.ram.watched.update(cells)
+        self.entries[start] = entry
+        return entry
+
+    def step(self):
+        """
+        Execute a single instruction or a whole fused sequence, just like
+        DC.cycle() would do. Returns the number of executed instructions.
+        """
+        d = self.d
+        pc = d.pc.value
+        entry = self.entries[pc]
+        if entry is None:
+            entry = self.fuse(pc)
+        if (not entry or d.trace is not None or
+                (d.breakpoints and
+                 not d.breakpoints.isdisjoint(range(pc + 1,
+                                                    pc + entry[1])))):
+            self.cycles += 1
+            d.cycle()
+            return 1
+        return self.execute(pc, entry[0])
+
+    def execute(self, pc, handler):
+        """
+        Run the fused handler of the sequence starting at pc
+        """
+        d = self.d
+        try:
+            npc, ac, sp, bp, ir, dr, ar, count = handler(
+                d.ac.signed_value, d.sp.value, d.bp.value)
+        except DCError:
+            # The handler has written back the state of the failed
+            # instruction, which is never a jump
+            count = d.pc.value - pc
+            self.cycles += count
+            self.fused_cycles += count
+            d.cycles += count
+            raise
+        d.set_registers(ir, dr, npc, ac, ar, sp, bp)
+        self.cycles += count
+        self.fused_cycles += count
+        d.cycles += count
+        if d.is_running and npc in d.breakpoints:
+            d.is_running = False
+            raise Breakpoint("Breakpoint for {} set".format(npc))
+        return count
+
+    def run(self, max_cycles=None):
+        """
+        Execute the program until an END is reached, an error occurs or
+        max_cycles instructions have been executed, just like
+        DC.run_reference(). Returns the number of executed instructions.
+        """
+        d = self.d
+        entries = self.entries
+        # Close to the budget, single instructions are executed so the
+        # budget is met exactly
+        limit = (max_cycles - MAX_FUSION
+                 if max_cycles is not None else float("inf"))
+        executed = 0
+        d.is_running = True
+        while d.is_running:
+            if d.breakpoints or d.trace is not None or executed >= limit:
+                if executed == max_cycles:
+                    break
+                if executed < limit:
+                    executed += self.step()
+                else:
+                    self.cycles += 1
+                    executed += 1
+                    d.cycle()
+                if d.trace is not None:
+                    d.trace(d)
+                continue
+            pc = d.pc.value
+            entry = entries[pc]
+            if entry is None:
+                entry = self.fuse(pc)
+            if entry:
+                executed += self.execute(pc, entry[0])
+            else:
+                self.cycles += 1
+                executed += 1
+                d.cycle()
+        return executed
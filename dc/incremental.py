@@ -0,0 +1,422 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Incremental assembler for the editor.
+
+An AssemblySession keeps the tokens, instructions and encoded words of
+every line of a DCL file. replace() parses only the lines touched by an
+edit, plus the following lines as long as an instruction or a label
+carries over into them. The addresses of labels are left out of the
+words and only added by program(), so an edit doesn't depend on the
+position of its lines and moving a label encodes nothing again. Only the
+instructions that use a label whose definition changed, e.g. an EQUAL
+value, are encoded again. So the cost of replace() depends on the size of
+the edit, not of the file.
+
+program() is not incremental: the Program it returns holds every word, so
+it copies the words of all lines and adds the label addresses, which takes
+time proportional to the size of the file (without parsing or encoding
+anything). If the file has an error, program() assembles it as a whole to
+find the error the assembler reports first.
+"""
+from itertools import accumulate, chain, compress, count, repeat
+from operator import add, attrgetter
+
+from .assembler import SCANNER, symbols
+from .errors import DCError
+from .program import Program
+
+# State at the start of a file: no instruction or EQUAL waits for its
+# argument and no labels wait for the next instruction
+INITIAL = (None, ())
+
+# Value of the labels of instructions, their address is only known to
+# program()
+ADDRESS = object()
+
+# refs of the lines without labels of instructions, shared by all of them
+NO_REFS = [(None,) * number for number in range(8)]
+
+
+class _Line():
+    # pylint: disable=too-few-public-methods
+    """
+    A line of the file. entry and exit are the states at its start and
+    end: the (kind, name, back) of an instruction or EQUAL that waits for
+    its argument (or None) and the labels that wait for the next
+    instruction. instructions are the (opcode, arg, back) of the
+    instructions that get their argument on this line, words their
+    encoded words and definitions the (label, number, value, back) of
+    the labels defined here, number is the index of the instruction in
+    this line or None for EQUAL. back is the number of lines in front of
+    this one where the instruction or EQUAL started. error is the
+    (message, back) of the first error of the line or None. refs has
+    the label whose address is added to every word, or None.
+    """
+    __slots__ = ("text", "entry", "exit", "instructions", "definitions",
+                 "error", "words", "refs")
+
+    def __init__(self, text, entry, parsed):
+        self.text = text
+        self.entry = entry
+        self.instructions, self.definitions, self.error, self.exit = parsed
+        self.words = ()
+        self.refs = ()
+
+
+def _parse(tokens, entry, opcodes, opcodes_without_arg):
+    """
+    Parse the tokens of a line, starting in the state entry, the same way
+    assembler.assemble() does. Returns the instructions, definitions,
+    error and exit state of the line, see _Line.
+    """
+    expect, carried = entry
+    labels = list(carried)
+    instructions = []
+    definitions = []
+    error = None
+    for token in tokens:
+        if expect is not None:
+            kind, name, back = expect
+            expect = None
+            if kind == "value":
+                definitions.append((name, None, token, back))
+                continue
+            opcode = name
+            arg = token.upper()
+        else:
+            token = token.upper()
+            if token in opcodes_without_arg:
+                opcode = token
+                arg = None
+                back = 0
+            elif token in opcodes or token == "DEF":
+                expect = ("argument", token, 0)
+                continue
+            elif token == "EQUAL":
+                if labels:
+                    expect = ("value", labels.pop(), 0)
+                elif error is None:
+                    error = ("Expected label", 0)
+                continue
+            else:
+                labels.append(token)
+                continue
+        # Every label in front of the instruction points at it
+        if labels:
+            number = len(instructions)
+            for label in labels:
+                definitions.append((label, number, None, back))
+            labels.clear()
+        instructions.append((opcode, arg, back))
+    if expect is not None:
+        kind, name, back = expect
+        expect = (kind, name, back + 1)
+    return (tuple(instructions), tuple(definitions), error,
+            (expect, tuple(labels)))
+
+
+class AssemblySession():
+    # pylint: disable=too-many-instance-attributes
+    """
+    Incremental assembler for the DCL file in an editor, for the
+    configuration of the DC d. Feed it the edits with replace() and get
+    the assembled Program with program().
+    """
+    def __init__(self, d, text=""):
+        self.d = d
+        self.encode = d.word_encoder()
+        # Words of the instructions without argument
+        self.plain = {opcode: d.opcodes[opcode] << d.conf.address_width
+                      for opcode in d.opcodes_without_arg}
+        self.lines = []
+        # Number of instructions in all lines
+        self.total = 0
+        # label -> list of (line, index of the definition) of every
+        # definition
+        self.sites = {}
+        # label -> value given with EQUAL or ADDRESS
+        self.labels = {}
+        # argument -> set of the lines with instructions using it
+        self.uses = {}
+        # Lines with a parse error, with an instruction that couldn't be
+        # encoded and with an instruction that started on another line
+        self.broken = set()
+        self.bad = set()
+        self.split = set()
+        # Lines with a definition of a label of an instruction and labels
+        # defined more than once
+        self.defining = set()
+        self.duplicates = set()
+        # (text, entry state) -> parsed line, most lines look alike
+        self._parsed = {}
+        self._program = None
+        self.set_text(text)
+
+    def set_text(self, text):
+        """
+        Start over with the text of a whole file, lines end with \n like
+        the blocks of a QTextDocument
+        """
+        self.lines = []
+        self.total = 0
+        for collection in (self.sites, self.labels, self.uses, self.broken,
+                           self.bad, self.split, self.defining,
+                           self.duplicates, self._parsed):
+            collection.clear()
+        self.replace(0, 0, text.split("\n"))
+
+    def texts(self):
+        """
+        Return an iterator over the text of every line
+        """
+        return map(attrgetter("text"), self.lines)
+
+    def span(self, first, chars):
+        """
+        Return the number of lines starting with the line first that
+        contain the following chars characters (counting line breaks),
+        i.e. the lines touched by removing them
+        """
+        lines = self.lines
+        index = first
+        chars -= len(lines[index].text)
+        while chars > 0 and index + 1 < len(lines):
+            index += 1
+            chars -= len(lines[index].text) + 1
+        return index - first + 1
+
+    def _line(self, text, entry):
+        """
+        Return a new _Line for the text that starts in the state entry
+        """
+        key = (text, entry)
+        parsed = self._parsed.get(key)
+        if parsed is None:
+            tokens = [token for token in SCANNER.findall(text) if token]
+            parsed = _parse(tokens, entry, self.d.opcodes,
+                            self.d.opcodes_without_arg)
+            self._parsed[key] = parsed
+        return _Line(text, entry, parsed)
+
+    def replace(self, first, count_, texts):
+        """
+        Replace count_ lines starting with the line first (0-based) with
+        the lines texts
+        """
+        lines = self.lines
+        if len(self._parsed) > 2 * len(lines) + 1024:
+            self._parsed.clear()
+        make_line = self._line
+        entry = lines[first - 1].exit if first else INITIAL
+        new = []
+        for text in texts:
+            line = make_line(text, entry)
+            entry = line.exit
+            new.append(line)
+        end = first + count_
+        # The following lines only change if their state at the start did
+        while end < len(lines) and lines[end].entry != entry:
+            line = make_line(lines[end].text, entry)
+            entry = line.exit
+            new.append(line)
+            end += 1
+
+        changed = set()
+        for line in lines[first:end]:
+            self._forget(line, changed)
+        # Only moves the pointers behind the edit
+        lines[first:end] = new
+        sites = self.sites
+        for line in new:
+            self.total += len(line.instructions)
+            for index, (label, number, _, _) in enumerate(line.definitions):
+                label_sites = sites.get(label)
+                if label_sites is None:
+                    sites[label] = [(line, index)]
+                else:
+                    label_sites.append((line, index))
+                if number is not None:
+                    self.defining.add(line)
+                changed.add(label)
+        for label in changed:
+            self._resolve(label)
+        for line in new:
+            self._learn(line)
+        self._program = None
+
+    def _forget(self, line, changed):
+        """
+        Remove everything the line added, the labels it defined are added
+        to changed
+        """
+        self.total -= len(line.instructions)
+        for _, arg, _ in line.instructions:
+            uses = self.uses.get(arg)
+            if uses is not None:
+                uses.discard(line)
+                if not uses:
+                    del self.uses[arg]
+        for label, _, _, _ in line.definitions:
+            sites = self.sites[label]
+            sites[:] = [site for site in sites if site[0] is not line]
+            changed.add(label)
+        for lines in (self.broken, self.bad, self.split, self.defining):
+            lines.discard(line)
+
+    def _resolve(self, label):
+        """
+        Update the value of the label from its definitions and encode the
+        instructions using it again if it changed
+        """
+        sites = self.sites.get(label)
+        if not sites:
+            self.sites.pop(label, None)
+            self.duplicates.discard(label)
+            value = None
+        else:
+            if len(sites) > 1:
+                # An error, program() lets the assembler report it
+                self.duplicates.add(label)
+            else:
+                self.duplicates.discard(label)
+            line, index = sites[0]
+            _, number, value, _ = line.definitions[index]
+            if number is not None:
+                value = ADDRESS
+        if self.labels.get(label) == value:
+            return
+        if value is None:
+            del self.labels[label]
+        else:
+            self.labels[label] = value
+        for line in self.uses.get(label, ()):
+            self._encode(line)
+
+    def _learn(self, line):
+        """
+        Add the instructions of a new line and encode them
+        """
+        if line.error is not None:
+            self.broken.add(line)
+        uses = self.uses
+        for _, arg, back in line.instructions:
+            if back:
+                self.split.add(line)
+            if arg is not None:
+                lines = uses.get(arg)
+                if lines is None:
+                    uses[arg] = {line}
+                else:
+                    lines.add(line)
+        self._encode(line)
+
+    def _encode(self, line):
+        """
+        Encode the instructions of the line, the ones using the label of
+        an instruction with the address 0
+        """
+        plain = self.plain
+        labels = self.labels
+        encode = self.encode
+        words = []
+        refs = None
+        bad = False
+        for opcode, arg, _ in line.instructions:
+            if arg is None:
+                words.append(plain[opcode])
+                continue
+            value = labels.get(arg)
+            if value is ADDRESS:
+                if refs is None:
+                    refs = [None] * len(line.instructions)
+                refs[len(words)] = arg
+                value = 0
+            elif value is None:
+                try:
+                    value = int(arg)
+                except ValueError:
+                    # Invalid label
+                    bad = True
+                    words.append(0)
+                    continue
+            try:
+                words.append(encode(0, opcode, value, 0))
+            except DCError:
+                bad = True
+                words.append(0)
+        line.words = words
+        if refs is not None:
+            line.refs = refs
+        elif len(words) < len(NO_REFS):
+            line.refs = NO_REFS[len(words)]
+        else:
+            line.refs = (None,) * len(words)
+        if bad:
+            self.bad.add(line)
+        else:
+            self.bad.discard(line)
+
+    def _failing(self):
+        """
+        Return True if assembling the file raises an error
+        """
+        lines = self.lines
+        return bool(self.broken or self.bad or self.duplicates or
+                    self.total > self.d.max_address + 1 or
+                    (lines and lines[-1].exit[0] is not None))
+
+    def check(self):
+        """
+        Raise the error that assembling the whole file would raise
+        """
+        if self._failing():
+            # Which error comes first depends on the order in which the
+            # one pass assembler meets them, so it finds the error
+            self.d.assemble_program(self.texts())
+
+    def program(self):
+        """
+        Return the Program of the current text, the same one that
+        DC.assemble_program() returns. Raises the AssembleError (or other
+        DCError) that DC.assemble_program() raises. The Program is kept
+        until the next edit, building it takes time proportional to the
+        size of the file.
+        """
+        if self._program is not None:
+            return self._program
+        if self._failing():
+            self._program = self.d.assemble_program(self.texts())
+            return self._program
+        lines = self.lines
+        counts = list(map(len, map(attrgetter("words"), lines)))
+        starts = list(accumulate(chain((0,), counts)))
+        source_lines = list(chain.from_iterable(map(repeat, count(1),
+                                                    counts)))
+        # The positions of the lines that define a label or have an
+        # instruction that started on another line
+        marked = self.defining | self.split
+        positions = {}
+        if marked:
+            for index in compress(count(), map(marked.__contains__, lines)):
+                positions[lines[index]] = index
+        labels = dict(self.labels)
+        for line in self.defining:
+            start = starts[positions[line]]
+            for label, number, _, _ in line.definitions:
+                if number is not None:
+                    labels[label] = start + number
+        for line in self.split:
+            index = positions[line]
+            start = starts[index]
+            for number, (_, _, back) in enumerate(line.instructions):
+                source_lines[start + number] = index + 1 - back
+        # Add the address of its label to every word that has one
+        words = chain.from_iterable(map(attrgetter("words"), lines))
+        refs = chain.from_iterable(map(attrgetter("refs"), lines))
+        words = list(map(add, words, map(labels.get, refs, repeat(0))))
+        conf = self.d.conf
+        self._program = Program(conf.address_width, conf.control_bits,
+                                self.d.tables, list(enumerate(words)),
+                                symbols(labels), dict(enumerate(source_lines)))
+        return self._program
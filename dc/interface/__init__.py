@@ -3,8 +3,13 @@
 """
 Module contains the main Qt interface class
 """
-from ..errors import ScriptError, AssembleError, DCError, NoInputValue
-from ..util import number_of_digits, signed_value, get_file_content, splitlines
+from .. import objfile
+from ..asmcache import AssemblyCache, dc_text, source_hash
+from ..engines import AUTO, ENGINES
+from ..errors import (ScriptError, DCError, NoInputValue, SessionError,
+                      ObjectFileError, CycleLimitExceeded)
+from ..snapshot import save_session, load_session
+from ..util import number_of_digits, get_file_content
 from .rammodel import RAMModel, RAMStyler
 from .ui_main import Ui_DCWindow
 from .editor import Editor
@@ -73,6 +78,8 @@ class Interface(Qt.QMainWindow):
         # that is not what we want.
         self._selection_locked = False
 
+        # Assembled programs, shared with the editor
+        self.assembly_cache = AssemblyCache()
         self.editor = Editor(self)
 
         # Try to get the resource stream
@@ -171,15 +178,47 @@ class Interface(Qt.QMainWindow):
                 self.report(error)
             self.update_screen()
 
+    def step_back(self, count=1):
+        """
+        Undoes the last count steps, but only if the program isn't
+        running. Like .step(), this can be used for GUI buttons.
+        """
+        if not self.is_running():
+            self._log_rewind(self.d.step_back(count))
+            self.update_screen()
+
+    def reverse_continue(self):
+        """
+        Goes back to the last time the program stopped at a breakpoint
+        (or as far back as possible)
+        """
+        if not self.is_running():
+            self._log_rewind(self.d.reverse_continue())
+            self.update_screen()
+
+    def _log_rewind(self, count):
+        """
+        Log how many steps were undone
+        """
+        if count:
+            self.log_line("Went back {} step{}".format(
+                count, "" if count == 1 else "s"))
+        else:
+            self.log_line("No earlier steps recorded")
+
     def _metronome_step(self):
         """
         This is the function that gets executed with every metronome
-        tick. It advances the DC just like .step(), but bypasses the
-        check that .step(). It will also stop the metronome if the
-        program reached its end.
+        tick. It advances the DC by a single step like .step(), but
+        bypasses the check that .step() does and runs the step with the
+        engine picked by DC.run() (see the engine command). It will also
+        stop the metronome if the program reached its end.
         """
         try:
-            self.d.cycle()
+            self.d.run(1)
+        except CycleLimitExceeded:
+            # Not the end of the program, continue with the next tick
+            self.d.is_running = True
         except DCError as error:
             self.report(error)
         self.update()
@@ -291,15 +330,15 @@ class Interface(Qt.QMainWindow):
     def show_load_dialog(self):
         """
         Shows the dialog to load or assemble a file.
-        A .dc file will get loaded, a .dcl file will get assembled
+        A .dc or .dco file will get loaded, a .dcl file will get assembled
         first.
         """
         # Returns (name, filter) as stated by the docs of PyQt5 at
         # http://pyqt.sourceforge.net/Docs/PyQt5/pyqt4_differences.html#qfiledialog
         name, _ = Qt.QFileDialog.getOpenFileName(
             directory=self.lastdir, caption="Open file",
-            filter="DC files (*.dc *.dcl)")
-        if name.lower().endswith(".dc"):
+            filter="DC files (*.dc *.dcl *.dco)")
+        if name.lower().endswith((".dc", ".dco")):
             self.load_file(name)
         elif name.lower().endswith(".dcl"):
             self.assemble_file(name)
@@ -311,7 +350,8 @@ class Interface(Qt.QMainWindow):
         # The file dialog already asks for overwrite, so we should be
         # fine just accepting the filename
         name, _ = Qt.QFileDialog.getSaveFileName(
-            directory=self.lastdir, caption="Save file")
+            directory=self.lastdir, caption="Save file",
+            filter="DC files (*.dc);;DC object files (*.dco)")
         if name:
             self.save_file(name)
 
@@ -320,16 +360,17 @@ class Interface(Qt.QMainWindow):
         Loads the file given by name
         """
         self.lastdir = os.path.dirname(name)
+        if name.lower().endswith(objfile.EXTENSION):
+            self.load_object(name)
+            return
         try:
             content, encoding_ = get_file_content(name)
         except IOError:
             Qt.QMessageBox.critical(self, "Error",
                                     "Can't access {}".format(name))
             return
-        else:
-            content = splitlines(content)
         try:
-            self.d.load(content)
+            self.d.load(self.assembly_cache.program(self.d, content, "dc"))
             self.log_line("Loaded {}".format(name))
             self.update_screen()
         except ScriptError as error:
@@ -338,20 +379,42 @@ class Interface(Qt.QMainWindow):
                 ("Invalid script file (maybe you forgot to assemble it?):"
                  "<br><b> {}").format(error.msg))
 
+    def load_object(self, name):
+        """
+        Loads the object file (.dco) given by name
+        """
+        try:
+            objfile.load_file(self.d, name)
+        except IOError:
+            Qt.QMessageBox.critical(self, "Error",
+                                    "Can't access {}".format(name))
+            return
+        except ObjectFileError as error:
+            Qt.QMessageBox.critical(self, "Error", error.msg)
+            return
+        self.log_line("Loaded {}".format(name))
+        self.update_screen()
+
     def save_file(self, name):
         """
-        Saves the RAM to the given file name
+        Saves the RAM to the given file name, as object file if the name
+        ends with .dco
         """
         self.lastdir = os.path.dirname(name)
+        if name.lower().endswith(objfile.EXTENSION):
+            try:
+                objfile.save_file(name, objfile.pack_ram(self.d))
+            except IOError as error:
+                Qt.QMessageBox.critical(
+                    self, "Error", "Can't save {}: {}".format(name, error))
+            return
         ram = self.d.ram
         address_length = number_of_digits(len(ram), 10)
         template = "{addr:>{width}} {command:<4} {arg}\n"
+        tables = self.d.tables
 
         def format_line(i, cell):
-            command = self.d.command_name(cell)
-            arg = cell & self.d.max_address
-            if command == "DEF":
-                arg = signed_value(cell, self.d.cellwidth)
+            command, arg = tables.split(cell)
             return template.format(
                 addr=i,
                 width=address_length,
@@ -373,6 +436,56 @@ class Interface(Qt.QMainWindow):
                                     "Can't save {}: {}".format(name, error))
             return
 
+    def show_session_dialog(self, save):
+        """
+        Shows the dialog to save (if save is True) or load a session
+        """
+        if save:
+            name, _ = Qt.QFileDialog.getSaveFileName(
+                directory=self.lastdir, caption="Save session",
+                filter="DC sessions (*.dcs)")
+        else:
+            name, _ = Qt.QFileDialog.getOpenFileName(
+                directory=self.lastdir, caption="Load session",
+                filter="DC sessions (*.dcs)")
+        if name and save:
+            self.save_session(name)
+        elif name:
+            self.load_session(name)
+
+    def save_session(self, name):
+        """
+        Saves the complete state of the DC, so the program can be resumed
+        later
+        """
+        self.lastdir = os.path.dirname(name)
+        self.pause_execution()
+        try:
+            save_session(self.d, name)
+        except IOError as error:
+            Qt.QMessageBox.critical(self, "Error",
+                                    "Can't save {}: {}".format(name, error))
+            return
+        self.log_line("Saved session to {}".format(name))
+
+    def load_session(self, name):
+        """
+        Restores the state of the DC from a session file
+        """
+        self.lastdir = os.path.dirname(name)
+        self.pause_execution()
+        try:
+            load_session(self.d, name)
+        except IOError:
+            Qt.QMessageBox.critical(self, "Error",
+                                    "Can't access {}".format(name))
+            return
+        except SessionError as error:
+            Qt.QMessageBox.critical(self, "Error", error.msg)
+            return
+        self.log_line("Loaded session {}".format(name))
+        self.update_screen()
+
     @staticmethod
     def _assembled_name(name):
         """
@@ -394,17 +507,20 @@ class Interface(Qt.QMainWindow):
             Qt.QMessageBox.critical(self, "Error",
                                     "Can't access {}".format(name))
             return
-        else:
-            content = splitlines(content)
+        dc_name = self._assembled_name(name)
         try:
-            assembled = self.d.assemble(content)
-        except AssembleError as error:
+            program, up_to_date = self.assembly_cache.program_for_file(
+                self.d, content, name, dc_name)
+        except DCError as error:
             Qt.QMessageBox.critical(self, "Error", error.msg)
             return
         self.log_line("Assembled {}".format(name))
-        self.d.load(assembled)
+        self.d.load(program)
         self.update_screen()
-        name = self._assembled_name(name)
+        if up_to_date:
+            # The .dc file was assembled from this very source
+            return
+        name = dc_name
         if os.access(name, os.R_OK):
             res = Qt.QMessageBox.question(
                 self, "Overwrite", ("File {} already"
@@ -414,7 +530,7 @@ class Interface(Qt.QMainWindow):
                 return
         try:
             with open(name, "w") as output_file:
-                output_file.write("\r\n".join(assembled))
+                output_file.write(dc_text(program, source_hash(content)))
             self.log_line("Saved file to {}".format(name))
         except IOError:
             Qt.QMessageBox.warning(
@@ -536,6 +652,38 @@ class Interface(Qt.QMainWindow):
                     self.d.breakpoints.remove(address)
                 except KeyError:
                     self.d.breakpoints.add(address)
+        elif order == "back":
+            try:
+                count = int(cmd[1]) if len(cmd) > 1 else 1
+                if count < 1:
+                    raise ValueError
+            except ValueError:
+                Qt.QMessageBox.warning(self, "Invalid",
+                                       "back expects a positive integer")
+            else:
+                self.step_back(count)
+        elif order == "rb":
+            self.reverse_continue()
+        elif order in {"savesession", "loadsession"}:
+            save = order == "savesession"
+            if len(cmd) > 1:
+                if save:
+                    self.save_session(cmd[1])
+                else:
+                    self.load_session(cmd[1])
+            else:
+                self.show_session_dialog(save)
+        elif order == "engine":
+            names = [AUTO] + sorted(ENGINES)
+            if len(cmd) > 1 and cmd[1] not in names:
+                Qt.QMessageBox.warning(self, "Invalid",
+                                       "Available engines: {}"
+                                       .format(", ".join(names)))
+            else:
+                if len(cmd) > 1:
+                    self.d.conf.engine = cmd[1]
+                self.log_line("Engine: {} (currently {})".format(
+                    self.d.conf.engine, self.d.engine().name))
         elif order == "togglegui":
             self.gui_enabled = not self.gui_enabled
             self.log_line("GUI is now {}".format(
@@ -5,6 +5,7 @@ Module containing the editor window
 """
 from .ui_editor import Ui_Editor
 from .filetab import FileTab
+from ..asmcache import sniff
 from ..errors import DCError
 from PyQt5 import Qt
 import os
@@ -39,7 +40,7 @@ class Editor(Qt.QMainWindow):
         """
         Create a new empty file in a new tab without a filename.
         """
-        tab = FileTab(None)
+        tab = FileTab(None, d=self.dc_object)
         self.ui.tabs.addTab(tab, self.new_tab_icon, self.NEW_FILE_NAME)
         self.ui.tabs.setCurrentIndex(self.ui.tabs.count() - 1)
 
@@ -64,7 +65,7 @@ class Editor(Qt.QMainWindow):
                 self.ui.tabs.setCurrentIndex(i)
                 return
         tab_text = os.path.basename(filename)
-        tab = FileTab(filename)
+        tab = FileTab(filename, d=self.dc_object)
         tab.try_reload()
         self.ui.tabs.addTab(tab, self.new_tab_icon, tab_text)
         self.ui.tabs.setCurrentIndex(self.ui.tabs.count() - 1)
@@ -162,21 +163,20 @@ class Editor(Qt.QMainWindow):
         tab = self.ui.tabs.currentWidget()
         if tab is None:
             return
-        lines = tab.text.toPlainText().split("\n")
+        # The tab's session has the assembly up to date, DC files go
+        # through the cache
+        cache = self.interface.assembly_cache
         error = None
         try:
-            self.dc_object.load(lines)
-        except DCError:
-            # That's okay, maybe we need to assemble it first
-            try:
-                assembled = self.dc_object.assemble(lines)
-            except DCError as exc_error:
-                error = exc_error
+            if tab.session is not None and sniff(tab.session.texts()) == "dcl":
+                program = tab.session.program()
             else:
-                try:
-                    self.dc_object.load(assembled)
-                except DCError as exc_error:
-                    error = exc_error
+                program = cache.program(self.dc_object,
+                                        tab.text.toPlainText())
+        except DCError as exc_error:
+            error = exc_error
+        else:
+            self.dc_object.load(program)
         if error is None:
             self.interface.update_screen()
             self.interface.raise_()
@@ -6,6 +6,7 @@ Module containing the tab widget
 from .highlight import Highlighter
 from .. import util
 from .. import DC
+from ..incremental import AssemblySession
 import logging
 from PyQt5 import Qt, QtCore
 
@@ -16,12 +17,14 @@ logger = logging.getLogger(__name__)
 class FileTab(Qt.QWidget):
     """
     This is a tab for a single file. They get created by the editor
-    window, each tab represents a seperate file.
+    window, each tab represents a seperate file. If the DC d is given, the
+    tab keeps an AssemblySession of its text up to date.
     """
-    def __init__(self, filename, encoding="utf-8"):
+    def __init__(self, filename, encoding="utf-8", d=None):
         super().__init__()
         self.filename = filename
         self.encoding = encoding
+        self.session = AssemblySession(d) if d is not None else None
         self.setLayout(Qt.QGridLayout())
         self.layout().setContentsMargins(0, 0, 0, 0)
         self.text = Qt.QPlainTextEdit()
@@ -33,6 +36,7 @@ class FileTab(Qt.QWidget):
         """)
         self.text.setFont(Qt.QFont("DejaVu Sans Mono"))
         self.text.textChanged.connect(self._text_changed)
+        self.text.document().contentsChange.connect(self._contents_change)
         self.text.cursorPositionChanged.connect(self.highlight_current_line)
         self.highlight_current_line()
         self.layout().addWidget(self.text)
@@ -50,6 +54,34 @@ class FileTab(Qt.QWidget):
             return
         self.modified = True
 
+    def _contents_change(self, position, removed, added):
+        """
+        Function called when the document has changed, passes the changed
+        lines on to the assembly session
+        """
+        if self.session is None:
+            return
+        document = self.text.document()
+        first = document.findBlock(position)
+        last = document.findBlock(position + added)
+        number = first.blockNumber()
+        if (not first.isValid() or not last.isValid() or
+                number >= len(self.session.lines)):
+            self.session.set_text(self.text.toPlainText())
+            return
+        count = self.session.span(number,
+                                  position - first.position() + removed)
+        texts = [first.text()]
+        block = first
+        while block != last:
+            block = block.next()
+            texts.append(block.text())
+        self.session.replace(number, count, texts)
+        if len(self.session.lines) != document.blockCount():
+            # Qt sometimes reports more changed characters than there
+            # are, e.g. for the first change of a document
+            self.session.set_text(self.text.toPlainText())
+
     def save(self):
         """
         Re-save the file under the old filename.
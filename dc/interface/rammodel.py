@@ -7,7 +7,6 @@ DC RAM
 
 
 from ..errors import ScriptError
-from ..util import signed_value
 from PyQt5 import Qt, QtCore, QtGui
 
 ICON_SIZE = (12, 12)
@@ -86,12 +85,8 @@ class RAMModel(QtCore.QAbstractItemModel):
         if role == QtCore.Qt.DisplayRole:
             adr = index.row()
             cell = self.d.ram[adr]
-            cmd = self.d.command_name(cell)
-            sval = signed_value(cell, self.d.cellwidth)
-            if cmd == "DEF":
-                arg = sval
-            else:
-                arg = cell & self.d.max_address
+            cmd, arg = self.d.tables.split(cell)
+            sval = self.d.tables.signed(cell)
             return("{adr:3} {cmd:4} {arg:5} | {val:0{w}b} ({sval})".format(
                 adr=adr, cmd=cmd, arg=arg, val=cell, w=self.d.cellwidth,
                 sval=sval))
@@ -117,6 +112,9 @@ class RAMModel(QtCore.QAbstractItemModel):
                 self.d.ram[cell] = self.d.parse_command(value)
             except ScriptError:
                 return False
+            if self.d.journal is not None:
+                # Changes by hand can't be undone
+                self.d.journal.clear()
             self.dataChanged.emit(index, index)
             return True
 
@@ -0,0 +1,245 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Journal of the executed instructions, used to step backwards through a
+program.
+"""
+import array
+import sys
+
+# Values per journal entry: IR, DR, PC, AC, AR, SP, BP before the
+# instruction, the written address and its old value, and whether the
+# return address mark touched by JSR/RTN was set before (0 if the
+# instruction is no JSR/RTN, 1 if it wasn't set, 2 if it was set)
+ENTRY = 10
+ADDRESS, OLD, MARK = 7, 8, 9
+NO_MARK, UNMARKED, MARKED = range(3)
+
+# A full snapshot of the RAM is taken every SNAPSHOT_INTERVAL entries, so
+# long rewinds don't have to undo every single instruction
+SNAPSHOT_INTERVAL = 256
+
+
+class Journal():
+    """
+    Ring buffer that records the state changes of every instruction
+    executed by DC.cycle(): the registers before the instruction and the
+    cell it wrote (every instruction writes at most the cell in AR) with
+    its old value. The written cell is found after the instruction by
+    comparing the cell in AR with a copy of the RAM, so no cell has to
+    be watched and stores don't go through RAM.notify(). The entries are
+    packed into a single array with the typecode of the RAM, so the
+    memory use is about budget bytes, including the copy and the
+    snapshots. When the buffer is full, the oldest entries are dropped.
+
+    Changes that can't be undone, like loading a program or executing
+    instructions with another engine, clear the journal. Cells changed
+    by hand have to be reported with clear().
+    """
+    def __init__(self, d, budget):
+        self.d = d
+        ram = d.ram
+        size = ram.itemsize
+        snapshot_size = len(ram) * size + sys.getsizeof(b"")
+        self.capacity = int((budget - len(ram) * size) //
+                            (ENTRY * size + snapshot_size / SNAPSHOT_INTERVAL))
+        if self.capacity < 1:
+            raise ValueError("Journal budget of {} bytes is too small"
+                             .format(budget))
+        self.entries = array.array(ram.typecode,
+                                   [0]) * (self.capacity * ENTRY)
+        # Index of the next entry and of the oldest entry that may be
+        # undone, counted since the journal was cleared
+        self.end = 0
+        self.start = 0
+        # Index of the entry -> (RAM contents, return addresses) before
+        # the instruction of the entry was executed
+        self.snapshots = {}
+        # Offset of the entry of the last instruction, None if its
+        # written cell has already been recorded
+        self.current = None
+        # The value of d.cycles after the last instruction
+        self.cycles = None
+        # Copy of the RAM before the last instruction, None if it has to
+        # be taken again
+        self.shadow = None
+        self.rewinding = False
+        # Only to hear about changes of the whole RAM
+        ram.watch(self._update)
+
+    def __len__(self):
+        """
+        Number of instructions that can be undone
+        """
+        self._written()
+        return self.end - max(self.start, self.end - self.capacity)
+
+    def memory_use(self):
+        """
+        Return the size of the journal in bytes
+        """
+        return (sys.getsizeof(self.entries) + sys.getsizeof(self.shadow) +
+                sum(sys.getsizeof(ram) for ram, _ in self.snapshots.values()))
+
+    def clear(self):
+        """
+        Forget all recorded instructions
+        """
+        self.start = self.end
+        self.snapshots.clear()
+        self.current = None
+        self.shadow = None
+
+    def detach(self):
+        """
+        Stop watching the RAM of the DC
+        """
+        self.d.ram.unwatch(self._update)
+
+    def _update(self, address, value_):
+        """
+        RAM watcher that notices changes of the whole RAM, single cells
+        are handled by _written()
+        """
+        if address is None and not self.rewinding:
+            self.clear()
+
+    def _written(self):
+        """
+        Record the cell written by the last instruction and its old value
+        in its entry. Clears the journal if instructions were executed
+        without recording them in between.
+        """
+        offset = self.current
+        if offset is None:
+            return
+        self.current = None
+        d = self.d
+        if d.cycles != self.cycles:
+            self.clear()
+            return
+        address = d.ar.value
+        value = d.ram[address]
+        old = self.shadow[address]
+        if value != old:
+            self.entries[offset + ADDRESS] = address
+            self.entries[offset + OLD] = old
+            self.shadow[address] = value
+
+    def record(self):
+        """
+        Record the state before the instruction DC.cycle() is about to
+        execute
+        """
+        self._written()
+        d = self.d
+        if self.shadow is None:
+            self.shadow = array.array(d.ram.typecode, d.ram)
+        index = self.end
+        if index % SNAPSHOT_INTERVAL == 0:
+            oldest = index - self.capacity
+            for old in [i for i in self.snapshots if i < oldest]:
+                del self.snapshots[old]
+            self.snapshots[index] = (d.ram.tobytes(),
+                                     frozenset(d.return_addresses))
+        entries = self.entries
+        offset = (index % self.capacity) * ENTRY
+        entries[offset] = d.ir.value
+        entries[offset + 1] = d.dr.value
+        entries[offset + 2] = pc = d.pc.value
+        entries[offset + 3] = d.ac.value
+        entries[offset + 4] = d.ar.value
+        entries[offset + 5] = d.sp.value
+        entries[offset + 6] = d.bp.value
+        entries[offset + ADDRESS] = len(d.ram)
+        entries[offset + OLD] = 0
+        address = self.mark_address(d.ram[pc], d.sp.value)
+        if address is None:
+            entries[offset + MARK] = NO_MARK
+        else:
+            entries[offset + MARK] = (MARKED if address in d.return_addresses
+                                      else UNMARKED)
+        self.current = offset
+        self.cycles = d.cycles + 1
+        self.end = index + 1
+
+    def mark_address(self, ir, sp):
+        """
+        Return the return address mark that the instruction changes, or
+        None
+        """
+        d = self.d
+        name = d.tables.name(ir)
+        if name == "JSR":
+            return sp
+        if name == "RTN":
+            return (sp + 1) & d.max_address
+        return None
+
+    def undo(self, index):
+        """
+        Restore the state before the instruction of the given entry
+        """
+        d = self.d
+        entries = self.entries
+        offset = (index % self.capacity) * ENTRY
+        address = entries[offset + ADDRESS]
+        if address < len(d.ram):
+            d.ram[address] = self.shadow[address] = entries[offset + OLD]
+        mark = entries[offset + MARK]
+        if mark != NO_MARK:
+            ir = d.ram[entries[offset + 2]]
+            address = self.mark_address(ir, entries[offset + 5])
+            if mark == MARKED:
+                d.return_addresses.add(address)
+            else:
+                d.return_addresses.discard(address)
+        d.set_registers(*entries[offset:offset + 7])
+
+    def step_back(self, count=1):
+        """
+        Undo the last count instructions, or all recorded ones if there
+        are fewer. Returns the number of undone instructions.
+        """
+        d = self.d
+        count = min(count, len(self))
+        if count <= 0:
+            return 0
+        target = self.end - count
+        index = self.end
+        later = [i for i in self.snapshots if target <= i < index]
+        self.rewinding = True
+        try:
+            if later:
+                # Jump to the snapshot and undo the rest from there
+                index = min(later)
+                ram, return_addresses = self.snapshots[index]
+                d.ram.load_buffer(ram)
+                self.shadow = array.array(d.ram.typecode, d.ram)
+                d.return_addresses.clear()
+                d.return_addresses.update(return_addresses)
+                self.undo(index)
+            for i in range(index - 1, target - 1, -1):
+                self.undo(i)
+        finally:
+            self.rewinding = False
+        for i in [i for i in self.snapshots if i > target]:
+            del self.snapshots[i]
+        self.end = target
+        self.current = None
+        d.cycles -= count
+        return count
+
+    def reverse_continue(self):
+        """
+        Step back to the last state in which the PC was at a breakpoint,
+        or to the oldest recorded state. Returns the number of undone
+        instructions.
+        """
+        breakpoints = self.d.breakpoints
+        oldest = self.end - len(self)
+        for index in range(self.end - 1, oldest - 1, -1):
+            pc = self.entries[(index % self.capacity) * ENTRY + 2]
+            if pc in breakpoints:
+                return self.step_back(self.end - index)
+        return self.step_back(self.end - oldest)
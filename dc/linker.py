@@ -0,0 +1,304 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Separate compilation of DCL modules and a linker that puts them together.
+
+Every .dcl file of a program is assembled on its own into an ObjectModule
+whose addresses start at 0. A module shares labels with the others with
+the directives
+
+    EXPORT LABEL    ; other modules may use LABEL
+    IMPORT LABEL    ; LABEL is exported by another module
+
+link() places the modules one after another in the given order (the
+first one starts at address 0, where the DC starts running), adds the
+start of its module to every address in a module (also the ones given
+as numbers like LDA 20, but not DEF 20 or the offsets of LDAS 2 etc.)
+and fills in the imported labels. build() keeps the modules in a
+directory and only assembles the files that changed since their module
+was written.
+
+Link a program with python3 -m dc.linker -o TARGET MAIN.dcl LIB.dcl ...
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from . import DC, DCConfig
+from . import objfile
+from .assembler import Linkage
+from .asmcache import source_hash
+from .errors import DCError, LinkError
+from .program import Program
+from .util import get_file_content, splitlines
+
+MODULE_EXTENSION = ".dcm"
+# Bumped whenever the stored modules change, older ones are assembled again
+MODULE_VERSION = 2
+
+
+class ObjectModule():
+    # pylint: disable=too-few-public-methods,too-many-instance-attributes
+    """
+    A relocatable module assembled from one DCL file. words are its
+    machine words starting at address 0, symbols maps the labels of its
+    instructions to their addresses (the ones given with EQUAL are not
+    kept), source_lines has the line number of every word and digest is
+    the hash of the source. exports, imports and relocations are the ones of
+    the assembler.Linkage, except that exports maps the exported labels
+    to their addresses.
+    """
+    def __init__(self, name, address_width, control_bits, words, symbols,
+                 source_lines, exports, imports, relocations, digest):
+        # pylint: disable=too-many-arguments
+        self.name = name
+        self.address_width = address_width
+        self.control_bits = control_bits
+        self.words = words
+        self.symbols = symbols
+        self.source_lines = source_lines
+        self.exports = exports
+        self.imports = imports
+        self.relocations = relocations
+        self.digest = digest
+
+    def __len__(self):
+        return len(self.words)
+
+    def to_json(self):
+        """
+        Return the module as a dict that can be stored as JSON
+        """
+        return {
+            "version": MODULE_VERSION,
+            "name": self.name,
+            "address_width": self.address_width,
+            "control_bits": self.control_bits,
+            "words": self.words,
+            "symbols": self.symbols,
+            "source_lines": self.source_lines,
+            "exports": self.exports,
+            "imports": sorted(self.imports),
+            "relocations": self.relocations,
+            "digest": self.digest,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        """
+        Return the module stored with to_json()
+        """
+        return cls(data["name"], data["address_width"],
+                   data["control_bits"], data["words"], data["symbols"],
+                   data["source_lines"], data["exports"],
+                   set(data["imports"]),
+                   [tuple(relocation) for relocation in data["relocations"]],
+                   data["digest"])
+
+
+def module_name(name):
+    """
+    Return the module name of the file name, its upper case base name
+    without extension
+    """
+    return os.path.splitext(os.path.basename(name))[0].upper()
+
+
+def assemble_module(d, lines, name, digest=None):
+    """
+    Assemble the lines of the DCL file of the module name into an
+    ObjectModule for the configuration of d
+    """
+    linkage = Linkage()
+    program = d.assemble_program(lines, linkage)
+    symbols = linkage.addresses
+    exports = {label: symbols[label] for label in linkage.exports}
+    return ObjectModule(name, d.conf.address_width, d.conf.control_bits,
+                        [word for _, word in program.words], symbols,
+                        [program.source_lines[address]
+                         for address, _ in program.words],
+                        exports, linkage.imports, linkage.relocations,
+                        digest)
+
+
+def link(d, modules):
+    # pylint: disable=too-many-locals
+    """
+    Link the ObjectModules into a Program for the configuration of d. The
+    symbols of the Program are the exported labels and the labels of
+    every module as MODULE.LABEL, source_lines has the line number in
+    the file of its module. Raises a LinkError if the modules don't fit
+    together.
+    """
+    conf = d.conf
+    max_address = d.max_address
+    bases = {}
+    exports = {}
+    base = 0
+    for module in modules:
+        if (module.address_width != conf.address_width or
+                module.control_bits != conf.control_bits):
+            raise LinkError("Module {} assembled for another configuration"
+                            .format(module.name))
+        if module.name in bases:
+            raise LinkError("Module {} linked twice".format(module.name))
+        bases[module.name] = base
+        for label, address in module.exports.items():
+            if label in exports:
+                raise LinkError("Label {} exported by more than one module"
+                                .format(label))
+            exports[label] = base + address
+        base += len(module)
+    if base > max_address + 1:
+        raise LinkError("The modules need {} cells, but there are only {}"
+                        .format(base, max_address + 1))
+
+    words = []
+    symbols = dict(exports)
+    source_lines = {}
+    for module in modules:
+        base = bases[module.name]
+        module_words = list(module.words)
+        for number, label in module.relocations:
+            if label is None:
+                value = base
+            else:
+                try:
+                    value = exports[label]
+                except KeyError:
+                    raise LinkError("Label {} imported by module {} is not "
+                                    "exported".format(label, module.name))
+            word = module_words[number]
+            if (word & max_address) + value > max_address:
+                raise LinkError("Address {} of module {} is outside of the "
+                                "available memory (line {})".format(
+                                    (word & max_address) + value,
+                                    module.name,
+                                    module.source_lines[number]))
+            module_words[number] = word + value
+        words.extend(enumerate(module_words, base))
+        for label, address in module.symbols.items():
+            symbols["{}.{}".format(module.name, label)] = base + address
+        source_lines.update(enumerate(module.source_lines, base))
+    return Program(conf.address_width, conf.control_bits, d.tables, words,
+                   symbols, source_lines)
+
+
+def _module_path(directory, name):
+    return os.path.join(directory, module_name(name) + MODULE_EXTENSION)
+
+
+def _read_module(d, path, digest):
+    """
+    Return the module stored at path if it was assembled from the source
+    with the hash digest for the configuration of d, otherwise None
+    """
+    try:
+        with open(path) as input_file:
+            data = json.load(input_file)
+    except (IOError, ValueError):
+        return None
+    conf = d.conf
+    if (data.get("version") != MODULE_VERSION or
+            data.get("digest") != digest or
+            data.get("address_width") != conf.address_width or
+            data.get("control_bits") != conf.control_bits):
+        return None
+    return ObjectModule.from_json(data)
+
+
+def _write_module(path, module):
+    """
+    Store the module at path, other processes never see half a file
+    """
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(handle, "w") as output_file:
+            json.dump(module.to_json(), output_file)
+        os.replace(temporary, path)
+    except OSError:
+        os.unlink(temporary)
+
+
+def load_module(d, name, directory=None):
+    """
+    Return the ObjectModule of the DCL file name and whether it was
+    reused from directory instead of being assembled. Assembled modules
+    are stored in directory if it is given.
+    """
+    content, _ = get_file_content(name)
+    digest = source_hash(content)
+    if directory is not None:
+        path = _module_path(directory, name)
+        module = _read_module(d, path, digest)
+        if module is not None:
+            return module, True
+    try:
+        module = assemble_module(d, splitlines(content), module_name(name),
+                                 digest)
+    except DCError as error:
+        error.msg += " in {}".format(name)
+        raise error
+    if directory is not None:
+        _write_module(path, module)
+    return module, False
+
+
+def build(d, names, directory=None):
+    """
+    Assemble the DCL files names (or reuse their modules from directory)
+    and link them, the first file is the main module. Returns the Program
+    and the list of the files that had to be assembled.
+    """
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    modules = []
+    assembled = []
+    for name in names:
+        module, reused = load_module(d, name, directory)
+        modules.append(module)
+        if not reused:
+            assembled.append(name)
+    return link(d, modules), assembled
+
+
+def main(argv=None):
+    """
+    Build and link a program, see build()
+    """
+    parser = argparse.ArgumentParser(
+        description="Link DCL modules into one .dc or .dco file")
+    parser.add_argument("modules", nargs="+",
+                        help="the .dcl files, the main module first")
+    parser.add_argument("-o", "--output", required=True,
+                        help="the .dc or .dco file to write")
+    parser.add_argument("--build-dir", default=None,
+                        help="keep the assembled modules in this directory")
+    parser.add_argument("--address-width", type=int, default=None)
+    parser.add_argument("--control-bits", type=int, default=None)
+    args = parser.parse_args(argv)
+    config = DCConfig()
+    if args.address_width is not None:
+        config.address_width = args.address_width
+    if args.control_bits is not None:
+        config.control_bits = args.control_bits
+    d = DC(config)
+    try:
+        program, assembled = build(d, args.modules, args.build_dir)
+        if args.output.lower().endswith(objfile.EXTENSION):
+            objfile.save_file(args.output, objfile.pack_program(program))
+        else:
+            with open(args.output, "w") as output_file:
+                output_file.write("\r\n".join(program.to_lines()))
+    except (DCError, IOError) as error:
+        print(error, file=sys.stderr)
+        return 1
+    for name in assembled:
+        print("assembled", name)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
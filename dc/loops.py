@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Detection of infinite loops. A DC without input is deterministic, so as
+soon as the complete machine state repeats, the program will never end.
+"""
+import array
+
+from .errors import InfiniteLoop
+
+
+class LoopDetector():
+    """
+    Detects a repeating machine state (RAM, AC, PC, SP and BP) with Brent's
+    cycle detection. The state is compared to a checkpoint after every
+    instruction and the checkpoint is moved forward after 1, 2, 4, 8, ...
+    instructions, so a loop is found within a few iterations.
+
+    The RAM part of the state is a hash that is updated after every
+    instruction from the cell it wrote (every instruction writes at most
+    the cell in AR), which is compared with a copy of the RAM. So no cell
+    has to be watched and stores don't go through RAM.notify(). If the
+    hash and the registers match the checkpoint, the RAM is compared with
+    a copy taken at the checkpoint, so a hash collision can never stop a
+    correct program.
+
+    Input and output reset the detection, a loop is only reported if the
+    state repeated without any I/O in between.
+    """
+    def __init__(self, d):
+        self.d = d
+        self.io_opcodes = frozenset(d.opcodes[name] for name in (
+            "OUT", "OUTS", "OUTB", "INM", "INS", "INB"))
+        self.ram_hash = 0
+        # The RAM the hash was computed for
+        self.shadow = None
+        self.checkpoint = None
+        self.checkpoint_ram = None
+        # Number of steps since the checkpoint and when to move it next
+        self.steps = 0
+        self.power = 1
+        # Address range executed since the checkpoint
+        self.low = self.high = 0
+        self.rehash()
+        # Only to hear about changes of the whole RAM
+        d.ram.watch(self._update)
+
+    def detach(self):
+        """
+        Stop watching the RAM of the DC
+        """
+        self.d.ram.unwatch(self._update)
+
+    def rehash(self):
+        """
+        Compute the RAM hash from scratch and restart the detection
+        """
+        ram = self.d.ram
+        self.shadow = array.array(ram.typecode, ram)
+        self.ram_hash = 0
+        for address, value in enumerate(ram):
+            self.ram_hash ^= hash((address, value))
+        self.reset()
+
+    def reset(self):
+        """
+        Restart the detection at the current state
+        """
+        self.checkpoint = None
+        self.steps = 0
+        self.power = 1
+
+    def _update(self, address, value_):
+        """
+        RAM watcher that notices changes of the whole RAM, single cells
+        are handled by sync()
+        """
+        if address is None:
+            # Called before the write, so rehash on the next step
+            self.ram_hash = None
+
+    def sync(self, addresses):
+        """
+        Update the RAM hash for the cells at addresses, which may have
+        been written since the last step (e.g. by a replayed call)
+        """
+        if self.ram_hash is None:
+            return
+        ram = self.d.ram
+        shadow = self.shadow
+        for address in addresses:
+            value = ram[address]
+            old = shadow[address]
+            if value != old:
+                self.ram_hash ^= (hash((address, old)) ^
+                                  hash((address, value)))
+                shadow[address] = value
+
+    def state(self):
+        """
+        Return the fingerprint of the current state
+        """
+        d = self.d
+        return (self.ram_hash, d.pc.value, d.ac.value, d.sp.value,
+                d.bp.value)
+
+    def step(self):
+        """
+        Check the state after an instruction has been executed. Raises
+        InfiniteLoop if the state repeated.
+        """
+        d = self.d
+        if self.ram_hash is None:
+            self.rehash()
+        else:
+            self.sync((d.ar.value,))
+        if d.ir.value >> d.conf.address_width in self.io_opcodes:
+            self.reset()
+            return
+        state = self.state()
+        if self.checkpoint is None:
+            self.set_checkpoint(state)
+            return
+        self.steps += 1
+        pc = d.pc.value
+        if pc < self.low:
+            self.low = pc
+        elif pc > self.high:
+            self.high = pc
+        if (state == self.checkpoint and
+                d.ram.tobytes() == self.checkpoint_ram):
+            d.is_running = False
+            raise InfiniteLoop(
+                "Infinite loop between {} and {}".format(self.low,
+                                                         self.high),
+                self.low, self.high, self.steps)
+        if self.steps == self.power:
+            self.set_checkpoint(state)
+            self.power *= 2
+
+    def set_checkpoint(self, state):
+        """
+        Move the checkpoint to the given (current) state
+        """
+        self.checkpoint = state
+        self.checkpoint_ram = self.d.ram.tobytes()
+        self.steps = 0
+        self.low = self.high = self.d.pc.value
@@ -0,0 +1,347 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Memoization of pure subroutines. A subroutine call (JSR up to the
+matching RTN) that reads the same values as an earlier call does the same
+writes, so the recorded writes can be replayed instead of executing the
+body again.
+"""
+from collections import namedtuple
+import sys
+
+from .errors import DCError
+
+# Kinds of the logged accesses
+READ, FETCH, WRITE = range(3)
+
+# Instructions reading memory, by how the address is computed
+DIRECT_READS = {"LDA", "ADD", "SUB", "PSHM"}
+SP_READS = {"LDAS", "ADDS", "SUBS"}
+BP_READS = {"LDAB", "ADDB", "SUBB"}
+STACK_READS = {"POP", "POPM", "POPB", "RTN"}
+# Instructions writing memory
+DIRECT_WRITES = {"STA", "POPM"}
+SP_WRITES = {"STAS"}
+BP_WRITES = {"STAB"}
+STACK_WRITES = {"PSH", "PSHM", "PSHB", "JSR"}
+# Instructions using the accumulator before changing it
+AC_READERS = {
+    "STA", "STAS", "STAB", "PSH", "ADD", "ADDS", "ADDB", "SUB", "SUBS",
+    "SUBB", "JMS", "JPL", "JZE", "JNM", "JNP", "JNZ", "NEG", "INC", "DEC",
+}
+# Instructions overwriting the accumulator without using it
+AC_WRITERS = {"LDA", "LDAS", "LDAB", "POP"}
+IO_INSTRUCTIONS = {"INM", "INS", "INB", "OUT", "OUTS", "OUTB"}
+
+# The cache is cleared when it holds more entries
+MAX_ENTRIES = 100000
+
+# A finished call. reads are the addresses (or "ac") the call read before
+# writing them and values the values it read. writes are (address, value)
+# pairs, marks (address, is return address) pairs. ac, sp, bp and ir are
+# the registers after the RTN, cycles the number of instructions after the
+# JSR up to and including the RTN.
+MemoEntry = namedtuple("MemoEntry", [
+    "reads", "values", "fetched", "writes", "marks", "ac", "sp", "bp", "ir",
+    "cycles",
+])
+
+
+class Recording():
+    """
+    A call that is currently being executed
+    """
+    # pylint: disable=too-few-public-methods
+    # pylint: disable=too-many-arguments
+    def __init__(self, key, return_slot, start, marks_start, cycles):
+        # (subroutine address, SP, BP) right after the JSR
+        self.key = key
+        # Where the JSR put the return address
+        self.return_slot = return_slot
+        self.start = start
+        self.marks_start = marks_start
+        self.cycles = cycles
+
+
+class Memoizer():
+    """
+    Execution engine that memoizes subroutine calls. Every instruction is
+    executed with DC.cycle(), while a call is running its memory and
+    accumulator accesses are logged. When the matching RTN is reached, the
+    accesses are reduced to the read set (everything read before it was
+    written, including the executed code) and the write set and stored
+    under the subroutine address, SP and BP.
+
+    On a later call to the same address with the same SP and BP whose read
+    set has the same values, the writes, registers and cycle count are
+    replayed. Subroutines that do I/O, END the program or write into their
+    own code are never memoized. Calls are executed normally while
+    breakpoints or a trace are set.
+    """
+    def __init__(self, d):
+        self.d = d
+        # (address, SP, BP) -> list of MemoEntry
+        self.cache = {}
+        self.entries = 0
+        # Subroutine addresses that are never memoized
+        self.refused = set()
+        self.calls = []
+        self.log = []
+        self.marks = []
+        self.hits = 0
+        self.misses = 0
+        # State at the end of the last run(), the running calls are only
+        # continued if nothing else changed the DC in between
+        self.stopped_at = None
+
+    @property
+    def hit_rate(self):
+        """
+        Fraction of the calls that were replayed from the cache
+        """
+        if not self.hits + self.misses:
+            return 0.0
+        return self.hits / (self.hits + self.misses)
+
+    def memory_use(self):
+        """
+        Return the approximate size of the cache in bytes
+        """
+        size = sys.getsizeof(self.cache)
+        for key, entries in self.cache.items():
+            size += sys.getsizeof(key) + sys.getsizeof(entries)
+            for entry in entries:
+                size += sys.getsizeof(entry)
+                size += sum(sys.getsizeof(part) for part in entry[:5])
+        return size
+
+    def clear(self):
+        """
+        Forget all cached calls
+        """
+        self.cache.clear()
+        self.entries = 0
+        self.refused.clear()
+
+    def abandon(self, refuse=False):
+        """
+        Stop recording the running calls, and never record their
+        subroutines again if refuse is set
+        """
+        if refuse:
+            self.refused.update(call.key[0] for call in self.calls)
+        del self.calls[:]
+        del self.log[:]
+        del self.marks[:]
+
+    def log_accesses(self, name, arg, sp, bp):
+        """
+        Log the accesses of the instruction about to be executed
+        """
+        d = self.d
+        amask = d.max_address
+        log = self.log
+        ram = d.ram
+        address = None
+        if name in DIRECT_READS:
+            address = arg
+        elif name in SP_READS:
+            address = arg + sp
+        elif name in BP_READS:
+            address = arg + bp
+        elif name in STACK_READS:
+            address = (sp + 1) & amask
+            if name == "RTN" and address == self.calls[-1].return_slot:
+                # Reading the own return address is part of the RTN
+                address = None
+        if name in AC_READERS:
+            log.append(("ac", d.ac.signed_value, READ))
+        elif name in AC_WRITERS:
+            log.append(("ac", None, WRITE))
+        if address is not None and address <= amask:
+            log.append((address, ram[address], READ))
+        address = None
+        if name in DIRECT_WRITES:
+            address = arg
+        elif name in SP_WRITES:
+            address = arg + sp
+        elif name in BP_WRITES:
+            address = arg + bp
+        elif name in STACK_WRITES:
+            address = sp
+        if address is not None and address <= amask:
+            log.append((address, None, WRITE))
+        if name == "JSR":
+            self.marks.append((sp, True))
+        elif name == "RTN":
+            self.marks.append(((sp + 1) & amask, False))
+
+    def finish(self):
+        """
+        Store the innermost running call, which has just returned
+        """
+        d = self.d
+        call = self.calls.pop()
+        reads = {}
+        written = set()
+        fetched = set()
+        for key, value, kind in self.log[call.start:]:
+            if kind == WRITE:
+                written.add(key)
+                continue
+            if kind == FETCH:
+                fetched.add(key)
+            if key not in written and key not in reads:
+                reads[key] = value
+        marks = dict(self.marks[call.marks_start:])
+        if not self.calls:
+            del self.log[:]
+            del self.marks[:]
+        if fetched & written:
+            # Self-modifying subroutine
+            self.refused.add(call.key[0])
+            return
+        if self.entries >= MAX_ENTRIES:
+            self.cache.clear()
+            self.entries = 0
+        entry = MemoEntry(
+            tuple(reads), tuple(reads.values()), tuple(fetched),
+            tuple((address, d.ram[address]) for address in written
+                  if address != "ac"),
+            tuple(marks.items()), d.ac.signed_value, d.sp.value, d.bp.value,
+            d.ir.value, d.cycles - call.cycles)
+        self.cache.setdefault(call.key, []).append(entry)
+        self.entries += 1
+
+    def lookup(self, key):
+        """
+        Return the cached call for the given key that matches the current
+        state or None
+        """
+        d = self.d
+        ram = d.ram
+        ac = d.ac.signed_value
+        for entry in self.cache.get(key, ()):
+            for address, value in zip(entry.reads, entry.values):
+                if (ac if address == "ac" else ram[address]) != value:
+                    break
+            else:
+                return entry
+        return None
+
+    def replay(self, entry):
+        """
+        Apply the effects of a cached call, the DC is right behind its JSR
+        """
+        d = self.d
+        ram = d.ram
+        for address, value in entry.writes:
+            ram[address] = value
+        if d.loop_detector is not None:
+            d.loop_detector.sync(address for address, _ in entry.writes)
+        for address, is_return_address in entry.marks:
+            if is_return_address:
+                d.return_addresses.add(address)
+            else:
+                d.return_addresses.discard(address)
+        slot = (d.sp.value + 1) & d.max_address
+        d.set_registers(entry.ir, ram[slot], ram[slot], entry.ac, slot,
+                        entry.sp, entry.bp)
+        d.cycles += entry.cycles
+        if self.calls:
+            # The enclosing calls did these accesses too
+            self.log.extend((address, value, READ) for address, value
+                            in zip(entry.reads, entry.values))
+            self.log.extend((address, None, FETCH)
+                            for address in entry.fetched)
+            self.log.extend((address, None, WRITE)
+                            for address, _ in entry.writes)
+            self.log.append(("ac", None, WRITE))
+            self.marks.extend(entry.marks)
+
+    def step(self, budget=None):
+        """
+        Execute a single instruction, or a whole call if it can be
+        replayed. Returns the number of executed instructions.
+        """
+        # pylint: disable=too-many-branches
+        d = self.d
+        pc = d.pc.value
+        ir = d.ram[pc]
+        name = d.tables.name(ir)
+        if self.calls:
+            if name in IO_INSTRUCTIONS:
+                self.abandon(refuse=True)
+            elif name == "END":
+                self.abandon()
+            elif (name == "RTN" and
+                  (d.sp.value + 1) & d.max_address !=
+                  self.calls[-1].return_slot):
+                # Not the matching RTN, the stack was changed by hand
+                self.abandon()
+            else:
+                self.log.append((pc, ir, FETCH))
+                self.log_accesses(name, ir & d.max_address, d.sp.value,
+                                  d.bp.value)
+        try:
+            d.cycle()
+        except DCError:
+            self.abandon()
+            raise
+        if name == "RTN" and self.calls:
+            self.finish()
+        elif name == "JSR":
+            return 1 + self.call(budget)
+        return 1
+
+    def call(self, budget):
+        """
+        Handle the start of a call, the JSR has just been executed.
+        Returns the number of replayed instructions.
+        """
+        d = self.d
+        key = (d.pc.value, d.sp.value, d.bp.value)
+        if key[0] in self.refused:
+            return 0
+        if not (d.breakpoints or d.trace is not None) and d.is_running:
+            entry = self.lookup(key)
+            if entry is not None and (budget is None or
+                                      entry.cycles < budget):
+                self.hits += 1
+                self.replay(entry)
+                return entry.cycles
+            self.misses += 1
+        self.calls.append(Recording(key, (key[1] + 1) & d.max_address,
+                                    len(self.log), len(self.marks),
+                                    d.cycles))
+        return 0
+
+    def run(self, max_cycles=None):
+        """
+        Execute the program until an END is reached, an error occurs or
+        max_cycles instructions have been executed, just like
+        DC.run_reference(). Returns the number of executed instructions.
+        """
+        d = self.d
+        if self.calls and self.stopped_at != self.state():
+            self.abandon()
+        d.is_running = True
+        executed = 0
+        try:
+            while d.is_running and executed != max_cycles:
+                executed += self.step(None if max_cycles is None
+                                      else max_cycles - executed)
+                if d.trace is not None:
+                    d.trace(d)
+                if d.loop_detector is not None:
+                    d.loop_detector.step()
+        finally:
+            self.stopped_at = self.state()
+        return executed
+
+    def state(self):
+        """
+        Return the registers and the cycle counter of the DC
+        """
+        d = self.d
+        return (d.cycles,) + tuple(r.value for r in d.registers)
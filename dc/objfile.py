@@ -0,0 +1,278 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Binary object files (.dco) that hold a complete RAM image, so loading a
+program is a single copy of the mapped file into the RAM.
+
+An object file starts with the header (all numbers little endian):
+
+    magic "DCOBJECT", version (2 bytes), address width, control bits,
+    size of a RAM cell in bytes (1 byte each), one padding byte, number
+    of source line entries and size of the symbol table in bytes (4 bytes
+    each)
+
+followed by all RAM cells, the source line entries (address and line
+number, 4 bytes each) and the symbol table as UTF-8 encoded JSON object.
+
+Convert between the formats with python3 -m dc.objfile SOURCE TARGET.
+"""
+import argparse
+import array
+import json
+import mmap
+import os
+import struct
+import sys
+
+from . import DC, DCConfig
+from .errors import DCError, ObjectFileError
+from .parts import CELL_TYPECODES, cell_typecode
+from .program import Program
+from .util import get_file_content, splitlines
+
+MAGIC = b"DCOBJECT"
+VERSION = 1
+HEADER = struct.Struct("<8sHBBBxII")
+EXTENSION = ".dco"
+
+
+def _typecode(itemsize):
+    """
+    Return the array typecode for cells of the given size in bytes
+    """
+    for typecode in CELL_TYPECODES:
+        if array.array(typecode).itemsize == itemsize:
+            return typecode
+    raise ObjectFileError("Unsupported cell size: {}".format(itemsize))
+
+
+def _cells(itemsize, data):
+    """
+    Return the little endian cells of the given size in data (a
+    bytes-like object) as array
+    """
+    cells = array.array(_typecode(itemsize))
+    cells.frombytes(data)
+    if sys.byteorder != "little":
+        cells.byteswap()
+    return cells
+
+
+def pack(address_width, control_bits, ram, symbols=None, source_lines=None):
+    # pylint: disable=too-many-arguments
+    """
+    Return the object file for the RAM image ram (an array with one entry
+    per cell), the optional symbols (label -> value) and source_lines
+    (address -> line number)
+    """
+    if sys.byteorder != "little":
+        ram = array.array(ram.typecode, ram)
+        ram.byteswap()
+    lines = array.array(_typecode(4))
+    for address, line_number in sorted((source_lines or {}).items()):
+        lines.append(address)
+        lines.append(line_number)
+    if sys.byteorder != "little":
+        lines.byteswap()
+    table = json.dumps(symbols or {}, sort_keys=True).encode("utf-8")
+    header = HEADER.pack(MAGIC, VERSION, address_width, control_bits,
+                         ram.itemsize, len(lines) // 2, len(table))
+    return b"".join([header, ram.tobytes(), lines.tobytes(), table])
+
+
+def pack_program(program):
+    """
+    Return the object file for a Program
+    """
+    typecode = cell_typecode(program.address_width + program.control_bits)
+    ram = array.array(typecode, bytes(array.array(typecode).itemsize *
+                                      2 ** program.address_width))
+    for address, word in program.words:
+        ram[address] = word
+    return pack(program.address_width, program.control_bits, ram,
+                program.symbols, program.source_lines)
+
+
+def pack_ram(d):
+    """
+    Return the object file for the current RAM content of d
+    """
+    return pack(d.conf.address_width, d.conf.control_bits, d.ram)
+
+
+def _sections(d, data):
+    """
+    Check the header of the object file data (a memoryview) for d.
+    Returns the item size of the cells and the RAM, source line and
+    symbol table sections.
+    """
+    if len(data) < HEADER.size:
+        raise ObjectFileError("Not a DC object file")
+    (magic, version, address_width, control_bits, itemsize, line_count,
+     table_size) = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ObjectFileError("Not a DC object file")
+    if version != VERSION:
+        raise ObjectFileError("Unsupported object file version {}"
+                              .format(version))
+    conf = d.conf
+    if (address_width != conf.address_width or
+            control_bits != conf.control_bits):
+        raise ObjectFileError(
+            "Object file for {} address bits and {} control bits"
+            .format(address_width, control_bits))
+    ram_end = HEADER.size + 2 ** address_width * itemsize
+    lines_end = ram_end + 8 * line_count
+    if len(data) != lines_end + table_size:
+        raise ObjectFileError("Truncated object file")
+    return (itemsize, data[HEADER.size:ram_end], data[ram_end:lines_end],
+            data[lines_end:])
+
+
+def _metadata(lines, table):
+    """
+    Return the source lines dict and the symbols of the sections
+    """
+    entries = _cells(4, lines)
+    source_lines = dict(zip(entries[::2], entries[1::2]))
+    try:
+        symbols = json.loads(bytes(table).decode("utf-8"))
+    except ValueError:
+        raise ObjectFileError("Invalid symbol table")
+    return source_lines, symbols
+
+
+def _check_cells(d, cells):
+    """
+    Raise an ObjectFileError if a cell has bits outside of the cell width
+    of d
+    """
+    if cells and max(cells) >> d.cellwidth:
+        raise ObjectFileError("Cell value {} has more than {} bits"
+                              .format(max(cells), d.cellwidth))
+
+
+def load(d, data):
+    """
+    Load the RAM image in the object file data (a bytes-like object) into
+    d, which is reset first. The source lines and symbols are not read,
+    use to_program() for them. Raises an ObjectFileError if the file is
+    invalid, e.g. a cell doesn't fit into the cells of d.
+    """
+    with memoryview(data) as view:
+        itemsize, ram, lines, table = _sections(d, view)
+        try:
+            d.reset()
+            if itemsize == d.ram.itemsize and sys.byteorder == "little":
+                # The common case: copy the mapped cells as they are and
+                # clear the RAM again if one of them is out of range
+                d.ram.load_buffer(ram)
+                try:
+                    _check_cells(d, d.ram)
+                except ObjectFileError:
+                    d.reset()
+                    raise
+            else:
+                cells = _cells(itemsize, ram)
+                _check_cells(d, cells)
+                d.ram.load_buffer(array.array(d.ram.typecode, cells))
+        finally:
+            for section in (ram, lines, table):
+                section.release()
+
+
+def load_file(d, name):
+    """
+    Load the object file name into d by mapping it into memory, see
+    load()
+    """
+    with open(name, "rb") as object_file:
+        if os.fstat(object_file.fileno()).st_size == 0:
+            raise ObjectFileError("Not a DC object file")
+        with mmap.mmap(object_file.fileno(), 0,
+                       access=mmap.ACCESS_READ) as data:
+            load(d, data)
+
+
+def save_file(name, data):
+    """
+    Write the object file data to the file name
+    """
+    with open(name, "wb") as object_file:
+        object_file.write(data)
+
+
+def to_program(d, data):
+    """
+    Return the Program in the object file data for d, with one word for
+    every cell that is not 0
+    """
+    with memoryview(data) as view:
+        itemsize, ram, lines, table = _sections(d, view)
+        try:
+            cells = _cells(itemsize, ram)
+            _check_cells(d, cells)
+            source_lines, symbols = _metadata(lines, table)
+        finally:
+            for section in (ram, lines, table):
+                section.release()
+    words = [(address, word) for address, word in enumerate(cells) if word]
+    return Program(d.conf.address_width, d.conf.control_bits, d.tables,
+                   words, symbols, source_lines)
+
+
+def read_program(d, name):
+    """
+    Return the Program in the .dc, .dcl or .dco file name for d
+    """
+    if name.lower().endswith(EXTENSION):
+        with open(name, "rb") as object_file:
+            return to_program(d, object_file.read())
+    content, _ = get_file_content(name)
+    if name.lower().endswith(".dcl"):
+        return d.assemble_program(splitlines(content))
+    return d.parse_program(splitlines(content))
+
+
+def convert(source, target, config=None):
+    """
+    Convert the program in the file source to the file target, the
+    formats are chosen by the extensions (.dcl files can only be read)
+    """
+    d = DC(config or DCConfig())
+    program = read_program(d, source)
+    if target.lower().endswith(EXTENSION):
+        save_file(target, pack_program(program))
+    elif target.lower().endswith(".dc"):
+        with open(target, "w") as output_file:
+            output_file.write("\r\n".join(program.to_lines()))
+    else:
+        raise ValueError("Can only convert to .dc and .dco files")
+
+
+def main(argv=None):
+    """
+    Convert a program file, see convert()
+    """
+    parser = argparse.ArgumentParser(
+        description="Convert between .dcl, .dc and .dco files")
+    parser.add_argument("source")
+    parser.add_argument("target")
+    parser.add_argument("--address-width", type=int, default=None)
+    parser.add_argument("--control-bits", type=int, default=None)
+    args = parser.parse_args(argv)
+    config = DCConfig()
+    if args.address_width is not None:
+        config.address_width = args.address_width
+    if args.control_bits is not None:
+        config.control_bits = args.control_bits
+    try:
+        convert(args.source, args.target, config)
+    except (DCError, IOError, ValueError) as error:
+        print(error, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
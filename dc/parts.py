@@ -5,38 +5,123 @@ Definitions of the various "building parts"/hardware of the DC, such as
 RAM and Register
 """
 
+import array
+
 from . import util
+from .errors import Overflow
+
+
+# Typecodes for the RAM cells, from the smallest to the largest
+CELL_TYPECODES = "BHILQ"
+
+# Blank RAM contents, shared by all RAMs with the same layout
+_blank_buffers = {}
+
+
+def cell_typecode(cellwidth):
+    """
+    Return the smallest array typecode that can hold cells with the given
+    bitwidth
+    """
+    for typecode in CELL_TYPECODES:
+        if array.array(typecode).itemsize * 8 >= cellwidth:
+            return typecode
+    raise ValueError("Cells with {} bits are not supported".format(cellwidth))
 
 
 # The "NotImplementedErrors" raised in append/... will make pylint
 # complain, that's why we disable abstract-class-not-used
-class RAM(list):
+class RAM(array.array):
     # pylint: disable=abstract-class-not-used
     """
-    Class to represent the RAM. It is a sublcass of list and can be
-    used in the same way, except that it cannot be extended and has
-    a fixed size. Every cell is initialized with a value.
+    Class to represent the RAM. It is a compact array of unsigned cells
+    and can be used like a list, except that it cannot be extended and
+    has a fixed size. Every cell is initialized with a value.
+
+    The RAM supports the buffer protocol, memoryview(ram) gives
+    zero-copy access to the raw cells.
     """
-    def __init__(self, maxlen, init=0):
+    __slots__ = ("maxlen", "init", "cellwidth", "watchers", "watched")
+
+    def __new__(cls, maxlen, init=0, cellwidth=16):
+        typecode = cell_typecode(cellwidth)
+        return super().__new__(cls, typecode, _blank(typecode, maxlen, init))
+
+    def __init__(self, maxlen, init=0, cellwidth=16):
         """
-        Initialize a RAM list with the given maxlen. Every cell is set
-        to init, which defaults to 0. The init element is not copied,
-        so be careful when passing mutable objects like lists.
+        Initialize a RAM with the given maxlen and cells that are
+        cellwidth bits wide. Every cell is set to init, which defaults
+        to 0.
         """
         super().__init__()
         self.maxlen = maxlen
         self.init = init
-        super().extend([init] * maxlen)
+        self.cellwidth = cellwidth
+        self.watchers = []
+        # Addresses the watchers are interested in. Writes to other cells
+        # are not reported.
+        self.watched = set()
 
-    def append(self, item):
-        raise NotImplementedError("You can't append to the RAM")
+    def watch(self, callback):
+        """
+        Register a callback that gets notified before a watched cell is
+        overwritten. It is called as callback(address, value) with the
+        new value, or as callback(None, None) if more than a single
+        cell is about to change (e.g. when clearing the RAM).
+        """
+        self.watchers.append(callback)
+
+    def unwatch(self, callback):
+        """
+        Remove a callback that was registered with .watch()
+        """
+        self.watchers.remove(callback)
+
+    def notify(self, address, value):
+        """
+        Call every watcher for the given address and value
+        """
+        for callback in self.watchers:
+            callback(address, value)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            self.notify(None, None)
+            if not isinstance(value, array.array):
+                value = array.array(self.typecode, value)
+        elif index in self.watched or index < 0:
+            self.notify(index % self.maxlen, value)
+        super().__setitem__(index, value)
+
+    def load_buffer(self, data, offset=0):
+        """
+        Copy the raw cells from a bytes-like object (e.g. the memoryview
+        of another RAM with the same cellwidth) into the RAM, starting
+        at the given cell
+        """
+        self.notify(None, None)
+        with memoryview(data) as source, source.cast("B") as data_raw, \
+                memoryview(self) as view, view.cast("B") as raw:
+            start = offset * self.itemsize
+            raw[start:start + len(data_raw)] = data_raw
 
     def clear(self):
-        self[:] = [self.init] * self.maxlen
+        self.notify(None, None)
+        with memoryview(self) as view, view.cast("B") as raw:
+            raw[:] = _blank(self.typecode, self.maxlen, self.init)
+
+    def append(self, item):
+        raise NotImplementedError("You can't append to the RAM")
 
     def extend(self, l):
         raise NotImplementedError("You can't extend the RAM")
 
+    def frombytes(self, buffer):
+        raise NotImplementedError("You can't extend the RAM")
+
+    def fromlist(self, l):
+        raise NotImplementedError("You can't extend the RAM")
+
     def __iadd__(self, other):
         raise NotImplementedError("You can't append to the RAM")
 
@@ -46,6 +131,133 @@ class RAM(list):
     def insert(self, index, item):
         raise NotImplementedError("You can't insert into the RAM")
 
+    def pop(self, i=-1):
+        raise NotImplementedError("You can't remove from the RAM")
+
+
+def _blank(typecode, maxlen, init):
+    """
+    Return the raw bytes of a RAM where every cell is set to init
+    """
+    key = (typecode, maxlen, init)
+    try:
+        return _blank_buffers[key]
+    except KeyError:
+        if init:
+            blank = (array.array(typecode, [init]) * maxlen).tobytes()
+        else:
+            blank = bytes(maxlen * array.array(typecode).itemsize)
+        _blank_buffers[key] = blank
+        return blank
+
+
+class RegisterWidth():
+    """
+    The numerical limits of a register with a given bitwidth. Registers
+    with the same width share one instance, get it via register_width().
+    """
+    __slots__ = ("bits", "maxvalue", "signed_max", "signed_min",
+                 "signed_values")
+
+    def __init__(self, bits):
+        self.bits = bits
+        self.maxvalue = 2 ** bits - 1
+        self.signed_max = 2 ** (bits - 1) - 1
+        self.signed_min = -1 * 2 ** (bits - 1)
+        # Lookup table, None until first use and () if it would be too big
+        self.signed_values = None
+
+    def signed(self, value):
+        """
+        Return the signed value of the raw value
+        """
+        table = self.signed_values
+        if table is None:
+            table = self.signed_values = util.signed_table(self.bits) or ()
+        if table:
+            return table[value]
+        return util.signed_value(value, self.bits)
+
+
+_register_widths = {}
+
+
+def register_width(bits):
+    """
+    Return the shared RegisterWidth for the given bitwidth
+    """
+    try:
+        return _register_widths[bits]
+    except KeyError:
+        width = _register_widths[bits] = RegisterWidth(bits)
+        return width
+
+
+class CellTable():
+    """
+    Lookup tables to decode raw cell values of one DC configuration.
+    Get the shared instance for a configuration via cell_table().
+    """
+    __slots__ = ("address_width", "max_address", "width", "mnemo", "names")
+
+    def __init__(self, address_width, control_bits, mnemo):
+        """
+        Initialize the tables for the given configuration. mnemo maps the
+        opcodes to their names, every other opcode is a DEF.
+        """
+        self.address_width = address_width
+        self.max_address = 2 ** address_width - 1
+        self.width = register_width(address_width + control_bits)
+        self.mnemo = mnemo
+        # Command name per opcode, built on first use
+        self.names = None
+
+    def signed(self, cell):
+        """
+        Return the signed value of the cell
+        """
+        return self.width.signed(cell)
+
+    def name(self, cell):
+        """
+        Return the name of the command in the cell
+        """
+        names = self.names
+        if names is None:
+            count = 2 ** (self.width.bits - self.address_width)
+            names = self.names = [self.mnemo.get(opcode, "DEF")
+                                  for opcode in range(count)]
+        try:
+            return names[cell >> self.address_width]
+        except IndexError:
+            return "DEF"
+
+    def split(self, cell):
+        """
+        Split the cell into a (name, argument) tuple. The argument of a
+        DEF is the signed value, otherwise it's the address part.
+        """
+        name = self.name(cell)
+        if name == "DEF":
+            return name, self.width.signed(cell)
+        return name, cell & self.max_address
+
+
+_cell_tables = {}
+
+
+def cell_table(address_width, control_bits, mnemo):
+    """
+    Return the shared CellTable for the given configuration
+    """
+    key = (address_width, control_bits, frozenset(mnemo.items()))
+    try:
+        return _cell_tables[key]
+    except KeyError:
+        table = CellTable(address_width, control_bits, mnemo)
+        _cell_tables[key] = table
+        return table
+
 
 class Register():
     """
@@ -53,6 +265,8 @@ class Register():
     thus a maximal value. A register can overflow just like a real
     register.
     """
+    __slots__ = ("name", "width", "value")
+
     def __init__(self, name, bits, value=0):
         """
         Initialize a register with the given name and a bitwidth.
@@ -63,29 +277,54 @@ class Register():
         debugging.
         """
         self.name = name
-        self.bits = bits
-        self.maxvalue = 2 ** bits - 1
-        self.signed_max = 2 ** (bits - 1) - 1
-        self.signed_min = -1 * 2 ** (bits - 1)
-        self.value = value & self.maxvalue
+        self.width = register_width(bits)
+        self.value = value & self.width.maxvalue
+
+    @property
+    def bits(self):
+        """
+        Bitwidth of the register
+        """
+        return self.width.bits
+
+    @property
+    def maxvalue(self):
+        """
+        Largest unsigned value
+        """
+        return self.width.maxvalue
+
+    @property
+    def signed_max(self):
+        """
+        Largest signed value
+        """
+        return self.width.signed_max
+
+    @property
+    def signed_min(self):
+        """
+        Smallest signed value
+        """
+        return self.width.signed_min
 
     def dec(self):
         """
         Decrease the value by one
         """
-        self.set(self.value-1)
+        self.value = (self.value - 1) & self.width.maxvalue
 
     def inc(self):
         """
         Increase the value by one
         """
-        self.set(self.value+1)
+        self.value = (self.value + 1) & self.width.maxvalue
 
     def set(self, value):
         """
         Set the value
         """
-        self.value = value & self.maxvalue
+        self.value = value & self.width.maxvalue
 
     def neg(self):
         """
@@ -120,7 +359,7 @@ class Register():
         """
         Return the signed value.
         """
-        return util.signed_value(self.value, self.bits)
+        return self.width.signed(self.value)
 
     @property
     def bin(self):
@@ -158,6 +397,22 @@ class Register():
         return "Register({!r}, {!r}, {!r})".format(self.name, self.bits,
                                                    self.value)
 
+    # In-place arithmetic keeps the register object, so everybody holding
+    # a reference to it sees the new value
+    def __iadd__(self, other):
+        try:
+            self.set(self.value + other.value)
+        except AttributeError:
+            self.set(self.value + other)
+        return self
+
+    def __isub__(self, other):
+        try:
+            self.set(self.value - other.value)
+        except AttributeError:
+            self.set(self.value - other)
+        return self
+
     # All the arithmetic functions are defined for Register OP Register
     # and Register OP int:
     def __add__(self, other):
@@ -216,3 +471,72 @@ class Register():
             return self._c(self.value << other.value)
         except AttributeError:
             return self._c(self.value << other)
+
+
+class ALU():
+    """
+    The arithmetic logic unit. It works in place on the accumulator
+    register and raises Overflow before the accumulator is changed if a
+    result doesn't fit. The overflow flag tells if the last operation
+    overflowed.
+    """
+    __slots__ = ("ac", "mask", "sign", "signed_max", "signed_min", "overflow")
+
+    def __init__(self, accumulator):
+        """
+        Initialize the ALU for the given accumulator register
+        """
+        self.ac = accumulator
+        self.mask = accumulator.maxvalue
+        self.sign = 1 << (accumulator.bits - 1)
+        self.signed_max = accumulator.signed_max
+        self.signed_min = accumulator.signed_min
+        self.overflow = False
+
+    def _store(self, result):
+        """
+        Write the signed result to the accumulator or raise Overflow
+        """
+        if result > self.signed_max or result < self.signed_min:
+            self.overflow = True
+            raise Overflow
+        self.overflow = False
+        self.ac.value = result & self.mask
+
+    def add(self, operand):
+        """
+        Add the value of the operand register to the accumulator
+        """
+        sign = self.sign
+        a, b = self.ac.value, operand.value
+        self._store(a - ((a & sign) << 1) + b - ((b & sign) << 1))
+
+    def sub(self, operand):
+        """
+        Subtract the value of the operand register from the accumulator
+        """
+        sign = self.sign
+        a, b = self.ac.value, operand.value
+        self._store(a - ((a & sign) << 1) - b + ((b & sign) << 1))
+
+    def inc(self):
+        """
+        Increase the accumulator by one
+        """
+        a = self.ac.value
+        self._store(a - ((a & self.sign) << 1) + 1)
+
+    def dec(self):
+        """
+        Decrease the accumulator by one
+        """
+        a = self.ac.value
+        self._store(a - ((a & self.sign) << 1) - 1)
+
+    def neg(self):
+        """
+        Build the two's complement of the accumulator. Negating the
+        smallest number wraps around to itself and is not an overflow.
+        """
+        self.overflow = False
+        self.ac.value = -self.ac.value & self.mask
@@ -0,0 +1,45 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Assembled programs as machine words, see DC.assemble_program()
+"""
+
+
+class Program():
+    # pylint: disable=too-few-public-methods,too-many-arguments
+    """
+    A program assembled for one DC configuration. words is the list of
+    (address, word) pairs to put into the RAM, symbols maps the labels to
+    their values (addresses or the values given with EQUAL) and
+    source_lines maps the addresses to their line numbers (starting at 1)
+    in the source file.
+    """
+    def __init__(self, address_width, control_bits, tables, words, symbols,
+                 source_lines):
+        self.address_width = address_width
+        self.control_bits = control_bits
+        self.tables = tables
+        self.words = words
+        self.symbols = symbols
+        self.source_lines = source_lines
+
+    def __len__(self):
+        return len(self.words)
+
+    def to_lines(self):
+        """
+        Return the program as the lines of a DC file, like DC.assemble()
+        the instructions without argument have none
+        """
+        # dc imports this module
+        from . import DC
+        without_arg = DC.opcodes_without_arg
+        split = self.tables.split
+        lines = []
+        for address, word in self.words:
+            command, arg = split(word)
+            if command in without_arg and arg == 0:
+                lines.append("{} {}".format(address, command))
+            else:
+                lines.append("{} {} {}".format(address, command, arg))
+        return lines
@@ -0,0 +1,372 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Lockstep execution of many instances of the same program with NumPy.
+NumPy is optional, BatchDC raises an ImportError without it.
+"""
+from collections import deque
+import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import DC, DCConfig
+from .snapshot import Snapshot
+
+# Cells are stored as int64, so wider cells are not supported
+MAX_CELLWIDTH = 62
+
+
+class BatchDC():
+    # pylint: disable=too-many-instance-attributes,too-many-public-methods
+    # pylint: disable=invalid-name,missing-docstring
+    """
+    Runs the same program on many DC instances at once. The RAMs are the
+    rows of a single matrix and every register is a vector with one
+    value per instance (AC is kept signed). In every step the running
+    instances are grouped by the instruction they are about to execute
+    (usually all of them execute the same one) and every group is
+    executed with vectorized, masked updates.
+
+    Every instance gets its inputs from its own queue and collects its
+    outputs in its own list. An instance that raises an error stops, its
+    registers are left exactly like DC.run() leaves them and errors[i]
+    is the name of the error. Breakpoints are not supported.
+    """
+    def __init__(self, program, inputs, config=None):
+        """
+        Load the program (a list of lines like for DC.load()) into one
+        instance per entry of inputs, which are the input values of the
+        instances
+        """
+        if numpy is None:
+            raise ImportError("BatchDC needs NumPy")
+        d = DC(config or DCConfig())
+        if d.cellwidth > MAX_CELLWIDTH:
+            raise ValueError("Cells with {} bits are not supported"
+                             .format(d.cellwidth))
+        d.load(program)
+        self.conf = d.conf
+        self.tables = d.tables
+        self.amask = d.max_address
+        self.mask = 2 ** d.cellwidth - 1
+        self.sign = 2 ** (d.cellwidth - 1)
+        self.max_int = d.max_int
+        self.min_int = d.min_int
+        self.typecode = d.ram.typecode
+        count = len(inputs)
+
+        def vector(value):
+            return numpy.full(count, value, dtype=numpy.int64)
+
+        self.ram = numpy.tile(numpy.array(d.ram, dtype=numpy.int64),
+                              (count, 1))
+        self.ir, self.dr, self.pc, self.ar, self.sp, self.bp = (
+            vector(r.value) for r in (d.ir, d.dr, d.pc, d.ar, d.sp, d.bp))
+        self.ac = vector(d.ac.signed_value)
+        self.cycles = vector(0)
+        self.running = numpy.ones(count, dtype=bool)
+        self.errors = [None] * count
+        self.inputs = [deque(values) for values in inputs]
+        self.outputs = [[] for _ in inputs]
+        self.return_addresses = [set() for _ in inputs]
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def signed(self, values):
+        return values - ((values & self.sign) << 1)
+
+    def fail(self, idx, error):
+        """
+        Stop the given instances with an error
+        """
+        self.running[idx] = False
+        for i in idx:
+            self.errors[i] = error
+
+    def run(self, max_cycles=None):
+        """
+        Run all instances until they reach an END or an error. Instances
+        that execute more than max_cycles instructions are stopped with
+        a CycleLimitExceeded error.
+        """
+        while self.step():
+            if max_cycles is not None:
+                over = numpy.flatnonzero(self.running &
+                                         (self.cycles >= max_cycles))
+                if over.size:
+                    self.fail(over, "CycleLimitExceeded")
+
+    def step(self):
+        """
+        Execute one instruction on every running instance. Returns False
+        if no instance is running anymore.
+        """
+        active = numpy.flatnonzero(self.running)
+        if not active.size:
+            return False
+        words = self.ram[active, self.pc[active]]
+        first = words[0]
+        if (words == first).all():
+            self.execute(int(first), active)
+            return True
+        order = numpy.argsort(words, kind="stable")
+        words = words[order]
+        active = active[order]
+        starts = numpy.flatnonzero(numpy.diff(words)) + 1
+        for word, idx in zip(words[numpy.r_[0, starts]],
+                             numpy.split(active, starts)):
+            self.execute(int(word), idx)
+        return True
+
+    def execute(self, word, idx):
+        """
+        Execute the instruction word on the given instances, just like
+        DC.cycle()
+        """
+        name = self.tables.name(word)
+        arg = word & self.amask
+        self.ir[idx] = word
+        self.pc[idx] = (self.pc[idx] + 1) & self.amask
+        self.ar[idx] = arg
+        self.dr[idx] = self.ram[idx, arg]
+        self.cycles[idx] += 1
+        handler = getattr(self, name, None)
+        if handler is not None:
+            handler(idx, arg)
+
+    def relative(self, idx, base, arg):
+        """
+        Compute base + arg for SP/BP relative instructions. Instances
+        with an invalid address are stopped, returns the others and
+        their addresses, which are also stored in AR.
+        """
+        addresses = base[idx] + arg
+        bad = addresses > self.amask
+        if bad.any():
+            self.fail(idx[bad], "InvalidAddress")
+            idx = idx[~bad]
+            addresses = addresses[~bad]
+        self.ar[idx] = addresses
+        return idx, addresses
+
+    def store_ac(self, idx, results):
+        """
+        Set AC to the results where they fit and stop the other
+        instances with an Overflow
+        """
+        bad = (results > self.max_int) | (results < self.min_int)
+        if bad.any():
+            self.fail(idx[bad], "Overflow")
+            idx = idx[~bad]
+            results = results[~bad]
+        self.ac[idx] = results
+
+    def jump_if(self, idx, arg, condition):
+        self.pc[idx[condition]] = arg
+
+    def push(self, idx, values):
+        sp = self.sp[idx]
+        self.ar[idx] = sp
+        self.dr[idx] = values
+        self.ram[idx, sp] = values
+        self.sp[idx] = (sp - 1) & self.amask
+
+    def pop(self, idx):
+        """
+        Pop a value into DR and return it
+        """
+        sp = self.sp[idx] = (self.sp[idx] + 1) & self.amask
+        self.ar[idx] = sp
+        values = self.dr[idx] = self.ram[idx, sp]
+        return values
+
+    def output(self, idx):
+        for i, value in zip(idx, self.signed(self.dr[idx])):
+            self.outputs[i].append(int(value))
+
+    def input(self, idx, addresses):
+        """
+        Read an input for every instance into the given addresses.
+        Returns the instances that had no input left.
+        """
+        missing = []
+        for i, address in zip(idx, addresses):
+            if not self.inputs[i]:
+                missing.append(i)
+                continue
+            value = self.inputs[i].popleft() & self.mask
+            self.dr[i] = value
+            self.ram[i, address] = value
+        return missing
+
+    def LDA(self, idx, arg_):
+        self.ac[idx] = self.signed(self.dr[idx])
+
+    def STA(self, idx, arg):
+        values = self.dr[idx] = self.ac[idx] & self.mask
+        self.ram[idx, arg] = values
+
+    def ADD(self, idx, arg_):
+        self.store_ac(idx, self.ac[idx] + self.signed(self.dr[idx]))
+
+    def SUB(self, idx, arg_):
+        self.store_ac(idx, self.ac[idx] - self.signed(self.dr[idx]))
+
+    def JMP(self, idx, arg):
+        self.pc[idx] = arg
+
+    def JMS(self, idx, arg):
+        self.jump_if(idx, arg, self.ac[idx] < 0)
+
+    def JPL(self, idx, arg):
+        self.jump_if(idx, arg, self.ac[idx] > 0)
+
+    def JZE(self, idx, arg):
+        self.jump_if(idx, arg, self.ac[idx] == 0)
+
+    def JNM(self, idx, arg):
+        self.jump_if(idx, arg, self.ac[idx] >= 0)
+
+    def JNP(self, idx, arg):
+        self.jump_if(idx, arg, self.ac[idx] <= 0)
+
+    def JNZ(self, idx, arg):
+        self.jump_if(idx, arg, self.ac[idx] != 0)
+
+    def JSR(self, idx, arg):
+        for i, sp in zip(idx, self.sp[idx]):
+            self.return_addresses[i].add(int(sp))
+        self.push(idx, self.pc[idx])
+        self.pc[idx] = arg
+
+    def RTN(self, idx, arg_):
+        values = self.pop(idx)
+        for i, sp in zip(idx, self.sp[idx]):
+            self.return_addresses[i].discard(int(sp))
+        self.pc[idx] = values & self.amask
+
+    def PSH(self, idx, arg_):
+        self.push(idx, self.ac[idx] & self.mask)
+
+    def POP(self, idx, arg_):
+        self.ac[idx] = self.signed(self.pop(idx))
+
+    def PSHM(self, idx, arg_):
+        self.push(idx, self.dr[idx])
+
+    def POPM(self, idx, arg):
+        values = self.pop(idx)
+        self.ar[idx] = arg
+        self.ram[idx, arg] = values
+
+    def PSHB(self, idx, arg_):
+        self.push(idx, self.bp[idx])
+
+    def POPB(self, idx, arg_):
+        self.bp[idx] = self.pop(idx) & self.amask
+
+    def SPBP(self, idx, arg_):
+        self.bp[idx] = self.sp[idx]
+
+    def BPSP(self, idx, arg_):
+        self.sp[idx] = self.bp[idx]
+
+    def LDAS(self, idx, arg):
+        self.load_relative(idx, self.sp, arg)
+
+    def LDAB(self, idx, arg):
+        self.load_relative(idx, self.bp, arg)
+
+    def load_relative(self, idx, base, arg):
+        idx, addresses = self.relative(idx, base, arg)
+        values = self.dr[idx] = self.ram[idx, addresses]
+        self.ac[idx] = self.signed(values)
+
+    def STAS(self, idx, arg):
+        self.store_relative(idx, self.sp, arg)
+
+    def STAB(self, idx, arg):
+        self.store_relative(idx, self.bp, arg)
+
+    def store_relative(self, idx, base, arg):
+        idx, addresses = self.relative(idx, base, arg)
+        values = self.dr[idx] = self.ac[idx] & self.mask
+        self.ram[idx, addresses] = values
+
+    def ADDS(self, idx, arg):
+        self.add_relative(idx, self.sp, arg, 1)
+
+    def ADDB(self, idx, arg):
+        self.add_relative(idx, self.bp, arg, 1)
+
+    def SUBS(self, idx, arg):
+        self.add_relative(idx, self.sp, arg, -1)
+
+    def SUBB(self, idx, arg):
+        self.add_relative(idx, self.bp, arg, -1)
+
+    def add_relative(self, idx, base, arg, sign):
+        idx, addresses = self.relative(idx, base, arg)
+        values = self.dr[idx] = self.ram[idx, addresses]
+        self.store_ac(idx, self.ac[idx] + sign * self.signed(values))
+
+    def NEG(self, idx, arg_):
+        ac = self.ac[idx]
+        self.ac[idx] = numpy.where(ac == self.min_int, ac, -ac)
+
+    def INC(self, idx, arg_):
+        self.store_ac(idx, self.ac[idx] + 1)
+
+    def DEC(self, idx, arg_):
+        self.store_ac(idx, self.ac[idx] - 1)
+
+    def OUT(self, idx, arg_):
+        self.output(idx)
+
+    def OUTS(self, idx, arg):
+        self.output_relative(idx, self.sp, arg)
+
+    def OUTB(self, idx, arg):
+        self.output_relative(idx, self.bp, arg)
+
+    def output_relative(self, idx, base, arg):
+        idx, addresses = self.relative(idx, base, arg)
+        self.dr[idx] = self.ram[idx, addresses]
+        self.output(idx)
+
+    def INM(self, idx, arg):
+        # Like DC.INM, a missing input just stops the instance
+        missing = self.input(idx, [arg] * len(idx))
+        self.running[missing] = False
+
+    def INS(self, idx, arg):
+        self.input_relative(idx, self.sp, arg)
+
+    def INB(self, idx, arg):
+        self.input_relative(idx, self.bp, arg)
+
+    def input_relative(self, idx, base, arg):
+        idx, addresses = self.relative(idx, base, arg)
+        self.fail(self.input(idx, addresses), "NoInputValue")
+
+    def END(self, idx, arg_):
+        self.running[idx] = False
+
+    def snapshot(self, i):
+        """
+        Return a Snapshot of the instance i, which can be restored into a
+        DC with DC.restore()
+        """
+        ram = array.array(self.typecode, self.ram[i].tolist())
+        registers = tuple(int(r[i]) for r in (
+            self.ir, self.dr, self.pc, self.ac, self.ar, self.sp, self.bp))
+        registers = registers[:3] + (registers[3] & self.mask,) + \
+            registers[4:]
+        return Snapshot(
+            self.conf.address_width, self.conf.control_bits, ram.tobytes(),
+            registers, frozenset(), frozenset(self.return_addresses[i]),
+            int(self.cycles[i]), bool(self.running[i]))
@@ -0,0 +1,142 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+Snapshots of the complete machine state, in memory and as session files.
+
+A session file starts with the header (all numbers little endian):
+
+    magic "DCSESSION", version (2 bytes), address width, control bits,
+    size of a RAM cell in bytes, flags (1 byte each), cycles (8 bytes),
+    IR, DR, PC, AC, AR, SP, BP (8 bytes each), number of breakpoints and
+    number of return addresses (4 bytes each)
+
+followed by the breakpoints and return addresses (4 bytes each) and the
+RAM cells.
+"""
+from collections import namedtuple
+import array
+import struct
+import sys
+
+from .errors import SessionError
+from .parts import CELL_TYPECODES
+
+MAGIC = b"DCSESSION"
+VERSION = 1
+HEADER = struct.Struct("<9sHBBBBQ7QII")
+# Bits of the flags field
+FLAG_RUNNING = 1
+# Registers (IR, DR, PC, AC, AR, SP and BP) that hold a whole cell, the
+# others hold an address
+CELL_REGISTERS = (True, True, False, True, False, False, False)
+
+# ram is the raw content of the RAM as returned by RAM.tobytes(),
+# registers the values of IR, DR, PC, AC, AR, SP and BP.
+Snapshot = namedtuple("Snapshot", [
+    "address_width", "control_bits", "ram", "registers", "breakpoints",
+    "return_addresses", "cycles", "is_running",
+])
+
+
+def _typecode(itemsize):
+    """
+    Return the array typecode for cells of the given size in bytes
+    """
+    for typecode in CELL_TYPECODES:
+        if array.array(typecode).itemsize == itemsize:
+            return typecode
+    raise SessionError("Unsupported cell size: {}".format(itemsize))
+
+
+def _check_values(ram, registers, lists, address_width, cellwidth):
+    """
+    Raise a SessionError if a cell, register, breakpoint or return address
+    has bits outside of the widths of the DC
+    """
+    if ram and max(ram) >> cellwidth:
+        raise SessionError("Cell value {} has more than {} bits"
+                           .format(max(ram), cellwidth))
+    for value, is_cell in zip(registers, CELL_REGISTERS):
+        width = cellwidth if is_cell else address_width
+        if value >> width:
+            raise SessionError("Register value {} has more than {} bits"
+                               .format(value, width))
+    if lists and max(lists) >> address_width:
+        raise SessionError("Address {} has more than {} bits"
+                           .format(max(lists), address_width))
+
+
+def pack(snapshot, itemsize):
+    """
+    Return the snapshot in the session file format. itemsize is the size
+    of a cell in snapshot.ram.
+    """
+    ram = array.array(_typecode(itemsize), snapshot.ram)
+    if sys.byteorder != "little":
+        ram.byteswap()
+    lists = array.array(_typecode(4), sorted(snapshot.breakpoints) +
+                        sorted(snapshot.return_addresses))
+    if sys.byteorder != "little":
+        lists.byteswap()
+    header = HEADER.pack(
+        MAGIC, VERSION, snapshot.address_width, snapshot.control_bits,
+        itemsize, FLAG_RUNNING if snapshot.is_running else 0,
+        snapshot.cycles, *snapshot.registers,
+        len(snapshot.breakpoints), len(snapshot.return_addresses))
+    return header + lists.tobytes() + ram.tobytes()
+
+
+def unpack(data, typecode):
+    """
+    Return the Snapshot stored in the session file data. The RAM of the
+    snapshot is converted to cells of the given typecode. Raises a
+    SessionError if data is no valid session or has values that don't
+    fit into the widths of its DC.
+    """
+    if len(data) < HEADER.size or not data.startswith(MAGIC):
+        raise SessionError("Not a DC session file")
+    (_, version, address_width, control_bits, itemsize, flags, cycles,
+     *rest) = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise SessionError("Unsupported session version {}".format(version))
+    registers = tuple(rest[:7])
+    breakpoint_count, return_count = rest[7:]
+    ram_start = HEADER.size + 4 * (breakpoint_count + return_count)
+    ram_size = 2 ** address_width * itemsize
+    if len(data) != ram_start + ram_size:
+        raise SessionError("Truncated session file")
+    lists = array.array(_typecode(4), data[HEADER.size:ram_start])
+    ram = array.array(_typecode(itemsize), data[ram_start:])
+    if sys.byteorder != "little":
+        lists.byteswap()
+        ram.byteswap()
+    _check_values(ram, registers, lists, address_width,
+                  address_width + control_bits)
+    try:
+        ram = array.array(typecode, ram)
+    except OverflowError:
+        raise SessionError("Cells with {} bits don't fit into the RAM"
+                           .format(address_width + control_bits))
+    return Snapshot(
+        address_width, control_bits, ram.tobytes(),
+        registers, frozenset(lists[:breakpoint_count]),
+        frozenset(lists[breakpoint_count:]), cycles,
+        bool(flags & FLAG_RUNNING))
+
+
+def save_session(d, name):
+    """
+    Save the state of the DC d to the session file with the given name
+    """
+    with open(name, "wb") as session:
+        session.write(pack(d.snapshot(), d.ram.itemsize))
+
+
+def load_session(d, name):
+    """
+    Restore the state of the DC d from the session file with the given
+    name
+    """
+    with open(name, "rb") as session:
+        data = session.read()
+    d.restore(unpack(data, d.ram.typecode))
@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import unittest
+
+from .. import DC
+from ..accelerate import first_iteration
+from ..errors import Overflow, Breakpoint
+from .test_translate import (machine_state, load_example, make_pair,
+                             assert_same_run)
+
+# Counts the cell 10 down to 0 and adds 3 to the cell 11 on every step
+COUNTDOWN = [
+    "0 LDA 10",
+    "1 DEC",
+    "2 STA 10",
+    "3 LDA 11",
+    "4 ADD 12",
+    "5 STA 11",
+    "6 LDA 10",
+    "7 JNZ 0",
+    "8 END",
+    "10 DEF 1000",
+    "11 DEF 0",
+    "12 DEF 3",
+]
+
+
+class FirstIterationTestCase(unittest.TestCase):
+    def brute_force(self, condition, start, step):
+        test = {
+            "<": lambda v: v < 0, ">": lambda v: v > 0,
+            "==": lambda v: v == 0, "!=": lambda v: v != 0,
+            "<=": lambda v: v <= 0, ">=": lambda v: v >= 0,
+        }[condition]
+        for k in range(50):
+            if test(start + k * step):
+                return k
+        return None
+
+    def test_first_iteration(self):
+        for condition in ("<", ">", "==", "!=", "<=", ">="):
+            for start in range(-10, 11):
+                for step in range(-3, 4):
+                    with self.subTest(condition=condition, start=start,
+                                      step=step):
+                        self.assertEqual(
+                            first_iteration(condition, start, step),
+                            self.brute_force(condition, start, step))
+
+
+class LoopAcceleratorTestCase(unittest.TestCase):
+    def assert_same_run(self, program, inputs=(), error=None,
+                        max_cycles=None):
+        return assert_same_run(self, DC.run_fast, program, inputs, error,
+                               max_cycles)
+
+    def test_multiply(self):
+        fast = self.assert_same_run(load_example("multiply.dcl"), [4000, 1])
+        self.assertEqual(fast.interface.output, [4000])
+        self.assertGreater(fast.accelerator.skipped_cycles, 30000)
+
+    def test_countdown(self):
+        fast = self.assert_same_run(COUNTDOWN)
+        self.assertGreater(fast.accelerator.skipped_cycles, 7000)
+
+    def test_cycle_budget(self):
+        """Assert that the accelerator stops exactly at the budget"""
+        for max_cycles in (1, 20, 333, 4000, 7999):
+            with self.subTest(max_cycles=max_cycles):
+                fast = self.assert_same_run(COUNTDOWN, max_cycles=max_cycles)
+                self.assertTrue(fast.is_running)
+
+    def test_overflow(self):
+        """Assert that a loop that would overflow is stepped"""
+        program = list(COUNTDOWN)
+        program[-1] = "12 DEF 3"
+        program[-2] = "11 DEF 4000"
+        fast = self.assert_same_run(program, error=Overflow)
+        self.assertLess(fast.accelerator.skipped_cycles, 100)
+
+    def test_no_exit(self):
+        """Assert that a loop without exit runs into the budget"""
+        program = ["0 LDA 5", "1 INC", "2 STA 5", "3 JMP 0", "5 DEF 0"]
+        self.assert_same_run(program, max_cycles=4001)
+        self.assert_same_run(program, error=Overflow)
+
+    def test_io_loop(self):
+        """Assert that loops with I/O are not accelerated"""
+        fast = self.assert_same_run(load_example("count_to_ten.dcl"))
+        self.assertEqual(fast.accelerator.skipped_cycles, 0)
+
+    def test_self_modifying_loop(self):
+        program = ["0 LDA 1", "1 INC", "2 STA 1", "3 JMP 0"]
+        fast = self.assert_same_run(program, max_cycles=500)
+        self.assertEqual(fast.accelerator.skipped_cycles, 0)
+
+    def test_breakpoint(self):
+        """Assert that a breakpoint inside the loop is respected"""
+        reference, fast = make_pair(COUNTDOWN)
+        reference.breakpoints.add(5)
+        fast.breakpoints.add(5)
+        for _ in range(3):
+            with self.assertRaises(Breakpoint):
+                reference.run_reference()
+            with self.assertRaises(Breakpoint):
+                fast.run_fast()
+            self.assertEqual(machine_state(fast), machine_state(reference))
+        self.assertEqual(fast.accelerator.skipped_cycles, 0)
+
+    def test_changed_code(self):
+        """Assert that the analysis is dropped when the loop changes"""
+        reference, fast = make_pair(COUNTDOWN)
+        reference.run_reference(100)
+        fast.run_fast(100)
+        for d in (reference, fast):
+            d.load(["4 SUB 12"], clear=False)
+        reference.run_reference()
+        fast.run_fast()
+        self.assertEqual(machine_state(fast), machine_state(reference))
+        self.assertEqual(fast.ram[11], 2 ** 13 - 2928)
@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import os
+import tempfile
+import unittest
+
+from .. import DC, DCConfig
+from ..asmcache import (AssemblyCache, dc_text, is_up_to_date, sniff,
+                        source_hash)
+from ..errors import AssembleError
+from .test_translate import EXAMPLES, load_example
+
+
+def read_text(name):
+    with open(os.path.join(EXAMPLES, name)) as source:
+        return source.read()
+
+
+class AssemblyCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.d = DC(DCConfig())
+        self.cache = AssemblyCache(max_entries=2)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def ram_after(self, program):
+        self.d.load(program)
+        return list(self.d.ram)
+
+    def test_sniff(self):
+        for name in os.listdir(EXAMPLES):
+            with self.subTest(name=name):
+                text = read_text(name)
+                self.assertEqual(sniff(text.split("\n")), "dcl")
+                self.assertEqual(sniff(load_example(name)), "dc")
+        self.assertEqual(sniff(["0 DEF -5 ; comment", "", "\x1a",
+                                "  12 end"]), "dc")
+        self.assertEqual(sniff(["0 DEF 5", "X: DEF 5"]), "dcl")
+
+    def test_program(self):
+        text = read_text("multiply.dcl")
+        program = self.cache.program(self.d, text)
+        self.assertEqual(self.ram_after(program),
+                         self.ram_after(load_example("multiply.dcl")))
+        self.assertIs(self.cache.program(self.d, text), program)
+        dc_program = self.cache.program(
+            self.d, "\n".join(load_example("multiply.dcl")))
+        self.assertEqual(self.ram_after(dc_program),
+                         self.ram_after(program))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+    def test_config_in_key(self):
+        text = read_text("fibonacci.dcl")
+        config = DCConfig()
+        config.address_width = 8
+        wide = self.cache.program(DC(config), text)
+        self.assertEqual(wide.address_width, 8)
+        self.assertEqual(self.cache.program(self.d, text).address_width, 7)
+
+    def test_lru(self):
+        texts = ["NOP", "END", "INC"]
+        for text in texts:
+            self.cache.program(self.d, text)
+        self.cache.program(self.d, "INC")
+        self.assertEqual(self.cache.hits, 1)
+        self.cache.program(self.d, "NOP")
+        self.assertEqual(self.cache.misses, 4)
+
+    def test_errors_are_not_cached(self):
+        with self.assertRaises(AssembleError):
+            self.cache.program(self.d, "LDA NOWHERE")
+        self.assertEqual(len(self.cache.programs), 0)
+
+    def test_directory(self):
+        text = read_text("readlist.dcl")
+        program = AssemblyCache(directory=self.directory.name).program(
+            self.d, text)
+        other = AssemblyCache(directory=self.directory.name)
+        stored = other.program(self.d, text)
+        self.assertEqual(other.disk_hits, 1)
+        self.assertEqual(stored.words, program.words)
+        self.assertEqual(stored.symbols, program.symbols)
+        self.assertEqual(stored.source_lines, program.source_lines)
+
+    def test_up_to_date_dc_file(self):
+        source_name = os.path.join(self.directory.name, "multiply.dcl")
+        dc_name = os.path.join(self.directory.name, "multiply.dc")
+        text = read_text("multiply.dcl")
+        with open(source_name, "w") as source:
+            source.write(text)
+        program, up_to_date = self.cache.program_for_file(
+            self.d, text, source_name, dc_name)
+        self.assertFalse(up_to_date)
+        with open(dc_name, "w") as output_file:
+            output_file.write(dc_text(program, source_hash(text)))
+        self.assertTrue(is_up_to_date(dc_name, source_name,
+                                      source_hash(text)))
+        self.assertFalse(is_up_to_date(dc_name, source_name,
+                                       source_hash(text + "\n")))
+        self.cache.clear()
+        loaded, up_to_date = self.cache.program_for_file(
+            self.d, text, source_name, dc_name)
+        self.assertTrue(up_to_date)
+        self.assertEqual(self.ram_after(loaded), self.ram_after(program))
+        # An older .dc file is not used
+        os.utime(dc_name, (0, 0))
+        self.assertFalse(is_up_to_date(dc_name, source_name,
+                                       source_hash(text)))
@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import io
+import unittest
+
+from .. import DC, DCConfig
+from ..assembler import scan
+from ..errors import AssembleError
+
+
+def split_tokens(line):
+    """The tokens of a line as the assembler used to split them"""
+    tokens = (token.strip(":") for token in DC.strip_comment(line).split())
+    return [token for token in tokens if token]
+
+
+class AssemblerTestCase(unittest.TestCase):
+    def test_scan(self):
+        lines = [
+            "LOOP: LDA X ; comment: with ; colons",
+            "  ::  A:B:: ::C\tD;E",
+            ";only a comment",
+            "",
+            "X:DEF 5",
+            "END\x0b\x1f NOP",
+        ]
+        for line in lines:
+            with self.subTest(line=line):
+                self.assertEqual([token for token, _ in scan([line])],
+                                 split_tokens(line))
+        self.assertEqual([line for _, line in scan(lines)],
+                         [1, 1, 1, 2, 2, 2, 5, 5, 6, 6])
+
+    def test_forward_references(self):
+        source = [
+            "JMP START",
+            "X: DEF 3",
+            "START LDA X",
+            "ADD Y",
+            "JNZ START",
+            "Y DEF 20",
+            "END",
+        ]
+        self.assertEqual(DC.assemble(source), [
+            "0 JMP 2",
+            "1 DEF 3",
+            "2 LDA 1",
+            "3 ADD 5",
+            "4 JNZ 2",
+            "5 DEF 20",
+            "6 END",
+        ])
+
+    def test_numeric_label(self):
+        """Assert that labels win over numbers, even if defined later"""
+        self.assertEqual(DC.assemble(["LDA 20", "20 DEF 7", "DEF 20"]),
+                         ["0 LDA 1", "1 DEF 7", "2 DEF 1"])
+
+    def test_file_object(self):
+        source = io.StringIO("INM X\nOUT X\nEND\nX DEF -1\n")
+        d = DC(DCConfig())
+        self.assertEqual(d.assemble_program(source).to_lines(),
+                         ["0 INM 3", "1 OUT 3", "2 END", "3 DEF -1"])
+
+    def test_errors(self):
+        cases = [
+            (["LDA NOWHERE", "JMP ALSO_NOWHERE"], "Invalid label", 0),
+            (["JMP LATER", "LDA 5", "STA NOWHERE", "LATER END"],
+             "Invalid label", 2),
+            (["NOP", "EQUAL 5"], "Expected label", 1),
+            (["X EQUAL"], "Expected value", 0),
+            (["NOP", "LDA"], "Expected argument", 1),
+            (["X NOP", "X NOP"], "Label X already defined", 1),
+            (["X NOP", "X EQUAL 5"], "Label X already defined", 1),
+        ]
+        for source, message, line_number in cases:
+            with self.subTest(source=source):
+                with self.assertRaises(AssembleError) as context:
+                    DC.assemble(source)
+                self.assertTrue(context.exception.msg.startswith(message))
+                self.assertEqual(context.exception.line_number, line_number)
@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from ..batch import find_programs, main, read_spec, run_batch
+from .test_translate import load_example
+
+CASES = [
+    {"name": "small", "inputs": [3, 4], "outputs": [12]},
+    {"name": "zero", "inputs": [0, 5], "outputs": [0]},
+]
+
+
+class BatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.write("multiply.dcl", "\n".join(load_example("multiply.dcl")))
+        self.write("echo.dcl", "INM 20\nOUT 20\nEND\n")
+        self.write("broken.dcl", "LDA NOWHERE\n")
+        self.write("loop.dc", "0 JMP 0\n")
+        self.write("notes.txt", "not a program")
+        self.spec = self.write("spec.json", json.dumps(CASES))
+
+    def write(self, name, content):
+        name = os.path.join(self.directory.name, name)
+        with open(name, "w") as output_file:
+            output_file.write(content)
+        return name
+
+    def results(self, processes):
+        names = find_programs(self.directory.name)
+        results = {}
+        for file_results in run_batch(names, read_spec(self.spec),
+                                      max_cycles=1000, processes=processes):
+            for result in file_results:
+                name = os.path.basename(result["file"])
+                results[name, result["case"]] = result
+        return results
+
+    def test_find_programs(self):
+        names = [os.path.basename(name)
+                 for name in find_programs(self.directory.name)]
+        self.assertEqual(names, ["broken.dcl", "echo.dcl", "loop.dc",
+                                 "multiply.dcl"])
+
+    def test_results(self):
+        results = self.results(processes=0)
+        self.assertEqual(len(results), 7)
+        self.assertTrue(results["multiply.dcl", "small"]["passed"])
+        self.assertTrue(results["multiply.dcl", "zero"]["passed"])
+        self.assertEqual(results["echo.dcl", "small"]["output"], [3])
+        self.assertFalse(results["echo.dcl", "small"]["passed"])
+        self.assertEqual(results["broken.dcl", None]["error"],
+                         "AssembleError")
+        self.assertEqual(results["loop.dc", "zero"]["error"],
+                         "CycleLimitExceeded")
+        self.assertEqual(results["loop.dc", "zero"]["cycles"], 1000)
+
+    def test_process_pool(self):
+        self.assertEqual(self.results(processes=2),
+                         self.results(processes=0))
+
+    def test_main(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            status = main([self.directory.name, self.spec, "-j", "0",
+                           "--max-cycles", "1000"])
+        self.assertEqual(status, 1)
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(len(lines), 7)
@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import os
+import pickle
+import tempfile
+import unittest
+
+from .. import DC, DCConfig
+from ..batch import find_programs, run_batch
+from ..cache import ResultCache, make_result, result_key
+from .test_dc import MockInterface
+from .test_translate import load_example
+
+
+class ResultCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.cache = ResultCache(self.directory.name)
+        self.addCleanup(self.cache.close)
+
+    def make_dc(self, program="multiply.dcl", config=None):
+        d = DC(config or DCConfig())
+        d.load(load_example(program))
+        return d
+
+    def test_key(self):
+        d = self.make_dc()
+        key = result_key(d, [3, 4])
+        self.assertEqual(result_key(self.make_dc(), [3, 4]), key)
+        self.assertNotEqual(result_key(d, [4, 3]), key)
+        self.assertNotEqual(result_key(d, [3, 4], 1000), key)
+        self.assertNotEqual(result_key(self.make_dc("fibonacci.dcl"), [3, 4]),
+                            key)
+        config = DCConfig()
+        config.address_width = 8
+        self.assertNotEqual(result_key(self.make_dc(config=config), [3, 4]),
+                            key)
+
+    def test_get_put(self):
+        d = self.make_dc()
+        key = result_key(d, [3, 4])
+        self.assertIsNone(self.cache.get(key))
+        d.interface = MockInterface([3, 4])
+        d.run()
+        result = make_result(d, d.interface.output, None)
+        self.cache.put(key, result)
+        self.assertEqual(self.cache.get(key), result)
+        self.assertEqual(result["output"], [12])
+        self.assertEqual(result["registers"]["PC"], d.pc.value)
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]),
+                         (1, 1, 1))
+        # Another object (e.g. in another process) sees the result
+        other = ResultCache(self.directory.name)
+        self.assertEqual(other.get(key), result)
+        other.close()
+
+    def test_eviction(self):
+        self.cache.max_bytes = 1000
+        result = {"output": list(range(30))}
+        for number in range(20):
+            self.cache.put(bytes([number]), result)
+            # The first entry is used all the time and survives
+            self.assertIsNotNone(self.cache.get(bytes([0])))
+        self.assertLessEqual(self.cache.size(), 1000)
+        self.assertGreater(self.cache.evictions, 0)
+        self.assertIsNotNone(self.cache.get(bytes([0])))
+        self.assertIsNone(self.cache.get(bytes([1])))
+        self.assertIsNotNone(self.cache.get(bytes([19])))
+
+    def test_pickle(self):
+        self.cache.put(b"key", {"output": []})
+        copy = pickle.loads(pickle.dumps(self.cache))
+        self.assertEqual(copy.get(b"key"), {"output": []})
+        copy.close()
+
+    def test_batch(self):
+        programs = os.path.join(self.directory.name, "programs")
+        os.mkdir(programs)
+        with open(os.path.join(programs, "multiply.dcl"), "w") as out_file:
+            out_file.write("\n".join(load_example("multiply.dcl")))
+        names = find_programs(programs)
+        cases = [{"name": "small", "inputs": [3, 4], "outputs": [12]}]
+        for processes, cached in [(0, False), (2, True), (0, True)]:
+            results = list(run_batch(names, cases, processes=processes,
+                                     cache=self.cache))
+            result = results[0][0]
+            self.assertEqual(result["cached"], cached)
+            self.assertTrue(result["passed"])
@@ -136,3 +136,59 @@ class DcTestCase(unittest.TestCase):
         self.dc.run()
         self.assertEqual(self.interface.input, [5])
         self.assertEqual(self.interface.output, [3, 3])
+
+    def test_register_identity(self):
+        """Assert that arithmetic doesn't replace the accumulator"""
+        ac = self.dc.ac
+        self.dc.load(["0 LDA 6", "1 ADD 6", "2 SUB 7", "3 NEG", "4 INC",
+                      "5 END", "6 DEF 4", "7 DEF 3"])
+        self.dc.run()
+        self.assertIs(self.dc.ac, ac)
+        self.assertEqual(ac.signed_value, -4)
+
+    def test_cell_table(self):
+        """Assert that cells are split into command and argument"""
+        tables = self.dc.tables
+        self.assertEqual(tables.split(self.dc.parse_command("ADD 17")),
+                         ("ADD", 17))
+        self.assertEqual(tables.split(self.dc.parse_command("DEF -3")),
+                         ("DEF", -3))
+        self.assertIs(DC(DCConfig()).tables, tables)
+
+    def test_memory_footprint(self):
+        """Assert that a DC stays small, even with every cell decoded"""
+        self.assertLess(self.dc.memory_footprint(), 4 * 1024)
+        self.dc.load(["{} NOP".format(i) for i in range(len(self.dc.ram))])
+        for _ in range(len(self.dc.ram)):
+            self.dc.cycle()
+        self.assertLess(self.dc.memory_footprint(), 20 * 1024)
+
+    def test_self_modifying_code(self):
+        """Assert that overwriting an executed cell takes effect"""
+        program = [
+            "0 LDA 5",
+            "1 STA 3",
+            "2 JMP 3",
+            "3 OUT 6",
+            "4 END",
+            "5 END",
+            "6 DEF 7",
+        ]
+        self.dc.load(program)
+        # Decode cell 3 once before it gets overwritten
+        self.dc.pc.set(3)
+        self.dc.cycle()
+        self.assertEqual(self.interface.output, [7])
+        self.dc.pc.set(0)
+        self.dc.run()
+        self.assertEqual(self.interface.output, [7])
+        self.assertEqual(self.dc.pc.value, 4)
+
+    def test_load_patch(self):
+        """Assert that patching the RAM without clearing it is respected"""
+        self.dc.load(["0 OUT 3", "1 END", "3 DEF 1"])
+        self.dc.run()
+        self.dc.load(["0 OUT 4", "4 DEF 2"], clear=False)
+        self.dc.pc.set(0)
+        self.dc.run()
+        self.assertEqual(self.interface.output, [1, 2])
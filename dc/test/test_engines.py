@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import unittest
+
+from .. import DC, DCConfig
+from .. import engines
+from ..errors import CycleLimitExceeded
+from .test_dc import MockInterface
+from .test_translate import machine_state, load_example
+
+
+class EngineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.d = DC(DCConfig())
+
+    def test_auto(self):
+        """Assert that the fastest engine is picked and downgraded"""
+        self.assertEqual(self.d.engine().name, "translated")
+        self.d.breakpoints.add(3)
+        self.assertEqual(self.d.engine().name, "fast")
+        self.d.trace = lambda d: None
+        self.assertEqual(self.d.engine().name, "reference")
+        self.d.breakpoints.clear()
+        self.d.trace = None
+        self.assertEqual(self.d.engine().name, "translated")
+
+    def test_configured(self):
+        """Assert that a configured engine is never upgraded"""
+        self.d.conf.engine = "fusion"
+        self.assertEqual(self.d.engine().name, "fusion")
+        self.d.breakpoints.add(3)
+        self.assertEqual(self.d.engine().name, "fusion")
+        self.d.trace = lambda d: None
+        self.assertEqual(self.d.engine().name, "reference")
+
+    def test_unknown_engine(self):
+        config = DCConfig()
+        config.engine = "quantum"
+        with self.assertRaises(ValueError):
+            DC(config)
+
+    def test_all_engines(self):
+        """Assert that every engine gives the same results"""
+        program = load_example("multiply.dcl")
+        states = {}
+        for name in engines.ENGINES:
+            with self.subTest(engine=name):
+                config = DCConfig()
+                config.engine = name
+                d = DC(config)
+                d.interface = MockInterface([6, 7])
+                d.load(program)
+                d.run()
+                self.assertEqual(d.interface.output, [42])
+                states[name] = machine_state(d)
+        self.assertEqual(len(set(map(repr, states.values()))), 1)
+
+    def test_runner_reused(self):
+        """Assert that running again doesn't set up the engine again"""
+        self.d.interface = MockInterface([])
+        self.d.load(["0 END"])
+        self.d.run()
+        watchers = len(self.d.ram.watchers)
+        self.d.pc.set(0)
+        self.d.run()
+        self.assertEqual(len(self.d.ram.watchers), watchers)
+
+
+class CycleLimitTestCase(unittest.TestCase):
+    def make_dc(self, engine, program):
+        config = DCConfig()
+        config.engine = engine
+        d = DC(config)
+        d.interface = MockInterface([6, 7])
+        d.load(program)
+        return d
+
+    def test_max_cycles(self):
+        """Assert that every engine stops exactly at the cycle limit"""
+        program = ["0 LDA 5", "1 INC", "2 STA 5", "3 JMP 0"]
+        for name in engines.ENGINES:
+            with self.subTest(engine=name):
+                d = self.make_dc(name, program)
+                with self.assertRaises(CycleLimitExceeded) as context:
+                    d.run(max_cycles=1002)
+                error = context.exception
+                self.assertEqual(error.cycles, 1002)
+                self.assertEqual(error.pc, 2)
+                self.assertEqual(error.registers["AC"], 251)
+                self.assertEqual(d.cycles, 1002)
+                self.assertEqual(d.ram[5], 250)
+                self.assertFalse(d.is_running)
+
+    def test_cycle_counter(self):
+        """Assert that all engines count the same number of cycles"""
+        program = load_example("multiply.dcl")
+        reference = self.make_dc("reference", program)
+        cycles = reference.run()
+        self.assertEqual(reference.cycles, cycles)
+        for name in engines.ENGINES:
+            with self.subTest(engine=name):
+                d = self.make_dc(name, program)
+                self.assertEqual(d.run(), cycles)
+                self.assertEqual(d.cycles, cycles)
+                d.load(program)
+                self.assertEqual(d.cycles, 0)
+
+    def test_resume(self):
+        """Assert that a program can continue after reaching the limit"""
+        program = load_example("multiply.dcl")
+        d = self.make_dc("auto", program)
+        with self.assertRaises(CycleLimitExceeded):
+            d.run(max_cycles=20)
+        d.run()
+        self.assertEqual(d.interface.output, [42])
+        self.assertEqual(d.cycles, self.make_dc("auto", program).run())
+
+    def test_max_seconds(self):
+        d = self.make_dc("auto", ["0 JMP 0"])
+        with self.assertRaises(CycleLimitExceeded) as context:
+            d.run(max_seconds=0.01)
+        self.assertGreater(context.exception.cycles, 0)
+        self.assertEqual(context.exception.cycles, d.cycles)
@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import itertools
+import unittest
+
+from .. import DC, DCConfig
+from ..errors import DCError
+from ..explore import explore, outcomes
+from .test_dc import MockInterface
+from .test_translate import load_example
+
+
+def run_directly(program, inputs):
+    """Return the outputs and the error of a plain run with the inputs"""
+    d = DC(DCConfig())
+    d.interface = MockInterface(list(inputs))
+    d.load(program)
+    try:
+        d.run_reference()
+    except DCError as error:
+        return tuple(d.interface.output), type(error).__name__
+    return tuple(d.interface.output), None
+
+
+class ExploreTestCase(unittest.TestCase):
+    def assert_same_outcomes(self, program, inputs, tree):
+        leaves = list(outcomes(tree))
+        self.assertEqual(len(leaves),
+                         len(list(itertools.product(*inputs))))
+        for leaf in leaves:
+            with self.subTest(inputs=leaf.inputs):
+                self.assertEqual((leaf.outputs, leaf.error),
+                                 run_directly(program, leaf.inputs))
+
+    def test_multiply(self):
+        program = load_example("multiply.dcl")
+        inputs = [range(0, 6), range(-3, 4)]
+        tree = explore(program, inputs, processes=0)
+        self.assertEqual(sorted(tree.children), list(range(0, 6)))
+        self.assert_same_outcomes(program, inputs, tree)
+        self.assertEqual(tree.children[4].children[3].outputs, (12,))
+
+    def test_overflow(self):
+        program = load_example("multiply.dcl")
+        inputs = [[1, 2], [3000]]
+        tree = explore(program, inputs, processes=0)
+        self.assertEqual(tree.children[2].children[3000].error, "Overflow")
+        self.assertIsNone(tree.children[1].children[3000].error)
+
+    def test_missing_input(self):
+        tree = explore(load_example("multiply.dcl"), [[1, 2]], processes=0)
+        for leaf in outcomes(tree):
+            self.assertEqual(leaf.error, "NoInputValue")
+
+    def test_input_after_def(self):
+        """Assert that the explorer forks at an input instruction that
+        follows a DEF cell"""
+        program = ["0 DEF -1", "1 INM 10", "2 OUT 10", "3 END"]
+        tree = explore(program, [[1, 2]], processes=0)
+        self.assertEqual(tree.cycles, 1)
+        self.assertEqual(sorted(tree.children), [1, 2])
+        self.assertEqual(tree.children[2].outputs, (2,))
+        self.assert_same_outcomes(program, [[1, 2]], tree)
+
+    def test_cycle_limit(self):
+        program = ["0 INM 5", "1 JMP 1"]
+        tree = explore(program, [[1]], max_cycles=100, processes=0)
+        self.assertEqual(tree.children[1].error, "CycleLimitExceeded")
+
+    def test_no_input(self):
+        tree = explore(load_example("count_to_ten.dcl"), [], processes=0)
+        self.assertEqual(tree.outputs, tuple(range(0, 11)))
+        self.assertEqual(tree.children, {})
+
+    def test_process_pool(self):
+        program = load_example("fibonacci.dcl")
+        inputs = [range(0, 8)]
+        tree = explore(program, inputs, processes=2)
+        self.assert_same_outcomes(program, inputs, tree)
+
+    def test_process_pool_deep(self):
+        """Assert that the forks of later inputs are explored in the pool
+        as well"""
+        program = load_example("multiply.dcl")
+        inputs = [range(0, 4), range(-2, 3)]
+        tree = explore(program, inputs, processes=2)
+        self.assertEqual(list(tree.children), list(range(0, 4)))
+        self.assertEqual(list(tree.children[1].children), list(range(-2, 3)))
+        self.assert_same_outcomes(program, inputs, tree)
@@ -0,0 +1,95 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import unittest
+
+from ..errors import Overflow, Breakpoint
+from ..fusion import Fuser
+from .test_translate import machine_state, load_example, make_pair
+
+
+class FuserTestCase(unittest.TestCase):
+    def count_cycles(self, d):
+        """Run d with DC.cycle() and return the number of instructions"""
+        cycles = 0
+        d.is_running = True
+        while d.is_running:
+            cycles += 1
+            d.cycle()
+        return cycles
+
+    def test_examples(self):
+        """Assert that fusion changes neither the state nor the cycles"""
+        cases = [
+            ("count_to_ten.dcl", []),
+            ("multiply.dcl", [7, 9]),
+            ("fibonacci.dcl", [8]),
+            ("readlist.dcl", [4, -2, 9, 0]),
+        ]
+        hit_rates = {}
+        for name, inputs in cases:
+            with self.subTest(name=name):
+                reference, fused = make_pair(load_example(name), inputs)
+                cycles = self.count_cycles(reference)
+                fuser = Fuser(fused)
+                fuser.run()
+                self.assertEqual(machine_state(fused),
+                                 machine_state(reference))
+                self.assertEqual(fused.interface.output,
+                                 reference.interface.output)
+                self.assertEqual(fuser.cycles, cycles)
+                hit_rates[name] = fuser.hit_rate
+        self.assertGreater(hit_rates["multiply.dcl"], 0.5)
+
+    def test_patterns(self):
+        program = ["0 LDA 10", "1 ADD 11", "2 STA 12", "3 LDA 10", "4 DEC",
+                   "5 STA 10", "6 JNZ 3", "7 END", "10 DEF 3", "11 DEF 4"]
+        reference, fused = make_pair(program)
+        cycles = self.count_cycles(reference)
+        fuser = Fuser(fused)
+        fuser.run()
+        self.assertEqual(machine_state(fused), machine_state(reference))
+        self.assertEqual(fuser.cycles, cycles)
+        self.assertEqual(fuser.fused_cycles, cycles - 1)
+
+    def test_overflow(self):
+        program = ["0 LDA 10", "1 ADD 11", "2 STA 12", "3 END",
+                   "10 DEF 4000", "11 DEF 1000"]
+        reference, fused = make_pair(program)
+        with self.assertRaises(Overflow):
+            reference.run_reference()
+        fuser = Fuser(fused)
+        with self.assertRaises(Overflow):
+            fuser.run()
+        self.assertEqual(machine_state(fused), machine_state(reference))
+        self.assertEqual(fuser.cycles, 2)
+
+    def test_breakpoint_splits(self):
+        """Assert that a breakpoint inside a sequence is respected"""
+        program = ["0 LDA 10", "1 ADD 11", "2 STA 12", "3 END",
+                   "10 DEF 3", "11 DEF 4"]
+        reference, fused = make_pair(program)
+        reference.breakpoints.add(2)
+        fused.breakpoints.add(2)
+        with self.assertRaises(Breakpoint):
+            reference.run_reference()
+        fuser = Fuser(fused)
+        with self.assertRaises(Breakpoint):
+            fuser.run()
+        self.assertEqual(machine_state(fused), machine_state(reference))
+        fused.breakpoints.clear()
+        fuser.run()
+        self.assertEqual(fused.ram[12], 7)
+
+    def test_overwritten_sequence(self):
+        """Assert that a sequence is split when its code is overwritten"""
+        program = ["0 PSH", "1 PSH", "2 JSR 5", "3 END", "5 RTN"]
+        reference, fused = make_pair(program)
+        # The first push overwrites the second one with an END
+        for d in (reference, fused):
+            d.sp.set(1)
+            d.ac.set(reference.parse_command("END"))
+        reference.run_reference()
+        fuser = Fuser(fused)
+        fuser.run()
+        self.assertEqual(machine_state(fused), machine_state(reference))
+        self.assertEqual(fuser.cycles, 2)
@@ -0,0 +1,157 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import os
+import random
+import unittest
+
+from .. import DC, DCConfig
+from ..errors import DCError
+from ..incremental import AssemblySession
+from .test_translate import EXAMPLES
+
+LINES = [
+    "LDA X", "STA Y", "JMP LOOP", "LOOP:", "X: DEF 3", "Y: DEF 0", "NOP",
+    "END", "; comment", "", "Z EQUAL 4", "LDA Z", "JMS SUB", "SUBR: PSH",
+    "RTN", "DEF LOOP", "LDA", "X", "EQUAL", "5", "LDA 20", "20 DEF 1",
+    "A B", "INC ; x", "DEF 99999", "LDA NOWHERE", "Y",
+]
+# Lines with errors, files made of them have several errors at once
+ERRORS = [
+    "Z EQUAL 999", "Z EQUAL Q", "X: NOP", "LOOP: LDA 9999", "DEF Z",
+    "JMP Y", "EQUAL 3", "LDA X STA Y", "W EQUAL -1", "DEF W", "LDA W",
+]
+
+
+def outcome(assemble):
+    """The Program of assemble() or the error it raises"""
+    try:
+        program = assemble()
+    except DCError as error:
+        return type(error), error.msg, error.line_number
+    return program.words, program.symbols, program.source_lines
+
+
+class AssemblySessionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.d = DC(DCConfig())
+
+    def assertAssembles(self, session, lines):
+        self.assertEqual(outcome(session.program),
+                         outcome(lambda: self.d.assemble_program(lines)))
+
+    def test_examples(self):
+        for name in sorted(os.listdir(EXAMPLES)):
+            with self.subTest(name=name):
+                with open(os.path.join(EXAMPLES, name)) as source:
+                    text = source.read()
+                session = AssemblySession(self.d, text)
+                self.assertAssembles(session, text.split("\n"))
+
+    def test_random_edits(self):
+        """Assert that the session agrees with the assembler after every
+        edit, including the errors"""
+        config = DCConfig()
+        config.address_width = 4
+        for d in (self.d, DC(config)):
+            self.d = d
+            generator = random.Random(4)
+            for _ in range(300):
+                lines = [generator.choice(LINES)
+                         for _ in range(generator.randint(1, 12))]
+                session = AssemblySession(d, "\n".join(lines))
+                for _ in range(6):
+                    first = generator.randrange(len(lines))
+                    count = generator.randint(0, min(3, len(lines) - first))
+                    texts = [generator.choice(LINES)
+                             for _ in range(generator.randint(1, 3))]
+                    lines[first:first + count] = texts
+                    session.replace(first, count, texts)
+                    with self.subTest(lines=lines):
+                        self.assertAssembles(session, lines)
+
+    def test_several_errors(self):
+        """Assert that the session raises the same error as the assembler
+        if a file has several errors, in small memories too"""
+        for address_width in (7, 4, 3):
+            config = DCConfig()
+            config.address_width = address_width
+            self.d = DC(config)
+            generator = random.Random(100 + address_width)
+            for _ in range(200):
+                lines = [generator.choice(LINES + ERRORS)
+                         for _ in range(generator.randint(1, 20))]
+                session = AssemblySession(self.d, "\n".join(lines))
+                for _ in range(6):
+                    first = generator.randrange(len(lines))
+                    count = generator.randint(0, min(3, len(lines) - first))
+                    texts = [generator.choice(LINES + ERRORS)
+                             for _ in range(generator.randint(1, 3))]
+                    lines[first:first + count] = texts
+                    session.replace(first, count, texts)
+                    with self.subTest(lines=lines):
+                        self.assertAssembles(session, lines)
+
+    def test_span(self):
+        session = AssemblySession(self.d, "NOP\nLDA X\n\nX: DEF 1")
+        self.assertEqual(session.span(0, 0), 1)
+        self.assertEqual(session.span(0, 3), 1)
+        self.assertEqual(session.span(0, 4), 2)
+        self.assertEqual(session.span(1, 6), 2)
+        self.assertEqual(session.span(1, 7), 3)
+        self.assertEqual(session.span(3, 100), 1)
+
+    def test_character_edits(self):
+        """Assert that edits given as characters, like the ones of a
+        QTextDocument, update the right lines"""
+        generator = random.Random(7)
+        text = "\n".join(LINES[:12])
+        session = AssemblySession(self.d, text)
+        for _ in range(200):
+            position = generator.randint(0, len(text))
+            removed = generator.randint(0, min(12, len(text) - position))
+            added = generator.choice(["", "\n", "NOP\n", "X", "\nLDA Y\n",
+                                      ": ", " 1"])
+            text = text[:position] + added + text[position + removed:]
+            first = text.count("\n", 0, position)
+            start = text.rfind("\n", 0, position) + 1
+            last = text.count("\n", 0, position + len(added))
+            count = session.span(first, position - start + removed)
+            session.replace(first, count,
+                            text.split("\n")[first:last + 1])
+            self.assertEqual(list(session.texts()), text.split("\n"))
+        self.assertAssembles(session, text.split("\n"))
+
+    def test_edit_encodes_little(self):
+        """Assert that a one line edit only encodes the edited line and
+        the lines that use a label whose definition changed"""
+        lines = ["START: LDA VALUE"] + ["ADD 1", "NOP"] * 50
+        lines += ["JMP START", "VALUE: DEF 5", "LDA VALUE", "LDA LIMIT",
+                  "LIMIT EQUAL 4"]
+        session = AssemblySession(self.d, "\n".join(lines))
+        encoded = []
+        encode = session.encode
+
+        def counting_encode(number, opcode, arg, line_number):
+            encoded.append(opcode)
+            return encode(number, opcode, arg, line_number)
+
+        session.encode = counting_encode
+        session.replace(50, 1, ["SUB 2"])
+        self.assertEqual(encoded, ["SUB"])
+        del encoded[:]
+        # VALUE moves, but its address is only added by program()
+        session.replace(60, 1, [])
+        self.assertEqual(encoded, [])
+        session.replace(104, 1, ["LIMIT EQUAL 5"])
+        self.assertEqual(encoded, ["LDA"])
+        lines[50] = "SUB 2"
+        del lines[60]
+        lines[104] = "LIMIT EQUAL 5"
+        self.assertAssembles(session, lines)
+
+    def test_program_is_reused(self):
+        session = AssemblySession(self.d, "LDA X\nX: DEF 3")
+        program = session.program()
+        self.assertIs(session.program(), program)
+        session.replace(1, 1, ["X: DEF 4"])
+        self.assertEqual(session.program().words, [(0, 1), (1, 4)])
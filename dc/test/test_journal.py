@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import unittest
+
+from .. import DC, DCConfig
+from ..errors import Breakpoint
+from .test_dc import MockInterface
+from .test_translate import machine_state, load_example
+
+
+class JournalTestCase(unittest.TestCase):
+    def make_dc(self, budget=2 ** 16, program="fibonacci.dcl", inputs=(12,)):
+        config = DCConfig()
+        config.journal_budget = budget
+        d = DC(config)
+        d.interface = MockInterface(list(inputs))
+        d.load(load_example(program))
+        return d
+
+    def run_steps(self, d, count):
+        """Execute count cycles and return the states before each one"""
+        states = []
+        for _ in range(count):
+            states.append((machine_state(d), d.cycles))
+            d.cycle()
+        states.append((machine_state(d), d.cycles))
+        return states
+
+    def test_step_back(self):
+        d = self.make_dc()
+        states = self.run_steps(d, 1000)
+        for count in (1, 2, 7, 300, 1):
+            with self.subTest(count=count):
+                self.assertEqual(d.step_back(count), count)
+                del states[-count:]
+                self.assertEqual((machine_state(d), d.cycles), states[-1])
+
+    def test_rewind_everything(self):
+        d = self.make_dc()
+        states = self.run_steps(d, 3000)
+        self.assertEqual(d.step_back(5000), 3000)
+        self.assertEqual((machine_state(d), d.cycles), states[0])
+        self.assertEqual(d.step_back(), 0)
+
+    def test_continue_after_rewind(self):
+        """Assert that the program runs the same way after going back"""
+        reference = self.make_dc(inputs=(8, 8))
+        reference.run_reference()
+        d = self.make_dc(inputs=(8, 8))
+        self.run_steps(d, 500)
+        d.step_back(400)
+        self.run_steps(d, 700)
+        d.step_back(10)
+        d.run_reference()
+        self.assertEqual(machine_state(d), machine_state(reference))
+        self.assertEqual(d.interface.output, reference.interface.output)
+
+    def test_run(self):
+        """Assert that DC.run() picks an engine that keeps the journal"""
+        d = self.make_dc(program="multiply.dcl", inputs=(5, 3))
+        states = self.run_steps(d, 20)
+        d.run()
+        self.assertEqual(d.engine().name, "reference")
+        count = d.cycles - 20
+        self.assertEqual(d.step_back(count), count)
+        self.assertEqual((machine_state(d), d.cycles), states[-1])
+
+    def test_budget(self):
+        """Assert that only the newest entries are kept"""
+        d = self.make_dc(budget=4096)
+        capacity = d.journal.capacity
+        self.assertLessEqual(d.journal.memory_use(), 4096 + 1024)
+        states = self.run_steps(d, capacity + 100)
+        self.assertEqual(len(d.journal), capacity)
+        self.assertEqual(d.step_back(capacity + 100), capacity)
+        self.assertEqual((machine_state(d), d.cycles), states[100])
+
+    def test_reverse_continue(self):
+        d = self.make_dc(program="multiply.dcl", inputs=(5, 3))
+        d.breakpoints.add(4)
+        d.is_running = True
+        stops = []
+        while d.is_running:
+            try:
+                d.cycle()
+            except Breakpoint:
+                stops.append((machine_state(d), d.cycles))
+                d.is_running = True
+        self.assertEqual(len(stops), 5)
+        d.reverse_continue()
+        self.assertEqual((machine_state(d), d.cycles), stops[-1])
+        d.reverse_continue()
+        self.assertEqual((machine_state(d), d.cycles), stops[-2])
+        d.breakpoints.clear()
+        d.reverse_continue()
+        self.assertEqual(d.cycles, 0)
+
+    def test_cleared_by_load(self):
+        d = self.make_dc()
+        self.run_steps(d, 10)
+        d.load(["0 END"], clear=False)
+        self.assertEqual(d.step_back(), 0)
+        self.run_steps(d, 10)
+        d.load(d.assemble_program(["1 END"]), clear=False)
+        self.assertEqual(d.step_back(), 0)
+
+    def test_other_engine(self):
+        """Assert that instructions executed without DC.cycle() clear the
+        journal, although no cell is watched"""
+        d = self.make_dc()
+        self.assertFalse(d.ram.watched)
+        self.run_steps(d, 10)
+        d.run_fast(10)
+        self.assertEqual(d.step_back(), 0)
+        states = self.run_steps(d, 10)
+        self.assertEqual(d.step_back(20), 10)
+        self.assertEqual((machine_state(d), d.cycles), states[0])
+
+    def test_disabled(self):
+        d = DC(DCConfig())
+        d.cycle()
+        self.assertIsNone(d.journal)
+        self.assertEqual(d.step_back(), 0)
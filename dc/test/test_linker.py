@@ -0,0 +1,190 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import os
+import tempfile
+import unittest
+
+from .. import DC, DCConfig
+from ..errors import AssembleError, LinkError
+from ..linker import assemble_module, build, link, main
+from ..objfile import load_file
+from .test_dc import MockInterface
+
+MAIN = """
+IMPORT MUL
+IMPORT A
+IMPORT B
+EXPORT RESULT
+INM A
+INM B
+JSR MUL
+OUT RESULT
+END
+RESULT: DEF 0
+"""
+
+MATH = """
+EXPORT MUL
+EXPORT A
+EXPORT B
+IMPORT RESULT
+ONE EQUAL 1
+A: DEF 0
+B: DEF 0
+COUNT: DEF 0
+MUL: LDA B
+STA COUNT
+LDA ZERO
+STA RESULT
+LOOP: LDA COUNT
+JZE DONE
+SUB ONEC
+STA COUNT
+LDA RESULT
+ADD A
+STA RESULT
+JMP LOOP
+DONE: RTN
+ZERO: DEF 0
+ONEC: DEF ONE
+POINTER: DEF LOOP
+"""
+
+
+class LinkerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.d = DC(DCConfig())
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def module(self, text, name):
+        return assemble_module(self.d, text.split("\n"), name)
+
+    def write(self, name, content):
+        name = os.path.join(self.directory.name, name)
+        with open(name, "w") as output_file:
+            output_file.write(content)
+        return name
+
+    def run_program(self, program, inputs):
+        self.d.load(program)
+        interface = MockInterface(list(inputs))
+        self.d.interface = interface
+        self.d.run(max_cycles=10000)
+        return interface.output
+
+    def test_link(self):
+        program = link(self.d, [self.module(MAIN, "MAIN"),
+                                self.module(MATH, "MATH")])
+        self.assertEqual(self.run_program(program, [6, 7]), [42])
+        self.assertEqual(program.symbols["MUL"], 9)
+        self.assertEqual(program.symbols["MAIN.RESULT"], 5)
+        self.assertEqual(program.symbols["MATH.LOOP"], 13)
+        self.assertNotIn("MATH.ONE", program.symbols)
+        self.assertEqual(program.source_lines[9], 10)
+        lines = program.to_lines()
+        self.assertEqual(lines[2], "2 JSR 9")
+        # DEF of an address is relocated, DEF of a number is not
+        self.assertEqual(lines[23:], ["23 LDA 1", "24 LDA 13"])
+
+    def test_numeric_addresses(self):
+        """Assert that addresses given as numbers are relocated like
+        labels, but not the numbers of DEF and the offsets to SP/BP"""
+        main_module = self.module("IMPORT GET\nJSR GET\nSTA X\nOUT X\nEND\n"
+                                  "X: DEF 0", "MAIN")
+        library = self.module("EXPORT GET\nGET: LDA 4\nLDAS 1\nLDA 4\nRTN\n"
+                              "DEF 20", "LIBRARY")
+        program = link(self.d, [main_module, library])
+        self.assertEqual(program.to_lines()[5:],
+                         ["5 LDA 9", "6 LDAS 1", "7 LDA 9", "8 RTN",
+                          "9 LDA 20"])
+        self.assertEqual(self.run_program(program, []), [20])
+        with self.assertRaises(LinkError):
+            link(self.d, [main_module, self.module("EXPORT GET\nGET: JMP 125",
+                                                   "FAR")])
+
+    def test_single_module(self):
+        """Assert that a module without imports links to what the assembler
+        produces"""
+        source = ["JMP START", "X: DEF 3", "START: LDA X", "OUT X", "END"]
+        program = link(self.d, [self.module("\n".join(source), "ONLY")])
+        self.assertEqual(program.to_lines(),
+                         self.d.assemble_program(source).to_lines())
+
+    def test_directives_need_linkage(self):
+        """Assert that EXPORT and IMPORT are labels in plain programs"""
+        self.assertEqual(DC.assemble(["EXPORT NOP", "JMP EXPORT"]),
+                         ["0 NOP", "1 JMP 0"])
+
+    def test_assemble_errors(self):
+        cases = [
+            ("IMPORT X\nX: NOP", "Label X already defined", 1),
+            ("X: NOP\nIMPORT X", "Label X already defined", 1),
+            ("NOP\nEXPORT X", "Exported label X not defined", 1),
+            ("X EQUAL 5\nEXPORT X", "Only addresses can be exported", 1),
+            ("EXPORT", "Expected label", 0),
+        ]
+        for source, message, line_number in cases:
+            with self.subTest(source=source):
+                with self.assertRaises(AssembleError) as context:
+                    self.module(source, "BROKEN")
+                self.assertTrue(context.exception.msg.startswith(message))
+                self.assertEqual(context.exception.line_number, line_number)
+
+    def test_link_errors(self):
+        main_module = self.module(MAIN, "MAIN")
+        math_module = self.module(MATH, "MATH")
+        cases = [
+            [main_module],
+            [main_module, math_module, self.module("EXPORT A\nA: NOP", "X")],
+            [main_module, math_module, math_module],
+            [main_module, math_module,
+             self.module("\n".join(["NOP"] * 110), "BIG")],
+        ]
+        for modules in cases:
+            with self.subTest(modules=[module.name for module in modules]):
+                with self.assertRaises(LinkError):
+                    link(self.d, modules)
+        config = DCConfig()
+        config.address_width = 8
+        with self.assertRaises(LinkError):
+            link(DC(config), [main_module, math_module])
+
+    def test_build(self):
+        build_dir = os.path.join(self.directory.name, "build")
+        names = [self.write("main.dcl", MAIN), self.write("math.dcl", MATH)]
+        program, assembled = build(self.d, names, build_dir)
+        self.assertEqual(assembled, names)
+        self.assertEqual(sorted(os.listdir(build_dir)),
+                         ["MAIN.dcm", "MATH.dcm"])
+        reused, assembled = build(self.d, names, build_dir)
+        self.assertEqual(assembled, [])
+        self.assertEqual(reused.words, program.words)
+        self.assertEqual(reused.symbols, program.symbols)
+        self.assertEqual(reused.source_lines, program.source_lines)
+        # Only the changed module is assembled again
+        self.write("main.dcl", MAIN.replace("INM A\nINM B", "INM B\nINM A"))
+        program, assembled = build(self.d, names, build_dir)
+        self.assertEqual(assembled, names[:1])
+        self.assertEqual(self.run_program(program, [6, 7]), [42])
+        # Modules for another configuration are not reused
+        config = DCConfig()
+        config.address_width = 8
+        _, assembled = build(DC(config), names, build_dir)
+        self.assertEqual(assembled, names)
+
+    def test_build_error_names_file(self):
+        name = self.write("broken.dcl", "LDA NOWHERE")
+        with self.assertRaises(AssembleError) as context:
+            build(self.d, [name])
+        self.assertIn("broken.dcl", context.exception.msg)
+
+    def test_main(self):
+        names = [self.write("main.dcl", MAIN), self.write("math.dcl", MATH)]
+        target = os.path.join(self.directory.name, "program.dco")
+        self.assertEqual(main(["-o", target] + names), 0)
+        load_file(self.d, target)
+        self.d.interface = MockInterface([3, 5])
+        self.d.run(max_cycles=10000)
+        self.assertEqual(self.d.interface.output, [15])
+        self.assertEqual(main(["-o", target, names[0]]), 1)
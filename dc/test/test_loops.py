@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import unittest
+
+from .. import DC, DCConfig
+from ..errors import CycleLimitExceeded, InfiniteLoop
+from .test_dc import MockInterface
+from .test_translate import load_example
+
+
+class LoopDetectorTestCase(unittest.TestCase):
+    def make_dc(self, program, inputs=()):
+        config = DCConfig()
+        config.detect_loops = True
+        d = DC(config)
+        d.interface = MockInterface(list(inputs))
+        d.load(program)
+        return d
+
+    def test_jump_to_itself(self):
+        d = self.make_dc(["0 NOP", "1 JMP 1"])
+        with self.assertRaises(InfiniteLoop) as context:
+            d.run()
+        self.assertEqual((context.exception.start, context.exception.end),
+                         (1, 1))
+        self.assertEqual(context.exception.period, 1)
+        self.assertFalse(d.is_running)
+        self.assertLess(d.cycles, 5)
+
+    def test_loop_without_writes(self):
+        program = ["0 LDA 10", "1 ADD 11", "2 JNZ 4", "3 END", "4 SUB 11",
+                   "5 JMP 1", "10 DEF 5", "11 DEF 1"]
+        d = self.make_dc(program)
+        with self.assertRaises(InfiniteLoop) as context:
+            d.run()
+        self.assertEqual((context.exception.start, context.exception.end),
+                         (1, 5))
+        self.assertEqual(context.exception.period, 4)
+        self.assertLess(d.cycles, 20)
+
+    def test_loop_with_writes(self):
+        """Assert that a loop flipping a cell back and forth is found"""
+        program = ["0 LDA 10", "1 NEG", "2 STA 10", "3 JMP 0", "10 DEF 3"]
+        d = self.make_dc(program)
+        with self.assertRaises(InfiniteLoop) as context:
+            d.run()
+        self.assertEqual(context.exception.period, 8)
+        # The written cell is followed without watching it
+        self.assertNotIn(10, d.ram.watched)
+
+    def test_ram_changed_between_runs(self):
+        """Assert that a loop is still found after the RAM was replaced"""
+        d = self.make_dc(["0 LDA 10", "1 NEG", "2 STA 10", "3 JMP 0",
+                          "10 DEF 3"])
+        with self.assertRaises(CycleLimitExceeded):
+            d.run(max_cycles=3)
+        d.load(["0 LDA 10", "1 STA 11", "2 JMP 0", "10 DEF 4"])
+        with self.assertRaises(InfiniteLoop):
+            d.run()
+
+    def test_terminating_programs(self):
+        """Assert that ending programs are never reported"""
+        cases = [
+            ("count_to_ten.dcl", []),
+            ("multiply.dcl", [7, 9]),
+            ("fibonacci.dcl", [8]),
+            ("readlist.dcl", [4, -2, 9, 0]),
+        ]
+        for name, inputs in cases:
+            with self.subTest(name=name):
+                d = self.make_dc(load_example(name), inputs)
+                d.run()
+                self.assertEqual(d.engine().name, "reference")
+
+    def test_io_resets(self):
+        """Assert that a loop doing output is not reported"""
+        d = self.make_dc(["0 OUT 5", "1 JMP 0", "5 DEF 1"])
+        with self.assertRaises(Exception) as context:
+            d.run(max_cycles=100)
+        self.assertNotIsInstance(context.exception, InfiniteLoop)
+        self.assertEqual(len(d.interface.output), 50)
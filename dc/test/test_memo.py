@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import unittest
+
+from .. import DCConfig
+from ..errors import Breakpoint
+from .test_translate import (machine_state, load_example, make_pair,
+                             assert_same_run)
+
+# Calls a subroutine that adds 1 to the cell 20 twice with the same state
+PURE_CALLS = [
+    "0 JSR 10",
+    "1 LDA 20",
+    "2 SUB 21",
+    "3 STA 20",
+    "4 JSR 10",
+    "5 END",
+    "10 LDA 20",
+    "11 INC",
+    "12 STA 20",
+    "13 RTN",
+    "20 DEF 5",
+    "21 DEF 1",
+]
+
+
+def memoized(d, max_cycles):
+    return d.memoizer.run(max_cycles)
+
+
+def memoizing_config():
+    config = DCConfig()
+    config.memoize = True
+    return config
+
+
+class MemoizerTestCase(unittest.TestCase):
+    def make_pair(self, program, inputs=()):
+        return make_pair(program, inputs, memoizing_config())
+
+    def assert_same_run(self, program, inputs=(), max_cycles=None):
+        d = assert_same_run(self, memoized, program, inputs,
+                            max_cycles=max_cycles, config=memoizing_config())
+        self.assertEqual(d.engine().name, "memoized")
+        return d
+
+    def test_fibonacci(self):
+        for n in (0, 1, 5, 12):
+            with self.subTest(n=n):
+                self.assert_same_run(load_example("fibonacci.dcl"), [n])
+        memoizer = self.assert_same_run(load_example("fibonacci.dcl"),
+                                        [12]).memoizer
+        self.assertGreater(memoizer.hit_rate, 0.3)
+        self.assertGreater(memoizer.memory_use(), 0)
+
+    def test_replay(self):
+        memoizer = self.assert_same_run(PURE_CALLS).memoizer
+        self.assertEqual((memoizer.hits, memoizer.misses), (1, 1))
+
+    def test_cycle_budget(self):
+        """Assert that a call is not replayed beyond the budget"""
+        for max_cycles in (5, 6, 8, 9):
+            with self.subTest(max_cycles=max_cycles):
+                self.assert_same_run(PURE_CALLS, max_cycles=max_cycles)
+
+    def test_io_refused(self):
+        program = list(PURE_CALLS)
+        program[8] = "12 OUT 20"
+        memoizer = self.assert_same_run(program).memoizer
+        self.assertEqual(memoizer.hits, 0)
+        self.assertIn(10, memoizer.refused)
+
+    def test_self_modifying_refused(self):
+        program = list(PURE_CALLS)
+        program[8] = "12 STA 11"
+        memoizer = self.assert_same_run(program).memoizer
+        self.assertEqual(memoizer.hits, 0)
+        self.assertIn(10, memoizer.refused)
+
+    def test_changed_input(self):
+        """Assert that a call reading other values is executed"""
+        program = list(PURE_CALLS)
+        program[3] = "3 NOP"
+        memoizer = self.assert_same_run(program).memoizer
+        self.assertEqual(memoizer.hits, 0)
+
+    def test_stack_wraps(self):
+        """Assert that a call replayed with the SP at the end of the
+        memory returns to the address at the start of it"""
+        program = ["0 JSR 10", "1 JSR 10", "2 END", "10 LDA 20", "11 RTN",
+                   "20 DEF 7"]
+        reference, memoized = self.make_pair(program)
+        for d in (reference, memoized):
+            d.sp.set(0)
+        reference.run_reference()
+        memoized.memoizer.run()
+        self.assertEqual(machine_state(memoized), machine_state(reference))
+        self.assertEqual(memoized.memoizer.hits, 1)
+
+    def test_breakpoint(self):
+        """Assert that calls are executed while breakpoints are set"""
+        reference, memoized = self.make_pair(PURE_CALLS)
+        reference.breakpoints.add(12)
+        memoized.breakpoints.add(12)
+        for _ in range(2):
+            with self.assertRaises(Breakpoint):
+                reference.run_reference()
+            with self.assertRaises(Breakpoint):
+                memoized.run()
+            self.assertEqual(machine_state(memoized),
+                             machine_state(reference))
+        self.assertEqual(memoized.memoizer.hits, 0)
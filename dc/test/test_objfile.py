@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import array
+import os
+import tempfile
+import unittest
+
+from .. import DC, DCConfig
+from ..batch import grade
+from ..errors import ObjectFileError
+from ..objfile import (HEADER, convert, load, load_file, main, pack,
+                       pack_program, pack_ram, read_program, save_file,
+                       to_program)
+from .test_translate import EXAMPLES, load_example
+
+
+class ObjectFileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.d = DC(DCConfig())
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_round_trip(self):
+        for name in sorted(os.listdir(EXAMPLES)):
+            with self.subTest(name=name):
+                program = read_program(self.d, os.path.join(EXAMPLES, name))
+                save_file(self.path("program.dco"), pack_program(program))
+                self.d.load(load_example(name))
+                expected = list(self.d.ram)
+                self.d.load(["0 DEF 1"])
+                self.d.run_fast(5)
+                load_file(self.d, self.path("program.dco"))
+                self.assertEqual(list(self.d.ram), expected)
+                self.assertEqual(self.d.cycles, 0)
+                with open(self.path("program.dco"), "rb") as object_file:
+                    stored = to_program(self.d, object_file.read())
+                self.assertEqual(stored.symbols, program.symbols)
+                self.assertEqual(stored.source_lines, program.source_lines)
+
+    def test_pack_ram(self):
+        self.d.load(load_example("fibonacci.dcl"))
+        data = pack_ram(self.d)
+        self.assertEqual(len(data), HEADER.size + self.d.ram.itemsize *
+                         len(self.d.ram) + len(b"{}"))
+        other = DC(DCConfig())
+        load(other, data)
+        self.assertEqual(list(other.ram), list(self.d.ram))
+
+    def test_invalid(self):
+        data = pack_ram(self.d)
+        cases = [b"", b"DCOBJECT", b"NOTANOBJECTFILE!" + data[16:],
+                 data[:-1], data[:8] + b"\x02\x00" + data[10:]]
+        for case in cases:
+            with self.subTest(data=case[:12]):
+                with self.assertRaises(ObjectFileError):
+                    load(self.d, case)
+        save_file(self.path("empty.dco"), b"")
+        with self.assertRaises(ObjectFileError):
+            load_file(self.d, self.path("empty.dco"))
+
+    def test_other_config(self):
+        config = DCConfig()
+        config.address_width = 8
+        with self.assertRaises(ObjectFileError):
+            load(DC(config), pack_ram(self.d))
+
+    def test_cell_out_of_range(self):
+        """Assert that cells wider than the cells of the DC are rejected"""
+        ram = array.array(self.d.ram.typecode, self.d.ram)
+        ram[3] = 2 ** self.d.cellwidth
+        data = pack(self.d.conf.address_width, self.d.conf.control_bits, ram)
+        self.d.load(["0 DEF 1"])
+        for function in (load, to_program):
+            with self.subTest(function=function.__name__):
+                with self.assertRaises(ObjectFileError):
+                    function(self.d, data)
+        self.assertEqual(list(self.d.ram), [0] * len(self.d.ram))
+        wide = array.array("L", ram)
+        wide[3] = 2 ** 20
+        with self.assertRaises(ObjectFileError):
+            load(self.d, pack(self.d.conf.address_width,
+                              self.d.conf.control_bits, wide))
+
+    def test_convert(self):
+        source = os.path.join(EXAMPLES, "multiply.dcl")
+        convert(source, self.path("multiply.dco"))
+        self.assertEqual(main([self.path("multiply.dco"),
+                               self.path("multiply.dc")]), 0)
+        self.d.load(read_program(self.d, self.path("multiply.dc")))
+        expected = DC(DCConfig())
+        expected.load(load_example("multiply.dcl"))
+        self.assertEqual(list(self.d.ram), list(expected.ram))
+        self.assertEqual(main([source, self.path("multiply.txt")]), 1)
+
+    def test_batch(self):
+        convert(os.path.join(EXAMPLES, "multiply.dcl"),
+                self.path("multiply.dco"))
+        results = grade(self.path("multiply.dco"),
+                        [{"name": "case", "inputs": [6, 7], "outputs": [42]}],
+                        max_cycles=1000, max_seconds=None)
+        self.assertTrue(results[0]["passed"])
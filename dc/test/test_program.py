@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import os
+import pickle
+import unittest
+
+from .. import DC, DCConfig
+from ..errors import AssembleError, InvalidAddress, ScriptError
+from .test_translate import EXAMPLES
+
+
+def read_source(name):
+    with open(os.path.join(EXAMPLES, name)) as source:
+        return source.read().split("\n")
+
+
+class ProgramTestCase(unittest.TestCase):
+    def setUp(self):
+        self.d = DC(DCConfig())
+
+    def test_examples(self):
+        """Assert that a Program loads like the assembled text"""
+        reference = DC(DCConfig())
+        for name in sorted(os.listdir(EXAMPLES)):
+            with self.subTest(name=name):
+                source = read_source(name)
+                reference.load(DC.assemble(source))
+                program = self.d.assemble_program(source)
+                self.d.load(program)
+                self.assertEqual(list(self.d.ram), list(reference.ram))
+                reference.load(program.to_lines())
+                self.assertEqual(list(reference.ram), list(self.d.ram))
+
+    def test_symbols(self):
+        source = [
+            "; A comment",
+            "START: INM X",
+            "       LDA X",
+            "       JMS START",
+            "       END",
+            "LIMIT EQUAL 42",
+            "X      DEF -5",
+            "Y      DEF LIMIT",
+        ]
+        program = self.d.assemble_program(source)
+        self.assertEqual(program.symbols,
+                         {"START": 0, "X": 4, "LIMIT": 42, "Y": 5})
+        self.assertEqual(program.source_lines,
+                         {0: 2, 1: 3, 2: 4, 3: 5, 4: 7, 5: 8})
+        self.assertEqual(len(program), 6)
+        self.d.load(program)
+        self.assertEqual(self.d.ram[5], 42)
+        self.assertEqual(self.d.tables.signed(self.d.ram[4]), -5)
+
+    def test_load_without_clear(self):
+        self.d.load(["100 DEF 7"])
+        self.d.load(self.d.assemble_program(["OUT 100"]), clear=False)
+        self.assertEqual(self.d.ram[100], 7)
+        self.assertEqual(self.d.command_name(self.d.ram[0]), "OUT")
+
+    def test_errors(self):
+        """Assert that errors refer to the lines of the source"""
+        cases = [
+            (["NOP", "", "JMP 200"], InvalidAddress, 2),
+            (["NOP", "X DEF 5000"], ScriptError, 1),
+            (["X EQUAL Y", "LDA X"], InvalidAddress, 1),
+            (["LDA NOWHERE"], AssembleError, 0),
+            (["NOP"] * 129, InvalidAddress, 128),
+        ]
+        for source, error, line_number in cases:
+            with self.subTest(source=source[:3]):
+                with self.assertRaises(error) as context:
+                    self.d.assemble_program(source)
+                self.assertEqual(context.exception.line_number, line_number)
+
+    def test_other_config(self):
+        config = DCConfig()
+        config.address_width = 8
+        program = DC(config).assemble_program(["JMP 200"])
+        with self.assertRaises(ScriptError):
+            self.d.load(program)
+
+    def test_pickle(self):
+        program = self.d.assemble_program(read_source("multiply.dcl"))
+        copy = pickle.loads(pickle.dumps(program))
+        self.assertEqual(copy.to_lines(), program.to_lines())
@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import unittest
+
+from ..parts import RAM
+
+
+class RAMTestCase(unittest.TestCase):
+    def setUp(self):
+        self.ram = RAM(16, cellwidth=13)
+
+    def test_cell_type(self):
+        """Assert that the smallest fitting cell type is chosen"""
+        self.assertEqual(self.ram.itemsize, 2)
+        self.assertEqual(RAM(4, cellwidth=8).itemsize, 1)
+        self.assertEqual(RAM(4, cellwidth=20).itemsize, 4)
+        with self.assertRaises(ValueError):
+            RAM(4, cellwidth=65)
+
+    def test_fixed_size(self):
+        """Assert that the RAM can't grow or shrink"""
+        for method, args in [("append", (1,)), ("extend", ([1],)),
+                             ("insert", (0, 1)), ("pop", ()),
+                             ("fromlist", ([1],))]:
+            with self.subTest(method=method):
+                with self.assertRaises(NotImplementedError):
+                    getattr(self.ram, method)(*args)
+        self.assertEqual(len(self.ram), 16)
+
+    def test_clear(self):
+        """Assert that clearing resets every cell and notifies watchers"""
+        calls = []
+        self.ram.watch(lambda address, value: calls.append(address))
+        self.ram[3] = 8191
+        self.ram[:] = range(16)
+        self.ram.clear()
+        self.assertEqual(list(self.ram), [0] * 16)
+        self.assertEqual(calls, [None, None])
+        ram = RAM(4, init=7, cellwidth=13)
+        ram[0] = 1
+        ram.clear()
+        self.assertEqual(list(ram), [7] * 4)
+
+    def test_buffer(self):
+        """Assert that cells can be copied through memoryviews"""
+        self.ram[:] = range(16)
+        other = RAM(16, cellwidth=13)
+        other.load_buffer(memoryview(self.ram)[2:6], offset=10)
+        self.assertEqual(list(other[10:14]), [2, 3, 4, 5])
+        self.assertEqual(other[9], 0)
+        self.assertEqual(other[14], 0)
+        self.assertEqual(bytes(memoryview(other)), other.tobytes())
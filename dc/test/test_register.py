@@ -2,7 +2,8 @@
 # -*- encoding: utf-8 -*-
 import unittest
 
-from ..parts import Register
+from ..errors import Overflow
+from ..parts import Register, ALU
 
 
 class RegisterTestCase(unittest.TestCase):
@@ -42,3 +43,56 @@ class RegisterTestCase(unittest.TestCase):
         self.register.set(1)
         self.assertEqual(self.register.leftmost, 0)
         self.assertEqual(self.register.rightmost, 1)
+
+    def test_wide_signed_value(self):
+        """Assert that wide registers work without a lookup table"""
+        register = Register("Wide", 40, -5)
+        self.assertEqual(register.signed_value, -5)
+        self.assertEqual(register.width.signed_values, ())
+
+    def test_inplace_arithmetic(self):
+        """Assert that += and -= keep the register object"""
+        register = self.register
+        register += 5
+        register -= Register("Other", 8, 7)
+        self.assertIs(register, self.register)
+        self.assertEqual(self.register.signed_value, -2)
+
+
+class ALUTestCase(unittest.TestCase):
+    def setUp(self):
+        self.ac = Register("AC", 8)
+        self.alu = ALU(self.ac)
+
+    def test_add_sub(self):
+        """Assert that adding and subtracting works with signed values"""
+        self.ac.set(-100)
+        self.alu.add(Register("DR", 8, -20))
+        self.assertEqual(self.ac.signed_value, -120)
+        self.alu.sub(Register("DR", 8, -127))
+        self.assertEqual(self.ac.signed_value, 7)
+        self.assertFalse(self.alu.overflow)
+
+    def test_overflow(self):
+        """Assert that an overflow leaves the accumulator untouched"""
+        self.ac.set(127)
+        with self.assertRaises(Overflow):
+            self.alu.inc()
+        self.assertTrue(self.alu.overflow)
+        self.assertEqual(self.ac.value, 127)
+        self.ac.set(-128)
+        with self.assertRaises(Overflow):
+            self.alu.dec()
+        with self.assertRaises(Overflow):
+            self.alu.sub(Register("DR", 8, 1))
+        self.assertEqual(self.ac.signed_value, -128)
+        self.alu.inc()
+        self.assertFalse(self.alu.overflow)
+
+    def test_neg(self):
+        """Assert that negation builds the two's complement"""
+        for value in (0, 1, -1, 127, -128):
+            self.ac.set(value)
+            self.alu.neg()
+            self.assertEqual(self.ac.signed_value, -value if value != -128
+                             else -128)
@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import unittest
+
+from .. import DC
+from ..errors import Overflow, InvalidAddress, Breakpoint, NoInputValue
+from .test_translate import (machine_state, load_example, make_pair,
+                             assert_same_run)
+
+
+class RunFastTestCase(unittest.TestCase):
+    def assert_same_run(self, program, inputs=(), error=None):
+        return assert_same_run(self, DC.run_fast, program, inputs, error)
+
+    def test_examples(self):
+        cases = [
+            ("count_to_ten.dcl", []),
+            ("multiply.dcl", [7, 9]),
+            ("fibonacci.dcl", [8]),
+            ("readlist.dcl", [4, -2, 9, 0]),
+        ]
+        for name, inputs in cases:
+            with self.subTest(name=name):
+                self.assert_same_run(load_example(name), inputs)
+
+    def test_errors(self):
+        cases = [
+            (["0 LDA 3", "1 INC", "2 JMP 1", "3 DEF 4090"], Overflow),
+            (["0 LDA 3", "1 SUB 4", "2 END", "3 DEF -4000", "4 DEF 500"],
+             Overflow),
+            (["0 SPBP", "1 LDAB 5", "2 END"], InvalidAddress),
+        ]
+        for program, error in cases:
+            with self.subTest(program=program):
+                self.assert_same_run(program, error=error)
+
+    def test_no_input(self):
+        """Assert that a missing input stops the program"""
+        program = ["0 INM 5", "1 END"]
+        reference, fast = make_pair(program)
+        reference.interface.get_input = fast.interface.get_input = \
+            self.raise_no_input
+        reference.run_reference()
+        fast.run_fast()
+        self.assertEqual(machine_state(fast), machine_state(reference))
+        self.assertFalse(fast.is_running)
+
+    @staticmethod
+    def raise_no_input():
+        raise NoInputValue
+
+    def test_breakpoint(self):
+        reference, fast = make_pair(load_example("multiply.dcl"), [2, 3])
+        reference.breakpoints.add(5)
+        fast.breakpoints.add(5)
+        for _ in range(2):
+            with self.assertRaises(Breakpoint):
+                reference.run_reference()
+            with self.assertRaises(Breakpoint):
+                fast.run_fast()
+            self.assertEqual(machine_state(fast), machine_state(reference))
+            self.assertFalse(fast.is_running)
+
+    def test_cycle_budget(self):
+        """Assert that the state is written back when the budget is used"""
+        program = load_example("multiply.dcl")
+        reference, fast = make_pair(program, [5, 3])
+        for _ in range(20):
+            reference.cycle()
+        self.assertEqual(fast.run_fast(20), 20)
+        self.assertEqual(machine_state(fast), machine_state(reference))
+        self.assertTrue(fast.is_running)
+        fast.run_fast()
+        self.assertEqual(fast.interface.output, [15])
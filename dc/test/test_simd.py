@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import unittest
+
+from .. import DC, DCConfig
+from ..errors import DCError
+from ..simd import BatchDC, numpy
+from .test_dc import MockInterface
+from .test_translate import machine_state, load_example
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class BatchDCTestCase(unittest.TestCase):
+    def assert_same_runs(self, program, inputs, max_cycles=None):
+        batch = BatchDC(program, inputs)
+        batch.run(max_cycles)
+        for i, values in enumerate(inputs):
+            with self.subTest(inputs=values):
+                d = DC(DCConfig())
+                d.interface = MockInterface(list(values))
+                d.load(program)
+                error = None
+                try:
+                    d.run(max_cycles)
+                except DCError as exc:
+                    error = type(exc).__name__
+                d.is_running = False
+                resumed = DC(DCConfig())
+                resumed.restore(batch.snapshot(i))
+                self.assertEqual(machine_state(resumed), machine_state(d))
+                self.assertEqual(resumed.cycles, d.cycles)
+                self.assertEqual(batch.outputs[i], d.interface.output)
+                self.assertEqual(batch.errors[i], error)
+        return batch
+
+    def test_multiply(self):
+        inputs = [(a, b) for a in range(-2, 20, 3) for b in (0, 7, 300)]
+        self.assert_same_runs(load_example("multiply.dcl"), inputs)
+
+    def test_fibonacci(self):
+        inputs = [(n,) for n in range(12)]
+        self.assert_same_runs(load_example("fibonacci.dcl"), inputs)
+
+    def test_readlist(self):
+        inputs = [(3, 1, -2, 0), (0,), (5, 5, 5, 5, 5, 5, 0)]
+        self.assert_same_runs(load_example("readlist.dcl"), inputs)
+
+    def test_errors(self):
+        program = [
+            "0 INM 20",
+            "1 LDA 20",
+            "2 JZE 10",
+            "3 JMS 12",
+            "4 ADD 21",
+            "5 END",
+            "10 SPBP",
+            "11 LDAB 5",
+            "12 NEG",
+            "13 DEC",
+            "14 INC",
+            "15 END",
+            "21 DEF 4000",
+        ]
+        inputs = [(0,), (-5,), (-2048,), (50,), (96,), (95,)]
+        batch = self.assert_same_runs(program, inputs)
+        self.assertEqual(batch.errors[:2], ["InvalidAddress", None])
+
+    def test_cycle_limit(self):
+        inputs = [(a, 1) for a in (1, 5, 60)]
+        batch = self.assert_same_runs(load_example("multiply.dcl"), inputs,
+                                      max_cycles=200)
+        self.assertEqual(batch.errors, [None, None, "CycleLimitExceeded"])
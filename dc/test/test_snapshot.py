@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import array
+import os
+import tempfile
+import unittest
+
+from .. import DC, DCConfig
+from ..errors import SessionError
+from ..snapshot import pack, unpack, save_session, load_session
+from .test_dc import MockInterface
+from .test_translate import machine_state, load_example
+
+
+class SnapshotTestCase(unittest.TestCase):
+    def make_dc(self, inputs=(9,)):
+        d = DC(DCConfig())
+        d.interface = MockInterface(list(inputs))
+        d.load(load_example("fibonacci.dcl"))
+        return d
+
+    def assert_same_dc(self, first, second):
+        self.assertEqual(machine_state(first), machine_state(second))
+        self.assertEqual(first.breakpoints, second.breakpoints)
+        self.assertEqual(first.cycles, second.cycles)
+
+    def test_restore(self):
+        d = self.make_dc()
+        d.breakpoints.add(40)
+        d.run_fast(500)
+        snapshot = d.snapshot()
+        d.run_fast()
+        output = d.interface.output
+        d.restore(snapshot)
+        self.assertEqual(d.snapshot(), snapshot)
+        d.interface = MockInterface([])
+        d.run_fast()
+        self.assertEqual(d.interface.output, output)
+
+    def test_restore_into_other_dc(self):
+        """Assert that a post-load snapshot replaces reset() and load()"""
+        template = self.make_dc()
+        snapshot = template.snapshot()
+        d = DC(DCConfig())
+        d.run_fast(10)
+        d.restore(snapshot)
+        self.assert_same_dc(d, template)
+
+    def test_session_bytes(self):
+        d = self.make_dc()
+        d.run_fast(321)
+        d.breakpoints.update({3, 17})
+        snapshot = d.snapshot()
+        data = pack(snapshot, d.ram.itemsize)
+        self.assertEqual(unpack(data, d.ram.typecode), snapshot)
+
+    def test_session_file(self):
+        d = self.make_dc()
+        d.run_fast(1000)
+        with tempfile.TemporaryDirectory() as directory:
+            name = os.path.join(directory, "session.dcs")
+            save_session(d, name)
+            resumed = DC(DCConfig())
+            load_session(resumed, name)
+        self.assert_same_dc(resumed, d)
+
+    def test_invalid_session(self):
+        d = self.make_dc()
+        data = pack(d.snapshot(), d.ram.itemsize)
+        cases = [
+            b"DC file",
+            data[:-1],
+            data[:9] + b"\x02\x00" + data[11:],
+        ]
+        for case in cases:
+            with self.subTest(data=case[:12]):
+                with self.assertRaises(SessionError):
+                    unpack(case, d.ram.typecode)
+
+    def test_values_out_of_range(self):
+        d = self.make_dc()
+        snapshot = d.snapshot()
+        ram = array.array("Q", array.array(d.ram.typecode, snapshot.ram))
+        wide = array.array("Q", ram)
+        wide[3] = 1 << d.cellwidth
+        registers = list(snapshot.registers)
+        registers[2] = d.max_address + 1
+        cases = [
+            snapshot._replace(ram=wide.tobytes()),
+            snapshot._replace(ram=ram.tobytes(), registers=registers),
+            snapshot._replace(ram=ram.tobytes(),
+                              breakpoints={d.max_address + 1}),
+            # Fits into the widths, but not into the cells of the RAM
+            snapshot._replace(ram=(array.array("Q", [1 << 40]) *
+                                   len(ram)).tobytes(), control_bits=40),
+        ]
+        for case in cases:
+            with self.subTest(case=case[:2] + case[3:]):
+                with self.assertRaises(SessionError):
+                    unpack(pack(case, 8), d.ram.typecode)
+
+    def test_other_config(self):
+        config = DCConfig()
+        config.address_width = 8
+        with self.assertRaises(SessionError):
+            DC(config).restore(self.make_dc().snapshot())
@@ -0,0 +1,124 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+import os
+import unittest
+
+from .. import DC, DCConfig
+from ..errors import Overflow, InvalidAddress, Breakpoint
+from ..translate import Translator
+from .test_dc import MockInterface
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), "..", "..", "doc",
+                        "source", "examples")
+
+
+def machine_state(d):
+    registers = tuple(r.value for r in (d.ir, d.dr, d.pc, d.ac, d.ar, d.sp,
+                                        d.bp))
+    return registers, list(d.ram), sorted(d.return_addresses)
+
+
+def load_example(name):
+    with open(os.path.join(EXAMPLES, name)) as source:
+        return DC.assemble(source.read().split("\n"))
+
+
+def make_pair(program, inputs=(), config=None):
+    """Return a reference DC and a DC for the engine under test (with the
+    given DCConfig) with the same program and inputs"""
+    pair = []
+    for conf in (DCConfig(), config or DCConfig()):
+        d = DC(conf)
+        d.interface = MockInterface(list(inputs))
+        d.load(program)
+        pair.append(d)
+    return pair
+
+
+def assert_same_run(test, engine, program, inputs=(), error=None,
+                    max_cycles=None, config=None):
+    # pylint: disable=too-many-arguments
+    """Run the program with DC.run_reference() and with the engine under
+    test, called as engine(d, max_cycles), and assert that both end in
+    the same state (raising the same error). Returns the DC of the
+    engine."""
+    reference, tested = make_pair(program, inputs, config)
+    for d, run in ((reference, DC.run_reference), (tested, engine)):
+        if error is None:
+            run(d, max_cycles)
+        else:
+            with test.assertRaises(error):
+                run(d, max_cycles)
+    test.assertEqual(machine_state(tested), machine_state(reference))
+    test.assertEqual(tested.interface.output, reference.interface.output)
+    test.assertEqual(tested.is_running, reference.is_running)
+    test.assertEqual(tested.cycles, reference.cycles)
+    return tested
+
+
+def translated(d, max_cycles):
+    return Translator(d).run(max_cycles)
+
+
+class TranslatorTestCase(unittest.TestCase):
+    def assert_same_run(self, program, inputs=(), error=None):
+        return assert_same_run(self, translated, program, inputs, error)
+
+    def test_examples(self):
+        """Assert that the examples behave exactly like with DC.run()"""
+        cases = [
+            ("count_to_ten.dcl", []),
+            ("multiply.dcl", [7, 9]),
+            ("fibonacci.dcl", [8]),
+            ("readlist.dcl", [4, -2, 9, 0]),
+        ]
+        for name, inputs in cases:
+            with self.subTest(name=name):
+                program = load_example(name)
+                d = self.assert_same_run(program, inputs)
+                self.assertFalse(d.is_running)
+
+    def test_overflow(self):
+        program = ["0 LDA 3", "1 INC", "2 JMP 1", "3 DEF 4090"]
+        self.assert_same_run(program, error=Overflow)
+
+    def test_invalid_address(self):
+        program = ["0 SPBP", "1 LDAB 5", "2 END"]
+        self.assert_same_run(program, error=InvalidAddress)
+
+    def test_self_modifying_block(self):
+        """Assert that stores into the running block are respected"""
+        program = [
+            "0 LDA 6",
+            "1 STA 3",
+            "2 NOP",
+            "3 OUT 7",
+            "4 PSH",
+            "5 END",
+            "6 END",
+            "7 DEF 1",
+        ]
+        d = self.assert_same_run(program)
+        self.assertEqual(d.interface.output, [])
+
+    def test_recompile_after_store(self):
+        """Assert that a compiled block is recompiled after a store"""
+        program = ["0 OUT 3", "1 END", "3 DEF 1"]
+        reference, translated = make_pair(program)
+        translator = Translator(translated)
+        translator.run()
+        translated.load(["0 OUT 4", "4 DEF 2"], clear=False)
+        translated.pc.set(0)
+        translator.run()
+        self.assertEqual(translated.interface.output, [1, 2])
+
+    def test_breakpoint_fallback(self):
+        program = load_example("multiply.dcl")
+        reference, translated = make_pair(program, [2, 3])
+        reference.breakpoints.add(4)
+        translated.breakpoints.add(4)
+        with self.assertRaises(Breakpoint):
+            reference.run_reference()
+        with self.assertRaises(Breakpoint):
+            Translator(translated).run()
+        self.assertEqual(machine_state(translated), machine_state(reference))
@@ -18,6 +18,12 @@ class UtilTestCase(unittest.TestCase):
             -5,
         )
 
+    def test_signed_table(self):
+        table = util.signed_table(8)
+        self.assertEqual(table, [util.signed_value(i, 8) for i in range(256)])
+        self.assertIs(util.signed_table(8), table)
+        self.assertIsNone(util.signed_table(32))
+
     def test_number_of_digits_base_ten(self):
         from math import e
         cases = [0, 1, 9, 10, 99, 100, 101, 567, int(e ** 42)]
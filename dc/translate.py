@@ -0,0 +1,418 @@
+#!/usr/bin/python3
+# -*- encoding: utf-8 -*-
+"""
+A second execution engine for the DC that translates basic blocks of the
+RAM image into Python functions. It produces exactly the same results as
+DC.cycle(), just a lot faster for tight loops.
+"""
+from .parts import RAM
+from .errors import Overflow, InvalidAddress, NoInputValue, DCError
+
+
+# Instructions that end a basic block. Everything that may change the
+# control flow or talks to the interface ends the block.
+TERMINATORS = {
+    "JMP", "JMS", "JPL", "JZE", "JNM", "JNP", "JNZ", "JSR", "RTN", "END",
+    "INM", "INS", "INB", "OUT", "OUTS", "OUTB",
+}
+
+# Conditions (as Python expressions on the signed accumulator value) that
+# cause a conditional jump to be taken
+JUMP_CONDITIONS = {
+    "JMS": "ac < 0",
+    "JPL": "ac > 0",
+    "JZE": "ac == 0",
+    "JNM": "ac >= 0",
+    "JNP": "ac <= 0",
+    "JNZ": "ac != 0",
+}
+
+
+class BlockCompiler():
+    """
+    Generates the Python source for a single basic block. The generated
+    function keeps the registers in local variables and only writes them
+    back to the Register objects when the block is left, either
+    regularly, because of an error or before the interface is called.
+
+    Inside the block, ac holds the signed value of the accumulator. AR and
+    DR are tracked as Python expressions and only materialized when they
+    are needed, so operand fetches that get overwritten anyway cost
+    nothing.
+    """
+    # pylint: disable=too-many-instance-attributes
+
+    MAX_LENGTH = 64
+
+    def __init__(self, d, start, max_length=MAX_LENGTH):
+        self.d = d
+        self.start = start
+        self.max_length = max_length
+        # Address of the instruction that is currently compiled
+        self.end = start
+        # Address of the last instruction that belongs to the block
+        self.limit = start
+        self.lines = []
+        # Expressions for the current values of AR and DR
+        self.ar = "ar"
+        self.dr = "dr"
+        self.address_width = d.conf.address_width
+        self.mask = 2 ** d.cellwidth - 1
+        self.amask = d.max_address
+        self.sign = 2 ** (d.cellwidth - 1)
+        self.signed_min = d.min_int
+        self.signed_max = d.max_int
+
+    def emit(self, line, indent=1):
+        """
+        Append a single line of source code
+        """
+        self.lines.append("    " * indent + line)
+
+    def emit_writeback(self, pc, ir, indent=1):
+        """
+        Write all local register values back to the DC. pc is a Python
+        expression, ir the constant value of the instruction register.
+        """
+        self.emit("d.ir.value = {}".format(ir), indent)
+        self.emit("d.pc.value = pc = {}".format(pc), indent)
+        self.emit("d.dr.value = {}; d.ar.value = {}".format(self.dr, self.ar),
+                  indent)
+        self.emit("d.ac.value = ac & {}; d.sp.value = sp; d.bp.value = bp"
+                  .format(self.mask), indent)
+
+    def emit_return(self, pc, ir, indent=1):
+        """
+        Leave the block and hand the register values and the number of
+        executed instructions back to the engine
+        """
+        self.emit("return {}, ac, sp, bp, {}, {}, {}, {}".format(
+            pc, ir, self.dr, self.ar, self.end - self.start + 1), indent)
+
+    def emit_raise(self, error, pc, ir):
+        """
+        Write back the state and raise the given exception
+        """
+        self.emit_writeback(pc, ir, 2)
+        self.emit("raise {}".format(error), 2)
+
+    def set_dr(self, value):
+        """
+        Assign the given expression to DR
+        """
+        self.emit("dr = {}".format(value))
+        self.dr = "dr"
+
+    def set_ar(self, value):
+        """
+        Assign the given expression to AR
+        """
+        self.emit("ar = {}".format(value))
+        self.ar = "ar"
+
+    def signed(self, name):
+        """
+        Python expression for the signed value of a raw cell value
+        """
+        return "{0} - (({0} & {1}) << 1)".format(name, self.sign)
+
+    def emit_relative(self, base, adr, npc, word):
+        """
+        Compute the address base + adr for the *S and *B instructions and
+        raise InvalidAddress just like DC does.
+        """
+        self.emit("address = {} + {}".format(base, adr))
+        self.emit("if address > {}:".format(self.amask))
+        self.emit_raise("InvalidAddress", npc, word)
+        self.set_ar("address")
+
+    def emit_arithmetic(self, operator, npc, word):
+        """
+        ac = ac OP dr with the overflow check
+        """
+        self.set_dr(self.dr)
+        self.emit("result = ac {} ({})".format(operator, self.signed("dr")))
+        self.emit("if not {} <= result <= {}:".format(self.signed_min,
+                                                      self.signed_max))
+        self.emit_raise("Overflow", npc, word)
+        self.emit("ac = result")
+
+    def emit_store(self, address, npc, word, last):
+        """
+        Store dr into the RAM. If the store could overwrite an instruction
+        of this block that still has to be executed, the block is left.
+        Returns True if the block has to end after this instruction.
+        """
+        # Bypass RAM.__setitem__ and only notify the watchers if the cell
+        # is watched, that's a lot cheaper.
+        self.emit("if {0} in watched: ram.notify({0}, dr)".format(address))
+        self.emit("setcell({}, dr)".format(address))
+        if last:
+            return False
+        try:
+            address = int(address)
+        except ValueError:
+            self.emit("if {} < {} <= {}:".format(self.end, address,
+                                                 self.limit))
+            self.emit_return(npc, word, 2)
+            return False
+        # Constant addresses can be checked right here
+        return self.end < address <= self.limit
+
+    def compile_instruction(self, address, last):
+        # pylint: disable=too-many-branches,too-many-statements
+        """
+        Emit the code for the instruction at the given address. Returns
+        True if the block has to end after this instruction.
+        """
+        d = self.d
+        word = d.ram[address]
+        name = d.mnemo.get(word >> self.address_width, "DEF")
+        adr = word & self.amask
+        npc = (address + 1) & self.amask
+        amask = self.amask
+        self.emit("# {} {} {}".format(address, name, adr))
+        # Operand fetch, done for every instruction
+        self.ar = str(adr)
+        self.dr = "ram[{}]".format(adr)
+        ends = name in TERMINATORS or last
+        last = last or ends
+
+        if name in {"DEF", "NOP"}:
+            pass
+        elif name == "LDA":
+            self.set_dr(self.dr)
+            self.emit("ac = {}".format(self.signed("dr")))
+        elif name == "STA":
+            self.set_dr("ac & {}".format(self.mask))
+            ends |= self.emit_store(adr, npc, word, last)
+        elif name == "ADD":
+            self.emit_arithmetic("+", npc, word)
+        elif name == "SUB":
+            self.emit_arithmetic("-", npc, word)
+        elif name == "NEG":
+            self.emit("if ac != {}: ac = -ac".format(self.signed_min))
+        elif name == "INC":
+            self.emit("if ac == {}:".format(self.signed_max))
+            self.emit_raise("Overflow", npc, word)
+            self.emit("ac += 1")
+        elif name == "DEC":
+            self.emit("if ac == {}:".format(self.signed_min))
+            self.emit_raise("Overflow", npc, word)
+            self.emit("ac -= 1")
+        elif name in {"PSH", "PSHM", "PSHB"}:
+            if name == "PSH":
+                self.set_dr("ac & {}".format(self.mask))
+            elif name == "PSHB":
+                self.set_dr("bp")
+            else:
+                self.set_dr(self.dr)
+            self.set_ar("sp")
+            self.emit("sp = (sp - 1) & {}".format(amask))
+            ends |= self.emit_store("ar", npc, word, last)
+        elif name in {"POP", "POPM", "POPB"}:
+            self.emit("sp = (sp + 1) & {}".format(amask))
+            self.set_ar("sp")
+            self.set_dr("ram[sp]")
+            if name == "POP":
+                self.emit("ac = {}".format(self.signed("dr")))
+            elif name == "POPB":
+                self.emit("bp = dr & {}".format(amask))
+            else:
+                self.set_ar(adr)
+                ends |= self.emit_store(adr, npc, word, last)
+        elif name == "SPBP":
+            self.emit("bp = sp")
+        elif name == "BPSP":
+            self.emit("sp = bp")
+        elif name[:3] in {"LDA", "STA", "ADD", "SUB"}:
+            # LDAS, STAS, ADDS, SUBS and their BP counterparts
+            base = "sp" if name[3] == "S" else "bp"
+            self.emit_relative(base, adr, npc, word)
+            if name.startswith("STA"):
+                self.set_dr("ac & {}".format(self.mask))
+                ends |= self.emit_store("ar", npc, word, last)
+            else:
+                self.set_dr("ram[ar]")
+                if name.startswith("LDA"):
+                    self.emit("ac = {}".format(self.signed("dr")))
+                else:
+                    self.emit_arithmetic(name[:3] == "ADD" and "+" or "-",
+                                         npc, word)
+        elif name == "JMP":
+            self.emit_return(adr, word)
+            return True
+        elif name in JUMP_CONDITIONS:
+            self.emit_return("{} if {} else {}".format(
+                adr, JUMP_CONDITIONS[name], npc), word)
+            return True
+        elif name == "JSR":
+            self.set_dr(npc)
+            self.set_ar("sp")
+            self.emit_store("ar", npc, word, True)
+            self.emit("d.return_addresses.add(sp)")
+            self.emit("sp = (sp - 1) & {}".format(amask))
+            self.emit_return(adr, word)
+            return True
+        elif name == "RTN":
+            self.emit("sp = (sp + 1) & {}".format(amask))
+            self.set_ar("sp")
+            self.set_dr("ram[sp]")
+            self.emit("d.return_addresses.discard(sp)")
+            self.emit_return("dr & {}".format(amask), word)
+            return True
+        elif name == "END":
+            self.emit("d.is_running = False")
+        elif name in {"OUT", "OUTS", "OUTB"}:
+            if name != "OUT":
+                self.emit_relative("sp" if name == "OUTS" else "bp", adr,
+                                   npc, word)
+                self.dr = "ram[ar]"
+            self.set_dr(self.dr)
+            self.emit_writeback(npc, word)
+            self.emit("d.interface.show_output({})".format(self.signed("dr")))
+        elif name in {"INM", "INS", "INB"}:
+            if name != "INM":
+                self.emit_relative("sp" if name == "INS" else "bp", adr,
+                                   npc, word)
+            # Write back first, get_input() might raise an error
+            self.set_ar(self.ar)
+            self.emit_writeback(npc, word)
+            if name == "INM":
+                self.emit("try:")
+                self.emit("value = d.interface.get_input()", 2)
+                self.emit("except NoInputValue:")
+                self.emit("d.is_running = False", 2)
+                self.emit_return(npc, word, 2)
+            else:
+                self.emit("value = d.interface.get_input()")
+            self.emit("ram[ar] = value & {}".format(self.mask))
+            self.dr = "value & {}".format(self.mask)
+            self.emit_return(npc, word)
+            return True
+        if ends:
+            self.emit_return(npc, word)
+        return ends
+
+    def scan(self):
+        """
+        Return the address of the last instruction of the block
+        """
+        address = self.start
+        while address - self.start + 1 < self.max_length:
+            name = self.d.mnemo.get(self.d.ram[address] >> self.address_width)
+            if name in TERMINATORS or address == self.amask:
+                break
+            address += 1
+        return address
+
+    def compile(self):
+        """
+        Compile the block and return a tuple (function, end address)
+        """
+        self.limit = self.scan()
+        for address in range(self.start, self.limit + 1):
+            self.end = address
+            if self.compile_instruction(address, address == self.limit):
+                break
+        name = "block_{}".format(self.start)
+        source = "def {}(ac, sp, bp):\n{}\n".format(name,
+                                                     "\n".join(self.lines))
+        namespace = {
+            "d": self.d,
+            "ram": self.d.ram,
+            "watched": self.d.ram.watched,
+            "setcell": super(RAM, self.d.ram).__setitem__,
+            "Overflow": Overflow,
+            "InvalidAddress": InvalidAddress,
+            "NoInputValue": NoInputValue,
+        }
+        code = compile(source, "<DC {}>".format(name), "exec")
+        exec(code, namespace)  # pylint: disable=exec-used
+        return namespace[name], self.end
+
+
+class Translator():
+    """
+    Execution engine that runs the program of a DC by translating it
+    block by block into Python functions. Blocks are compiled once, when
+    they are executed for the first time, and thrown away as soon as a
+    store hits their address range.
+
+    If breakpoints or tracing are active, the translator falls back to
+    DC.cycle() for every instruction.
+    """
+    def __init__(self, d):
+        self.d = d
+        self.blocks = [None] * len(d.ram)
+        # address -> set of block start addresses covering that address
+        self.owners = {}
+        d.ram.watch(self._invalidate)
+
+    def _invalidate(self, address, value_):
+        """
+        RAM watcher that throws away every block covering the address
+        """
+        if address is None:
+            self.blocks[:] = [None] * len(self.blocks)
+            self.owners.clear()
+            return
+        for start in self.owners.pop(address % len(self.blocks), ()):
+            self.blocks[start] = None
+
+    def compile(self, start):
+        """
+        Compile the block starting at the given address
+        """
+        function, end = BlockCompiler(self.d, start).compile()
+        for address in range(start, end + 1):
+            self.owners.setdefault(address, set()).add(start)
+        self.d.ram.watched.update(range(start, end + 1))
+        self.blocks[start] = function
+        return function
+
+    def run(self, max_cycles=None):
+        """
+        Execute the program until an END is reached, an error occurs or
+        max_cycles instructions have been executed, just like
+        DC.run_reference(). Returns the number of executed instructions.
+        """
+        d = self.d
+        blocks = self.blocks
+        size = len(blocks)
+        # Close to the budget, single instructions are executed so the
+        # budget is met exactly
+        limit = (max_cycles - BlockCompiler.MAX_LENGTH
+                 if max_cycles is not None else float("inf"))
+        executed = 0
+        d.is_running = True
+        # The registers are kept in locals while the blocks are running,
+        # the accumulator as signed value
+        pc, ac, sp, bp = d.pc.value, d.ac.signed_value, d.sp.value, d.bp.value
+        ir, dr, ar = d.ir.value, d.dr.value, d.ar.value
+        while d.is_running:
+            if d.breakpoints or d.trace is not None or executed >= limit:
+                if executed == max_cycles:
+                    break
+                d.set_registers(ir, dr, pc, ac, ar, sp, bp)
+                executed += 1
+                d.cycle()
+                if d.trace is not None:
+                    d.trace(d)
+                pc, ac, sp, bp = (d.pc.value, d.ac.signed_value, d.sp.value,
+                                  d.bp.value)
+                ir, dr, ar = d.ir.value, d.dr.value, d.ar.value
+                continue
+            block = blocks[pc] or self.compile(pc)
+            try:
+                pc, ac, sp, bp, ir, dr, ar, count = block(ac, sp, bp)
+            except DCError:
+                # The block has written back the state, the failed
+                # instruction is never a jump
+                count = (d.pc.value - pc) % size
+                d.cycles += count
+                raise
+            executed += count
+            d.cycles += count
+        d.set_registers(ir, dr, pc, ac, ar, sp, bp)
+        return executed
@@ -36,6 +36,32 @@ def signed_value(val, bits):
     return val
 
 
+# Largest lookup table that signed_table() will build
+TABLE_LIMIT = 2 ** 16
+
+_signed_tables = {}
+
+
+def signed_table(bits):
+    """
+    Return a list that maps every raw value with the given bitwidth to
+    its signed value. The tables are built on first use and shared.
+    Returns None if the table would have more than TABLE_LIMIT entries.
+
+    >>> signed_table(3)
+    [0, 1, 2, 3, -4, -3, -2, -1]
+    """
+    if 2 ** bits > TABLE_LIMIT:
+        return None
+    try:
+        return _signed_tables[bits]
+    except KeyError:
+        half = 2 ** (bits - 1)
+        table = list(range(half)) + list(range(-half, 0))
+        _signed_tables[bits] = table
+        return table
+
+
 def number_of_digits(value, base=10):
     """
     Returns the number of digits the given number has in the given base
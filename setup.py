@@ -10,6 +10,7 @@ setup(
     include_package_data=True,
     scripts=[
         "scripts/dc-reloaded",
+        "scripts/dc-batch",
     ],
     **setupdata
 )